@@ -0,0 +1,53 @@
+# ================== GÓI SUMCLUB (Core + Lazy Layers) ==================
+# Lõi không phụ thuộc web (chiến lược + consensus) được nạp ngay khi `import sumclub`; các tầng nặng
+# (engine, lưu trữ, ingest WebSocket, Flask API) chỉ được nạp khi truy cập lần đầu (PEP 562 __getattr__).
+# Không gọi logging.basicConfig ở đây: cấu hình logging thuộc về entry point (setup_logging).
+#
+#   python -m sumclub [--ingest-only]      # Flask API + ingest (như sum34club.py cũ)
+#   python -m sumclub.ingest               # chỉ ingest, ghi snapshot dùng chung
+#   python -m sumclub.api_worker           # API nhiều worker đọc snapshot dùng chung
+#   python -m sumclub.backtest / .sweep    # công cụ offline
+#   python -m sumclub.importtime           # kiểm tra ngân sách thời gian import lõi
+
+import importlib
+
+from .strategies import (aggregate_consensus, ai_predict_super_consensus, all_super_vip_algos,
+                         consensus_from_scores)
+
+_LAZY = {
+    "ENGINE_MAX_WINDOW": "engine",
+    "IncrementalAnalysisEngine": "engine",
+    "MarkovTransitionTable": "engine",
+    "StrategyScoreboard": "engine",
+    "OutcomeView": "storage",
+    "SessionRingBuffer": "storage",
+    "SessionIndex": "storage",
+    "SessionLog": "storage",
+    "SESSION_RECORD": "storage",
+    "ResultSnapshot": "snapshot",
+    "SharedSnapshotReader": "snapshot",
+    "SharedSnapshotWriter": "snapshot",
+    "shared_snapshot_path": "snapshot",
+    "TableState": "state",
+    "tables": "state",
+    "default_table": "state",
+    "prepare_tables": "state",
+    "run_ingest": "ingest",
+    "app": "api",
+}
+
+__all__ = ["aggregate_consensus", "ai_predict_super_consensus", "all_super_vip_algos", "consensus_from_scores",
+           *_LAZY]
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
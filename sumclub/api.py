@@ -0,0 +1,314 @@
+import argparse
+import json
+import logging
+import time
+from urllib.parse import urlsplit
+
+from flask import Flask, Response, abort, redirect, request
+from flask_cors import CORS
+
+from .config import (CONSENSUS_MEMO_SIZE, CONSENSUS_MODE, DICE_STATS_WINDOWS, HISTORY_PAGE_DEFAULT, HISTORY_PAGE_MAX, LONG_POLL_TIMEOUT, PREDICT_BATCH_MAX,
+                     PUSH_PORT, PUSH_PUBLIC_URL, SCOREBOARD_WEIGHT_WINDOW, SSE_KEEPALIVE, STATS_WINDOWS, setup_logging)
+from .metrics import render_metrics, timed_endpoint
+from .snapshot import render_taimd5
+from .state import DEFAULT_TABLE, default_table, prepare_tables, tables
+from .storage import DICE_FACES, DICE_PAIRS, DICE_POSITIONS, DICE_TRIPLES, unpack_dice
+from .strategies import ConsensusMemo
+
+app = Flask(__name__)
+CORS(app)
+# Memo consensus theo hậu tố dùng chung cho mọi request /api/predict/batch; chỉ bật khi
+# SUMCLUB_CONSENSUS_MEMO_SIZE > 0 (client gửi lại cùng cửa sổ), None = tắt
+_batch_memo = ConsensusMemo() if CONSENSUS_MEMO_SIZE > 0 else None
+# Cổng máy chủ đẩy asyncio (push.py) đang chạy cùng tiến trình; 0 = không có, Flask tự giữ long-poll / SSE
+push_port = 0
+
+# ================== API HIỂN THỊ KẾT QUẢ CHO USER ==================
+def _table_or_404(name):
+    table = default_table if name is None else tables.get(name)
+    if table is None:
+        abort(Response(json.dumps({"status": "error", "message": f"Không có bàn '{name}'"}, ensure_ascii=False),
+                       status=404, mimetype="application/json"))
+    return table
+
+
+def _push_redirect():
+    # Request giữ kết nối lâu (long-poll / SSE) -> 307 sang máy chủ đẩy asyncio: không tốn một thread mỗi client
+    if not push_port: return None
+    base = PUSH_PUBLIC_URL.rstrip("/")
+    if not base:
+        host = urlsplit(request.host_url).hostname
+        base = f"{request.scheme}://{f'[{host}]' if ':' in host else host}:{push_port}"
+    query = request.query_string.decode("latin-1")
+    return redirect(f"{base}{request.path}{'?' + query if query else ''}", 307)
+
+
+def serve_taimd5(current, wait_newer):
+    # Dùng chung cho tiến trình đơn (TableState) lẫn tiến trình API đọc segment (SharedSnapshotReader)
+    # Long-poll: ?after=<phien> giữ request tới khi có phiên mới hơn (hoặc hết LONG_POLL_TIMEOUT)
+    after = request.args.get("after", type=int)
+    if after is not None:
+        moved = _push_redirect()
+        if moved is not None: return moved
+        snapshot = wait_newer(after, LONG_POLL_TIMEOUT)
+    else:
+        # Đọc snapshot đã công bố một lần duy nhất - không khóa, không bao giờ chờ luồng ingest
+        snapshot = current()
+    body, etag = snapshot.rendered or render_taimd5(snapshot)
+
+    # Client đã có bản của phiên này -> 304, không gửi lại body
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def serve_taimd5_stream(wait_newer):
+    # Server-Sent Events: đẩy khung dựng sẵn của mỗi phiên mới; client kết nối lại với
+    # Last-Event-ID sẽ nhận ngay phiên hiện tại nếu đã bỏ lỡ.
+    moved = _push_redirect()
+    if moved is not None: return moved
+    last_id = request.headers.get("Last-Event-ID", type=int)
+
+    def stream(last):
+        yield b"retry: 2000\n\n"
+        while True:
+            snapshot = wait_newer(last, SSE_KEEPALIVE)
+            if snapshot.phien is not None and snapshot.phien != last:
+                if snapshot.sse_frame is None: render_taimd5(snapshot)
+                last = snapshot.phien
+                yield snapshot.sse_frame
+            else:
+                yield b": keepalive\n\n" # giữ kết nối qua proxy khi chưa có phiên mới
+
+    return Response(stream(last_id), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/api/taimd5", methods=["GET"], defaults={"table": None})
+@app.route("/api/<table>/taimd5", methods=["GET"])
+@timed_endpoint("/api/taimd5", long_poll=lambda: "after" in request.args)
+def api_taimd5(table):
+    table = _table_or_404(table)
+    return serve_taimd5(lambda: table.current_snapshot, table.broadcaster.wait_newer)
+
+
+@app.route("/api/taimd5/stream", methods=["GET"], defaults={"table": None})
+@app.route("/api/<table>/taimd5/stream", methods=["GET"])
+def api_taimd5_stream(table):
+    table = _table_or_404(table)
+    return serve_taimd5_stream(table.broadcaster.wait_newer)
+
+
+@app.route("/api/tables", methods=["GET"])
+def api_tables():
+    return Response(json.dumps({
+        "default": DEFAULT_TABLE,
+        "tables": [{"name": t.name, "hub": t.hub_name, "phien": t.current_snapshot.phien,
+                    "sessions": len(t.session_store)} for t in tables.values()]
+    }, sort_keys=True, separators=(",", ":")), mimetype="application/json")
+
+
+def _json_response(data, status=200):
+    return Response(json.dumps(data, sort_keys=True, separators=(",", ":")), status=status,
+                    mimetype="application/json")
+
+
+def _totals_dict(counts):
+    return {str(k + 3): c for k, c in enumerate(counts)}
+
+
+@app.route("/api/history", methods=["GET"], defaults={"table": None})
+@app.route("/api/<table>/history", methods=["GET"])
+@timed_endpoint("/api/history")
+def api_history(table):
+    # ?from=&to= (khoảng mã phiên), ?tong= (lọc theo tổng), ?order=asc|desc, ?limit=, ?cursor=<next_cursor>
+    table = _table_or_404(table)
+    args = request.args
+    try:
+        start, stop = args.get("from", type=int), args.get("to", type=int)
+        tong, cursor = args.get("tong", type=int), args.get("cursor", type=int)
+        limit = int(args.get("limit", HISTORY_PAGE_DEFAULT))
+    except ValueError:
+        return _json_response({"status": "error", "message": "Tham số không hợp lệ"}, 400)
+    order = args.get("order", "asc")
+    if order not in ("asc", "desc") or not 1 <= limit <= HISTORY_PAGE_MAX or (tong is not None and not 3 <= tong <= 18):
+        return _json_response({"status": "error", "message": "Tham số không hợp lệ"}, 400)
+
+    rows, next_cursor = table.session_index.query(start, stop, tong, cursor, limit, order == "desc")
+    return _json_response({
+        "table": table.name,
+        "order": order,
+        "items": [{"phien": phien, "xucxac": unpack_dice(code), "tong": t, "ketqua": "Tài" if t >= 11 else "Xỉu"}
+                  for phien, t, code in rows],
+        "next_cursor": next_cursor,
+    })
+
+
+@app.route("/api/stats", methods=["GET"], defaults={"table": None})
+@app.route("/api/<table>/stats", methods=["GET"])
+@timed_endpoint("/api/stats")
+def api_stats(table):
+    table = _table_or_404(table)
+    stats = table.session_index.stats()
+    windows = {}
+    for w in STATS_WINDOWS:
+        # sessions: số phiên thực có trong cửa sổ (< w khi chưa nhận đủ w phiên từ lúc khởi động)
+        counts = stats["windows"][w]
+        tai = sum(counts[8:])
+        windows[str(w)] = {"sessions": min(w, stats["sessions_total"]), "tai": tai,
+                           "xiu": sum(counts) - tai, "totals": _totals_dict(counts)}
+    streak_bit, streak = stats["streak"]
+    return _json_response({
+        "table": table.name,
+        "sessions_total": stats["sessions_total"],
+        "sessions_retained": stats["sessions_retained"],
+        "first_phien": stats["first_phien"],
+        "last_phien": stats["last_phien"],
+        "totals": _totals_dict(stats["retained"]),
+        "lifetime_totals": _totals_dict(stats["lifetime"]),
+        "windows": windows,
+        "streaks": {
+            "current": {"ketqua": None if streak_bit is None else ("Tài" if streak_bit else "Xỉu"), "length": streak},
+            "histogram": {str(n): c for n, c in enumerate(stats["streak_lengths"]) if c},
+        },
+    })
+
+
+def _faces_dict(counts, offset):
+    return {str(face): counts[offset + face - 1] for face in range(1, 7)}
+
+
+def _dice_dict(counts):
+    sessions = sum(counts[DICE_FACES:DICE_FACES + 6]) // 3
+    triples, pairs = sum(counts[DICE_TRIPLES:DICE_TRIPLES + 6]), sum(counts[DICE_PAIRS:DICE_PAIRS + 6])
+    return {
+        "sessions": sessions,
+        "faces": _faces_dict(counts, DICE_FACES),
+        "positions": [_faces_dict(counts, DICE_POSITIONS + 6 * p) for p in range(3)],
+        "triples": {"total": triples, "by_face": _faces_dict(counts, DICE_TRIPLES)},
+        "pairs": {"total": pairs, "by_face": _faces_dict(counts, DICE_PAIRS)},
+        "distinct": sessions - triples - pairs,
+    }
+
+
+@app.route("/api/dice", methods=["GET"], defaults={"table": None})
+@app.route("/api/<table>/dice", methods=["GET"])
+@timed_endpoint("/api/dice")
+def api_dice(table):
+    # Tần suất mặt, histogram theo vị trí, bộ ba / đôi theo cửa sổ: đọc bộ đếm gia tăng, không quét nhật ký
+    table = _table_or_404(table)
+    index = table.session_index
+    stats = index.dice_stats()
+    return _json_response({
+        "table": table.name,
+        "sessions_total": stats["sessions_total"],
+        "sessions_with_dice": stats["known"],
+        "last": {"phien": stats["last_phien"], "xucxac": unpack_dice(stats["last"])},
+        "retained": _dice_dict(stats["windows"][index.capacity]),
+        "lifetime": _dice_dict(stats["lifetime"]),
+        "windows": {str(w): _dice_dict(stats["windows"][w]) for w in DICE_STATS_WINDOWS},
+    })
+
+
+@app.route("/api/scoreboard", methods=["GET"], defaults={"table": None})
+@app.route("/api/<table>/scoreboard", methods=["GET"])
+@timed_endpoint("/api/scoreboard")
+def api_scoreboard(table):
+    table = _table_or_404(table)
+    board = table.scoreboard
+    stats = board.stats()
+    scored = stats["scored"]
+
+    def rates(counts, n):
+        return round(counts / n * 100, 2) if n else None
+
+    rows = {}
+    for i, name in enumerate(board.names + ["consensus"]):
+        rows[name] = {"lifetime": rates(stats["lifetime"][i], scored),
+                      **{str(w): rates(c[i], min(w, scored)) for w, c in stats["windows"].items()}}
+    return _json_response({
+        "table": table.name,
+        "scored": scored,
+        "skipped_gaps": stats["skipped"],
+        "consensus_mode": CONSENSUS_MODE,
+        "weight_window": SCOREBOARD_WEIGHT_WINDOW,
+        "hit_rates": rows,
+    })
+
+
+@app.route("/api/predict/batch", methods=["POST"])
+@timed_endpoint("/api/predict/batch")
+def api_predict_batch():
+    # {"sequences": [{"totals": [...], "history": [...] (tùy chọn)}, ...], "strategies": false}
+    # -> consensus (và tùy chọn 25 chiến lược) cho từng chuỗi, đánh giá cả lô trong một lượt vector hóa
+    from .vectorized import predict_batch # NumPy chỉ nạp khi có request dự đoán theo lô
+    payload = request.get_json(silent=True)
+    sequences = payload.get("sequences") if isinstance(payload, dict) else None
+    if not isinstance(sequences, list) or not all(isinstance(item, dict) for item in sequences):
+        return _json_response({"status": "error", "message": "Cần {\"sequences\": [{\"totals\": [...]}, ...]}"}, 400)
+    if len(sequences) > PREDICT_BATCH_MAX:
+        return _json_response({"status": "error", "message": f"Tối đa {PREDICT_BATCH_MAX} chuỗi mỗi request"}, 413)
+
+    started = time.perf_counter()
+    try:
+        results = predict_batch([(item.get("history"), item.get("totals")) for item in sequences],
+                                strategies=bool(payload.get("strategies")), memo=_batch_memo)
+    except ValueError as e:
+        return _json_response({"status": "error", "message": str(e)}, 400)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return _json_response({
+        "count": len(results),
+        "elapsed_ms": round(elapsed_ms, 3),
+        "sequences_per_ms": round(len(results) / elapsed_ms, 2) if elapsed_ms else None,
+        "memo": _batch_memo.stats() if _batch_memo is not None else None,
+        "results": results,
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
+
+# ================== KHỞI ĐỘNG HỆ THỐNG ==================
+def start_push_server(host, port, sources=None, sock=None):
+    # Máy chủ đẩy asyncio trên luồng nền của tiến trình này; bật chuyển hướng 307 cho long-poll / SSE
+    global push_port
+    from .push import PushServer # aiohttp chỉ nạp khi thật sự phục vụ
+    if sources is None:
+        sources = {name: (lambda t=t: t.current_snapshot, t.broadcaster) for name, t in tables.items()}
+    server = PushServer(sources)
+    server.run_in_thread(host, port, sock)
+    push_port = server.port
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flask API + ingest WebSocket trong cùng một tiến trình")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--ingest-only", action="store_true",
+                        help="Chỉ chạy ingest, ghi snapshot vào SUMCLUB_SHARED_DIR cho api_worker")
+    parser.add_argument("--push-port", type=int, default=PUSH_PORT,
+                        help="Bật máy chủ đẩy asyncio cho SSE / long-poll ở cổng này (mặc định 0 = tắt, Flask tự giữ bằng thread)")
+    args = parser.parse_args(argv)
+    setup_logging()
+    # Tầng ingest (websocket-client, requests) chỉ được nạp khi thật sự chạy dịch vụ
+    from .ingest import run_ingest, start_ingest_threads
+    if args.ingest_only: run_ingest()
+
+    logging.info(f"🚀 Khởi động Flask + Hệ thống Super VIP Pro V3 (Consensus Logic) cho {len(tables)} bàn: {', '.join(tables)}")
+    prepare_tables()
+    start_ingest_threads()
+    if args.push_port: start_push_server(args.host, args.push_port)
+    
+    # Chạy Flask app
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import socket
+
+from flask import Flask, Response, abort
+from flask_cors import CORS
+from werkzeug.serving import make_server
+
+from .api import serve_taimd5, serve_taimd5_stream, start_push_server
+from .config import PUSH_PORT, SHARED_SNAPSHOT_DIR, setup_logging
+from .snapshot import SharedSnapshotReader, shared_poller, shared_snapshot_path
+from .state import DEFAULT_TABLE, tables
+
+# ================== TIẾN TRÌNH API NHIỀU WORKER (Shared-memory Snapshot Readers) ==================
+# Tách ingest khỏi API: tiến trình ingest (python -m sumclub --ingest-only, hoặc --ingest ở đây)
+# ghi snapshot vào segment mmap theo bàn (SharedSnapshotWriter); mỗi worker API chỉ đọc segment đó
+# không khóa (SharedSnapshotReader), nên thông lượng /api/taimd5 tăng theo số lõi thay vì bị một GIL giới hạn.
+#
+#   SUMCLUB_SHARED_DIR=/dev/shm/sumclub python -m sumclub.api_worker --workers 8 --ingest
+#   SUMCLUB_SHARED_DIR=/dev/shm/sumclub gunicorn -w 8 sumclub.api_worker:app     # khi dùng server pre-fork khác
+#
+# Import module không dựng app, không mở segment và không nạp tầng ingest (requests / websocket / aiohttp):
+# `app` chỉ được tạo ở lần truy cập đầu (PEP 562), ingest chỉ nạp khi chạy --ingest.
+#
+# Khi bật --push-port (SUMCLUB_PUSH_PORT, mặc định tắt), SSE / long-poll (?after=) được chuyển 307 sang máy chủ
+# đẩy asyncio (push.py) của chính worker đó, cùng nghe một cổng kế thừa; mỗi worker chỉ có MỘT luồng thăm dò
+# segment (SharedSnapshotPoller).
+#
+# Chỉ phục vụ các route đọc snapshot (/api/taimd5, /stream, /api/tables); các route cần trạng thái đầy đủ
+# (/api/history, /api/stats, /api/dice, /api/scoreboard, /metrics) vẫn ở tiến trình đơn sumclub.api.
+
+DEFAULT_SHARED_DIR = "/dev/shm/sumclub" if os.path.isdir("/dev/shm") else "sumclub_shared"
+
+
+def make_readers(directory):
+    # Reader mmap chỉ đọc; tên bàn lấy từ cùng cấu hình SUMCLUB_TABLES với ingest
+    return {name: SharedSnapshotReader(name, shared_snapshot_path(name, directory)) for name in tables}
+
+
+def make_app(directory, readers=None):
+    application = Flask(__name__)
+    CORS(application)
+    if readers is None: readers = make_readers(directory)
+
+    def reader_or_404(name):
+        reader = readers.get(DEFAULT_TABLE if name is None else name)
+        if reader is None:
+            abort(Response(json.dumps({"status": "error", "message": f"Không có bàn '{name}'"}, ensure_ascii=False),
+                           status=404, mimetype="application/json"))
+        return reader
+
+    @application.route("/api/taimd5", methods=["GET"], defaults={"table": None})
+    @application.route("/api/<table>/taimd5", methods=["GET"])
+    def api_taimd5(table):
+        reader = reader_or_404(table)
+        return serve_taimd5(reader.current, reader.wait_newer)
+
+    @application.route("/api/taimd5/stream", methods=["GET"], defaults={"table": None})
+    @application.route("/api/<table>/taimd5/stream", methods=["GET"])
+    def api_taimd5_stream(table):
+        return serve_taimd5_stream(reader_or_404(table).wait_newer)
+
+    @application.route("/api/tables", methods=["GET"])
+    def api_tables():
+        return Response(json.dumps({
+            "default": DEFAULT_TABLE,
+            "tables": [{"name": name, "hub": tables[name].hub_name, "phien": reader.current().phien}
+                       for name, reader in readers.items()]
+        }, sort_keys=True, separators=(",", ":")), mimetype="application/json")
+
+    return application
+
+
+def create_app(directory=None):
+    return make_app(directory or SHARED_SNAPSHOT_DIR or DEFAULT_SHARED_DIR)
+
+
+_app = None
+
+
+def __getattr__(name):
+    # sumclub.api_worker:app cho gunicorn: dựng lười một lần mỗi tiến trình
+    global _app
+    if name != "app": raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    if _app is None: _app = create_app()
+    return _app
+
+
+def _listen(host, port):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind((host, port))
+    listener.listen(1024)
+    listener.set_inheritable(True)
+    return listener
+
+
+def _serve(application, host, port, fd, readers=None, push_listener=None):
+    # Mọi worker accept() trên CÙNG một socket nghe kế thừa từ tiến trình cha (pre-fork)
+    if push_listener is not None:
+        # Poller và event loop là luồng, không sống qua fork: mỗi worker tự khởi động sau khi fork
+        for reader in readers.values(): shared_poller().watch(reader)
+        start_push_server(host, push_listener.getsockname()[1],
+                          {name: (reader.current, reader.broadcaster) for name, reader in readers.items()},
+                          sock=push_listener)
+    logging.info(f"🧵 Worker API {os.getpid()} phục vụ {host}:{port}")
+    make_server(host, port, application, threaded=True, fd=fd).serve_forever()
+
+
+def serve(application, host, port, workers, readers=None, push_port=0):
+    listener = _listen(host, port)
+    push_listener = _listen(host, push_port) if push_port and readers else None
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=_serve, args=(application, host, port, listener.fileno(), readers, push_listener),
+                                 daemon=True)
+                 for _ in range(workers)]
+    for process in processes: process.start()
+    for process in processes: process.join()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API /api/taimd5 nhiều tiến trình đọc snapshot dùng chung")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shared-dir", default=SHARED_SNAPSHOT_DIR or DEFAULT_SHARED_DIR)
+    parser.add_argument("--push-port", type=int, default=PUSH_PORT,
+                        help="Bật máy chủ đẩy asyncio cho SSE / long-poll ở cổng này (mặc định 0 = tắt, worker tự giữ bằng thread)")
+    parser.add_argument("--ingest", action="store_true", help="Chạy luôn tiến trình ingest ghi vào --shared-dir")
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    if args.ingest:
+        from .ingest import run_ingest # chỉ tiến trình ingest cần requests / websocket / aiohttp
+        multiprocessing.get_context("fork").Process(target=run_ingest, args=(args.shared_dir,),
+                                                    daemon=True, name="ingest").start()
+    logging.info(f"🚀 Khởi động {args.workers} worker API đọc snapshot tại {args.shared_dir}")
+    readers = make_readers(args.shared_dir)
+    serve(make_app(args.shared_dir, readers), args.host, args.port, args.workers, readers, args.push_port)
+
+
+if __name__ == "__main__":
+    main()
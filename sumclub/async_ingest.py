@@ -0,0 +1,154 @@
+import argparse
+import asyncio
+import logging
+import threading
+import time
+import urllib.parse
+
+import aiohttp
+
+from .config import setup_logging
+from .ingest import (RECONNECT_BACKOFF_BASE, RECONNECT_BACKOFF_MAX, RECONNECT_RESET_AFTER, backoff_delay,
+                     handle_hub_frame, ws_connect_url)
+from .metrics import WS_RECONNECTS
+from .state import prepare_tables, tables
+
+# ================== CLIENT INGEST ASYNCIO (SignalR over aiohttp) ==================
+# Thay cho main_loop/connect_ws (mỗi bàn một thread, requests.get mới cho mỗi lần negotiate):
+# một event loop phục vụ mọi bàn, dùng chung MỘT ClientSession (pool kết nối
+# HTTP cho negotiate), nối lại ngay lập tức rồi lùi dần theo hàm mũ có jitter, và watchdog phát hiện
+# luồng "treo" (không còn frame nào, kể cả keepalive "{}" của SignalR) nhanh hơn ping 30s.
+#
+# Đây là client ingest mặc định của run_ingest / start_ingest_threads (python -m sumclub, sumclub.ingest,
+# api_worker --with-ingest); backoff_delay dùng chung với main_loop (ingest.py).
+#
+#   python -m sumclub.async_ingest                      # Flask API + ingest asyncio cho mọi bàn
+#   SUMCLUB_TABLES="local=http://127.0.0.1:8765|luckydice1Hub" python -m sumclub.async_ingest
+#       -> chạy với máy chủ giả lập standin_hub.py
+
+# Không nhận được frame nào trong khoảng này -> coi như luồng treo và nối lại
+STALL_TIMEOUT = 15.0
+# Ping WebSocket định kỳ (aiohttp tự đóng kết nối nếu không thấy pong)
+WS_HEARTBEAT = 10.0
+NEGOTIATE_TIMEOUT = 5.0
+
+
+class AsyncIngestClient:
+    def __init__(self, table_states, stall_timeout=STALL_TIMEOUT, heartbeat=WS_HEARTBEAT,
+                 backoff_base=RECONNECT_BACKOFF_BASE, backoff_max=RECONNECT_BACKOFF_MAX):
+        self.tables = list(table_states)
+        self.stall_timeout = stall_timeout
+        self.heartbeat = heartbeat
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stopping = asyncio.Event()
+        self._loop = None # event loop đang chạy run(); stop() từ thread khác phải đi qua loop này
+        self._tasks = []
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(limit_per_host=4, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            self._tasks = [asyncio.create_task(self._run_table(session, table)) for table in self.tables]
+            try:
+                await asyncio.gather(*self._tasks)
+            except asyncio.CancelledError:
+                if not self._stopping.is_set(): raise
+
+    def stop(self):
+        # An toàn từ mọi thread: asyncio.Event / Task chỉ được đụng tới trên chính loop của client
+        loop = self._loop
+        if loop is None or loop.is_closed(): self._stopping.set()
+        else: loop.call_soon_threadsafe(self._shutdown)
+
+    def _shutdown(self):
+        self._stopping.set()
+        # Hủy luôn các bàn đang chờ frame / chờ nối lại, không đợi hết stall_timeout
+        for task in self._tasks: task.cancel()
+
+    async def negotiate(self, session, table):
+        timeout = aiohttp.ClientTimeout(total=NEGOTIATE_TIMEOUT)
+        async with session.get(f"{table.base_url}/signalr/negotiate", params={"clientProtocol": "1.5"},
+                               timeout=timeout) as r:
+            r.raise_for_status()
+            token = urllib.parse.quote((await r.json(content_type=None))["ConnectionToken"], safe="")
+        logging.info("✅ [%s] Token: %s", table.name, token[:10] + "...", extra={"table": table.name, "event": "token"})
+        return token
+
+    async def _run_table(self, session, table):
+        reconnects = WS_RECONNECTS.labels(table.name)
+        attempt = 0
+        while not self._stopping.is_set():
+            if attempt: reconnects.inc()
+            connected_at = None
+            try:
+                token = await self.negotiate(session, table)
+                async with session.ws_connect(ws_connect_url(table, token), heartbeat=self.heartbeat,
+                                              autoping=True, max_msg_size=0) as ws:
+                    connected_at = time.monotonic()
+                    table.mark_ws_connected()
+                    await self._consume(table, ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Mọi lỗi khác (body negotiate hỏng, lỗi xử lý...) chỉ làm bàn này nối lại, không làm chết gather
+                logging.error("❌ [%s] Lỗi kết nối ingest: %r", table.name, e, extra={"table": table.name, "event": "ws_error"})
+            table.mark_ws_disconnected()
+
+            if connected_at is not None and time.monotonic() - connected_at >= RECONNECT_RESET_AFTER:
+                attempt = 0
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+            attempt += 1
+            if delay:
+                logging.warning("⚠️ [%s] Mất kết nối, nối lại sau %.2fs", table.name, delay,
+                                extra={"table": table.name, "event": "reconnect"})
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _consume(self, table, ws):
+        while not self._stopping.is_set():
+            try:
+                msg = await ws.receive(timeout=self.stall_timeout)
+            except asyncio.TimeoutError:
+                # Watchdog: máy chủ SignalR gửi keepalive đều đặn, im lặng lâu nghĩa là luồng đã treo
+                logging.warning("⚠️ [%s] Không có frame trong %ss, nối lại", table.name, self.stall_timeout,
+                                extra={"table": table.name, "event": "stall"})
+                return
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                received = time.perf_counter()
+                if table.recorder is not None: table.recorder.write(msg.data)
+                handle_hub_frame(table, msg.data, received)
+            elif msg.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSING,
+                              aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                logging.warning("⚠️ [%s] WebSocket đóng kết nối (%s)", table.name, msg.type.name,
+                                extra={"table": table.name, "event": "ws_closed"})
+                return
+
+
+def run_in_thread(table_states=None, **kwargs):
+    # Chạy client trên một event loop riêng (một thread cho mọi bàn) bên cạnh Flask
+    client = AsyncIngestClient(tables.values() if table_states is None else table_states, **kwargs)
+    thread = threading.Thread(target=asyncio.run, args=(client.run(),), daemon=True, name="async-ingest")
+    thread.start()
+    return client, thread
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Flask API + ingest asyncio cho mọi bàn")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--stall-timeout", type=float, default=STALL_TIMEOUT)
+    args = parser.parse_args(argv)
+    setup_logging()
+    from .api import app # Flask chỉ nạp khi chạy kèm API, không nạp khi ingest.py dùng client này
+
+    logging.info(f"🚀 Khởi động Flask + ingest asyncio cho {len(tables)} bàn: {', '.join(tables)}")
+    prepare_tables()
+    run_in_thread(stall_timeout=args.stall_timeout)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
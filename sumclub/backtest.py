@@ -0,0 +1,249 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from .config import CONSENSUS_MEMO_SIZE
+from .engine import ENGINE_MAX_WINDOW, IncrementalAnalysisEngine
+from .storage import SESSION_RECORD, SessionRingBuffer
+from .strategies import ConsensusMemo, ai_predict_super_consensus, all_super_vip_algos, suffix_key
+
+# ================== BACKTEST LUỒNG (Streaming Backtest) ==================
+# Đọc phiên (id, xúc xắc, tổng) từ CSV / JSONL / nhị phân dạng generator, phát lại qua 25 chiến lược
+# và consensus với bộ nhớ cố định (không bao giờ nạp toàn bộ file), chia shard qua process pool.
+#
+#   python -m sumclub.backtest phien_2024.bin phien_2025.jsonl.gz --workers 8 --json
+#
+# File .bin dùng bản ghi SESSION_RECORD, tức là chính nhật ký phiên (SESSION_LOG_PATH) của dịch vụ.
+
+# Số bản ghi mỗi shard khi chia nhỏ file nhị phân
+DEFAULT_SHARD_SIZE = 1_000_000
+
+
+def _open_text(path):
+    if path.endswith(".gz"):
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+def _base_ext(path):
+    return os.path.splitext(path[:-3] if path.endswith(".gz") else path)[1].lower()
+
+
+def read_csv(path):
+    # Cột: phien, dice1, dice2, dice3 [, tong]; dòng tiêu đề (không phải số) được bỏ qua
+    with _open_text(path) as f:
+        for row in csv.reader(f):
+            if len(row) < 4 or not row[0].strip().lstrip("-").isdigit(): continue
+            dice = [int(row[1]), int(row[2]), int(row[3])]
+            yield int(row[0]), dice, sum(dice)
+
+
+def read_jsonl(path):
+    # Mỗi dòng là latest_result ({"phien", "xucxac"}) hoặc Result gốc của hub ({"SessionID", "Dice1"...})
+    with _open_text(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line: continue
+            obj = json.loads(line)
+            if "xucxac" in obj:
+                phien, dice = obj["phien"], list(obj["xucxac"])
+            else:
+                phien, dice = obj["SessionID"], [obj["Dice1"], obj["Dice2"], obj["Dice3"]]
+            yield int(phien), dice, sum(dice)
+
+
+def read_binary(path, start=0, stop=None, chunk_records=65536):
+    # Đọc theo khối, seek thẳng tới bản ghi start nên chia shard không cần quét từ đầu file
+    size = SESSION_RECORD.size
+    with open(path, "rb") as f:
+        f.seek(start * size)
+        remaining = None if stop is None else max(0, stop - start)
+        while remaining is None or remaining > 0:
+            n = chunk_records if remaining is None else min(chunk_records, remaining)
+            buf = f.read(n * size)
+            if not buf: break
+            buf = buf[:len(buf) - len(buf) % size]
+            for phien, d1, d2, d3, tong in SESSION_RECORD.iter_unpack(buf):
+                yield phien, [d1, d2, d3], tong
+            if remaining is not None: remaining -= len(buf) // size
+
+
+def iter_sessions(path, start=0, stop=None):
+    ext = _base_ext(path)
+    if ext == ".csv": reader = read_csv(path)
+    elif ext in (".jsonl", ".ndjson", ".json"): reader = read_jsonl(path)
+    else: return read_binary(path, start, stop)
+    if start or stop is not None:
+        raise ValueError(f"Chỉ file nhị phân mới chia shard theo bản ghi được: {path}")
+    return reader
+
+
+def count_records(path):
+    return os.path.getsize(path) // SESSION_RECORD.size
+
+
+# ================== THỐNG KÊ BACKTEST ==================
+class BacktestStats:
+    def __init__(self):
+        self.sessions = 0        # số phiên đã được chấm (có dự đoán từ phiên trước)
+        self.hits = 0
+        self.conf_sum = 0.0
+        self.strategy_hits = [0] * len(all_super_vip_algos)
+        self.calibration = {}    # nhóm độ tin cậy (50, 60, ...) -> [số dự đoán, số lần đúng]
+        self.memo = {"hits": 0, "misses": 0, "evictions": 0, "bypassed": 0} # cộng dồn ConsensusMemo các shard
+        self.elapsed = 0.0
+
+    def add(self, pred, strategy_preds, actual):
+        hit = pred["du_doan"] == actual
+        self.sessions += 1
+        self.hits += hit
+        self.conf_sum += pred["do_tin_cay"]
+        for i, r in enumerate(strategy_preds):
+            self.strategy_hits[i] += r["du_doan"] == actual
+        bucket = self.calibration.setdefault(min(90, int(pred["do_tin_cay"] // 10) * 10), [0, 0])
+        bucket[0] += 1
+        bucket[1] += hit
+
+    def merge(self, other):
+        self.sessions += other.sessions
+        self.hits += other.hits
+        self.conf_sum += other.conf_sum
+        self.strategy_hits = [a + b for a, b in zip(self.strategy_hits, other.strategy_hits)]
+        for k, (n, h) in other.calibration.items():
+            bucket = self.calibration.setdefault(k, [0, 0])
+            bucket[0] += n
+            bucket[1] += h
+        for k, v in other.memo.items(): self.memo[k] += v
+        return self
+
+    def add_memo(self, memo):
+        for k in self.memo: self.memo[k] += getattr(memo, k)
+
+    def report(self):
+        n = self.sessions or 1
+        lookups = self.memo["hits"] + self.memo["misses"]
+        return {
+            "sessions": self.sessions,
+            "hit_rate": round(self.hits / n * 100, 2),
+            "mean_confidence": round(self.conf_sum / n, 2),
+            "calibration": {f"{k}-{k + 10}": {"count": c, "hit_rate": round(h / c * 100, 2)}
+                            for k, (c, h) in sorted(self.calibration.items())},
+            "strategies": {fn.__name__: round(h / n * 100, 2)
+                           for fn, h in zip(all_super_vip_algos, self.strategy_hits)},
+            "memo": dict(self.memo, hit_rate=round(self.memo["hits"] / lookups * 100, 2) if lookups else None),
+            "elapsed_s": round(self.elapsed, 3),
+            "sessions_per_s": round(self.sessions / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+def _reference_predict(h, t):
+    return ai_predict_super_consensus(h, t), [fn(h, t) for fn in all_super_vip_algos]
+
+
+def replay(sessions, score_from=0, reference=False, stats=None, memo=None):
+    # Phát lại dãy phiên; dự đoán sau phiên i được chấm với kết quả phiên i + 1.
+    # Chỉ chấm các phiên có chỉ số >= score_from (các phiên trước đó chỉ để làm nóng bộ đếm).
+    # reference=True chạy ai_predict_super_consensus trên kho vòng thay cho động cơ gia tăng.
+    # memo (ConsensusMemo): hậu tố 20 phiên đã gặp thì không chạy lại 25 chiến lược; None = không tạo khóa.
+    stats = stats or BacktestStats()
+    engine = IncrementalAnalysisEngine()
+    store = SessionRingBuffer(ENGINE_MAX_WINDOW) if reference else None
+    last_phien, pending = None, None
+    for index, (phien, dice, tong) in enumerate(sessions):
+        # Giống on_message: bỏ qua phiên trùng hoặc cũ hơn
+        if last_phien is not None and phien <= last_phien: continue
+        last_phien = phien
+        ketqua = "Tài" if tong >= 11 else "Xỉu"
+        if pending is not None and index >= score_from:
+            stats.add(pending[0], pending[1], ketqua)
+        if reference:
+            store.append(ketqua, tong)
+            h, t = store.history_view(), store.totals_view()
+            if memo is None: pending = _reference_predict(h, t)
+            else: pending = memo.get_or_compute(suffix_key(h, t), _reference_predict, h, t)
+        else:
+            engine.push(ketqua, tong)
+            if memo is None: results, consensus = engine.evaluate()
+            else: results, consensus = memo.get_or_compute(engine.suffix_key(), engine.evaluate)
+            pending = (consensus, results)
+    if memo is not None: stats.add_memo(memo)
+    return stats
+
+
+def run_shard(shard):
+    # shard = (path, start, stop, reference, memo_size); hàm cấp module để process pool pickle được
+    path, start, stop, reference, memo_size = shard
+    began = time.perf_counter()
+    memo = ConsensusMemo(memo_size) if memo_size > 0 else None
+    if stop is None:
+        stats = replay(iter_sessions(path), reference=reference, memo=memo)
+    else:
+        # Đọc thêm ENGINE_MAX_WINDOW phiên trước shard để trạng thái khớp với lượt chạy liền mạch
+        warm_start = max(0, start - ENGINE_MAX_WINDOW)
+        stats = replay(iter_sessions(path, warm_start, stop), score_from=start - warm_start,
+                       reference=reference, memo=memo)
+    stats.elapsed = time.perf_counter() - began
+    return stats
+
+
+def plan_shards(paths, shard_size=DEFAULT_SHARD_SIZE, reference=False, memo_size=CONSENSUS_MEMO_SIZE):
+    shards = []
+    for path in paths:
+        if _base_ext(path) in (".csv", ".jsonl", ".ndjson", ".json"):
+            shards.append((path, 0, None, reference, memo_size)) # file văn bản: một shard / file
+            continue
+        total = count_records(path)
+        for start in range(0, total, shard_size):
+            shards.append((path, start, min(total, start + shard_size), reference, memo_size))
+    return shards
+
+
+def backtest(paths, workers=None, shard_size=DEFAULT_SHARD_SIZE, reference=False, memo_size=CONSENSUS_MEMO_SIZE):
+    shards = plan_shards(paths, shard_size, reference, memo_size)
+    began = time.perf_counter()
+    stats = BacktestStats()
+    if workers == 1 or len(shards) <= 1:
+        for shard in shards: stats.merge(run_shard(shard))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for part in pool.map(run_shard, shards): stats.merge(part)
+    stats.elapsed = time.perf_counter() - began
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest Super Consensus trên file phiên đã ghi")
+    parser.add_argument("files", nargs="+", help="File .csv / .jsonl / .bin (hỗ trợ .gz cho văn bản)")
+    parser.add_argument("--workers", type=int, default=None, help="Số tiến trình (mặc định: số CPU)")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help="Số bản ghi mỗi shard với file nhị phân")
+    parser.add_argument("--reference", action="store_true",
+                        help="Dùng ai_predict_super_consensus thay cho động cơ gia tăng (chậm, để đối chiếu)")
+    parser.add_argument("--memo-size", type=int, default=CONSENSUS_MEMO_SIZE,
+                        help="Số hậu tố lịch sử nhớ consensus mỗi shard (0 = tắt, mặc định SUMCLUB_CONSENSUS_MEMO_SIZE)")
+    parser.add_argument("--json", action="store_true", help="In báo cáo dạng JSON")
+    args = parser.parse_args(argv)
+
+    report = backtest(args.files, args.workers, args.shard_size, args.reference, args.memo_size).report()
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return
+    print(f"Phiên đã chấm: {report['sessions']} | Tỷ lệ đúng: {report['hit_rate']}% | "
+          f"Tin cậy TB: {report['mean_confidence']}% | {report['sessions_per_s']} phiên/s")
+    memo = report["memo"]
+    if memo["hits"] + memo["misses"]:
+        print(f"  Memo consensus: {memo['hits']} trúng / {memo['misses']} trượt ({memo['hit_rate']}%), "
+              f"loại {memo['evictions']}")
+    for bucket, row in report["calibration"].items():
+        print(f"  Tin cậy {bucket}%: {row['count']} dự đoán, đúng {row['hit_rate']}%")
+    for name, rate in report["strategies"].items():
+        print(f"  {name}: {rate}%")
+
+
+if __name__ == "__main__":
+    main()
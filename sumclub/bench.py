@@ -0,0 +1,301 @@
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import timeit
+import urllib.parse
+
+from .config import CONSENSUS_MODE, HISTORY_CAPACITY, METRICS_ENABLED, setup_logging
+from .engine import IncrementalAnalysisEngine
+from .strategies import ai_predict_super_consensus, all_super_vip_algos
+
+# ================== BỘ BENCHMARK TÁI LẬP (Reproducible Benchmarks) ==================
+# Đo hot path trên dữ liệu giả lập tất định (--seed) và ghi kết quả JSON để so sánh giữa các lần chạy:
+#   strategy   từng hàm trong all_super_vip_algos ở các độ dài lịch sử (mặc định 300, 10k, 1M)
+#   consensus  ai_predict_super_consensus (bản tham chiếu) và IncrementalAnalysisEngine.evaluate (hot path)
+#   ingest     thông lượng handle_hub_frame (đúng on_message) + độ trễ công bố, qua replay_frames
+#   http       tải /api/taimd5 với nhiều poller đồng thời, p50/p99/max và req/s
+# Mỗi kết quả có "value" + "better" (lower/higher); --compare đánh dấu hồi quy vượt --threshold -> exit 1.
+#
+#   python -m sumclub.bench --output bench-main.json
+#   python -m sumclub.bench --suite strategy --suite consensus --sizes 300,10000 --compare bench-main.json
+#   python -m sumclub.bench --suite http --url http://127.0.0.1:3000/api/taimd5 --pollers 64   # server ngoài
+
+SUITES = ("strategy", "consensus", "ingest", "http")
+DEFAULT_SIZES = (300, 10_000, 1_000_000)
+DEFAULT_OUTPUT = "sumclub_bench.json"
+BENCH_HUB = "luckydice1Hub"
+
+
+# ================== DỮ LIỆU GIẢ LẬP ==================
+def synthetic_totals(n, seed=0):
+    rng = random.Random(seed)
+    return [rng.randint(1, 6) + rng.randint(1, 6) + rng.randint(1, 6) for _ in range(n)]
+
+
+def synthetic_history(n, seed=0):
+    totals = synthetic_totals(n, seed)
+    return ["Tài" if tong >= 11 else "Xỉu" for tong in totals], totals
+
+
+def hub_frames(count, seed=0, hub_name=BENCH_HUB, first_session=1, keepalive_every=2):
+    # Frame SignalR giống máy chủ thật (cùng định dạng standin_hub.py), xen keepalive "{}" và
+    # frame "chưa có kết quả" (Dice1 = -1) để đo cả phần phân tích frame bị bỏ qua
+    rng = random.Random(seed)
+    for i in range(count):
+        session_id = first_session + i
+        if keepalive_every and i % keepalive_every == 0:
+            yield 0.0, "{}"
+            yield 0.0, json.dumps({"C": f"p-{session_id}", "M": [{"H": hub_name, "M": "notifyChangePhrase",
+                                   "A": [{"SessionID": session_id, "Result": {"Dice1": -1, "Dice2": -1, "Dice3": -1}}]}]})
+        result = {"Dice1": rng.randint(1, 6), "Dice2": rng.randint(1, 6), "Dice3": rng.randint(1, 6)}
+        yield 0.0, json.dumps({"C": f"d-{session_id}", "M": [{"H": hub_name, "M": "notifyChangePhrase",
+                                                              "A": [{"SessionID": session_id, "Result": result}]}]})
+
+
+# ================== ĐO THỜI GIAN MỘT HÀM ==================
+def time_call(fn, repeat=5, min_batch=0.02):
+    # Tự chọn số lần gọi mỗi lô (>= min_batch giây), đo repeat lô; trung vị ít nhiễu hơn trung bình
+    timer = timeit.Timer(fn)
+    number = 1
+    while timer.timeit(number) < min_batch: number *= 2
+    runs = [t / number * 1e6 for t in timer.repeat(repeat, number)]
+    return {"value": round(statistics.median(runs), 3), "min": round(min(runs), 3), "number": number,
+            "unit": "us/call", "better": "lower"}
+
+
+def bench_strategy(sizes, repeat, seed):
+    results = []
+    for n in sizes:
+        history, totals = synthetic_history(n, seed)
+        for fn in all_super_vip_algos:
+            results.append(dict(time_call(lambda: fn(history, totals), repeat), name=f"strategy/{fn.__name__}/n={n}"))
+    return results
+
+
+def bench_consensus(sizes, repeat, seed):
+    results = []
+    for n in sizes:
+        history, totals = synthetic_history(n, seed)
+        results.append(dict(time_call(lambda: ai_predict_super_consensus(history, totals), repeat),
+                            name=f"consensus/ai_predict_super_consensus/n={n}"))
+        engine = IncrementalAnalysisEngine()
+        for ketqua, tong in zip(history, totals): engine.push(ketqua, tong)
+        results.append(dict(time_call(engine.evaluate, repeat), name=f"consensus/engine_evaluate/n={n}"))
+    return results
+
+
+def bench_ingest(sessions, seed):
+    # Cùng đường xử lý với on_message của connect_ws: frame thô -> TableState -> consensus -> công bố.
+    # Đo thông lượng tối đa không tính trước (luồng tính trước chỉ tranh CPU khi không có thời gian rảnh),
+    # rồi đo độ trễ công bố khi bảng tính trước đã sẵn sàng như giữa hai phiên thật.
+    from .ingest import handle_hub_frame
+    from .replay import _percentile_ms, replay_frames
+    from .state import TableState
+    report = replay_frames(hub_frames(sessions, seed),
+                           TableState("bench", "", BENCH_HUB, HISTORY_CAPACITY, speculate=False))
+    latency = report["publish_latency_ms"]
+    table = TableState("bench-speculative", "", BENCH_HUB, HISTORY_CAPACITY, speculate=True)
+    speculative = []
+    for _, frame in hub_frames(min(sessions, 2000), seed, keepalive_every=0):
+        table.speculator.wait_idle(1.0)
+        started = time.perf_counter()
+        handle_hub_frame(table, frame, started)
+        speculative.append(time.perf_counter() - started)
+    speculative.sort()
+    return [
+        {"name": "ingest/frames_per_s", "value": report["frames_per_s"], "unit": "frame/s", "better": "higher",
+         "frames": report["frames"]},
+        {"name": "ingest/sessions_per_s", "value": report["sessions_per_s"], "unit": "session/s", "better": "higher",
+         "sessions": report["sessions"]},
+        {"name": "ingest/publish_latency_p50", "value": latency["p50"], "unit": "ms", "better": "lower"},
+        {"name": "ingest/publish_latency_p99", "value": latency["p99"], "unit": "ms", "better": "lower"},
+        {"name": "ingest/speculative_publish_latency_p50", "value": _percentile_ms(speculative, 0.50), "unit": "ms",
+         "better": "lower"},
+        {"name": "ingest/speculative_publish_latency_p99", "value": _percentile_ms(speculative, 0.99), "unit": "ms",
+         "better": "lower"},
+    ]
+
+
+# ================== TẢI HTTP /api/taimd5 ==================
+def _serve_bench_api(port_queue, seed, warm_sessions, publish_interval):
+    # Tiến trình con: Flask app thật + bàn mặc định đã có dữ liệu; một luồng tiếp tục công bố phiên mới
+    # trong lúc bị poll, để đo đúng tình huống snapshot thay đổi liên tục
+    from werkzeug.serving import make_server
+
+    from .api import app
+    from .ingest import handle_hub_frame
+    from .state import default_table
+    frames = hub_frames(sys.maxsize, seed, default_table.hub_name, keepalive_every=0)
+    for _, (_, frame) in zip(range(warm_sessions), frames): handle_hub_frame(default_table, frame)
+
+    def publisher():
+        for _, frame in frames:
+            time.sleep(publish_interval)
+            handle_hub_frame(default_table, frame)
+
+    if publish_interval > 0: threading.Thread(target=publisher, daemon=True).start()
+    # Log từng request của werkzeug chỉ làm nhiễu số đo
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port_queue.put(server.server_port)
+    server.serve_forever()
+
+
+def _poller(url, deadline, latencies, errors):
+    parts = urllib.parse.urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    conn = None
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            # Giữ kết nối keep-alive như client poll thật; lỗi thì mở lại kết nối
+            if conn is None: conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=10)
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            if response.status != 200: raise http.client.HTTPException(f"HTTP {response.status}")
+            latencies.append(time.perf_counter() - started)
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            if conn is not None: conn.close()
+            conn = None
+    if conn is not None: conn.close()
+
+
+def bench_http(pollers, duration, seed, url=None, publish_interval=0.1, warm_sessions=HISTORY_CAPACITY):
+    server = None
+    if url is None:
+        context = multiprocessing.get_context("fork")
+        port_queue = context.Queue()
+        server = context.Process(target=_serve_bench_api, args=(port_queue, seed, warm_sessions, publish_interval),
+                                 daemon=True)
+        server.start()
+        url = f"http://127.0.0.1:{port_queue.get(timeout=30)}/api/taimd5"
+    try:
+        samples = [[] for _ in range(pollers)]
+        errors = []
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=_poller, args=(url, deadline, samples[i], errors), daemon=True)
+                   for i in range(pollers)]
+        started = time.perf_counter()
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        if server is not None: server.terminate()
+
+    from .replay import _percentile_ms
+    latencies = sorted(latency for sample in samples for latency in sample)
+    common = {"pollers": pollers, "requests": len(latencies), "errors": len(errors)}
+    return [
+        dict(common, name=f"http/taimd5/pollers={pollers}/req_per_s", value=round(len(latencies) / elapsed, 1),
+             unit="req/s", better="higher"),
+        dict(common, name=f"http/taimd5/pollers={pollers}/p50", value=_percentile_ms(latencies, 0.50),
+             unit="ms", better="lower"),
+        dict(common, name=f"http/taimd5/pollers={pollers}/p99", value=_percentile_ms(latencies, 0.99),
+             unit="ms", better="lower"),
+        dict(common, name=f"http/taimd5/pollers={pollers}/max", value=_percentile_ms(latencies, 1.0),
+             unit="ms", better="lower"),
+    ]
+
+
+# ================== CHẠY + SO SÁNH ==================
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(suites, sizes=DEFAULT_SIZES, repeat=5, seed=0, ingest_sessions=20_000, pollers=(1, 16, 64),
+        duration=5.0, url=None):
+    results = []
+    for suite in suites:
+        print(f"⏱️ Đang chạy benchmark {suite}...", file=sys.stderr)
+        if suite == "strategy": results += bench_strategy(sizes, repeat, seed)
+        elif suite == "consensus": results += bench_consensus(sizes, repeat, seed)
+        elif suite == "ingest": results += bench_ingest(ingest_sessions, seed)
+        elif suite == "http":
+            for count in pollers: results += bench_http(count, duration, seed, url)
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "seed": seed,
+            "sizes": list(sizes),
+            "history_capacity": HISTORY_CAPACITY,
+            "consensus_mode": CONSENSUS_MODE,
+            "metrics_enabled": METRICS_ENABLED,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.10):
+    # Hồi quy: chậm hơn (better=lower) hoặc thông lượng thấp hơn (better=higher) quá threshold
+    old = {row["name"]: row for row in baseline["results"]}
+    regressions = []
+    for row in current["results"]:
+        before = old.get(row["name"])
+        if before is None or not before["value"] or row["value"] is None: continue
+        change = row["value"] / before["value"] - 1
+        worse = change > threshold if row["better"] == "lower" else change < -threshold
+        if worse: regressions.append({"name": row["name"], "before": before["value"], "after": row["value"],
+                                      "change_pct": round(change * 100, 1), "unit": row["unit"]})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark chiến lược, consensus, ingest và API /api/taimd5")
+    parser.add_argument("--suite", action="append", choices=SUITES, help="Bộ cần chạy (lặp lại được; mặc định: tất cả)")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="Độ dài lịch sử, phân cách dấu phẩy")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--ingest-sessions", type=int, default=20_000)
+    parser.add_argument("--pollers", default="1,16,64", help="Số poller đồng thời cho bộ http, phân cách dấu phẩy")
+    parser.add_argument("--duration", type=float, default=5.0, help="Số giây tải mỗi mức poller")
+    parser.add_argument("--url", default=None, help="URL /api/taimd5 có sẵn (mặc định: tự dựng server cục bộ)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="File JSON kết quả ('' = không ghi)")
+    parser.add_argument("--compare", default=None, help="File JSON của lần chạy trước để đánh dấu hồi quy")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Ngưỡng hồi quy tương đối (0.10 = 10%%)")
+    parser.add_argument("--json", action="store_true", help="In toàn bộ kết quả dạng JSON")
+    args = parser.parse_args(argv)
+    setup_logging(logging.WARNING)
+
+    report = run(args.suite or SUITES, [int(n) for n in args.sizes.split(",")], args.repeat, args.seed,
+                 args.ingest_sessions, [int(n) for n in args.pollers.split(",")], args.duration, args.url)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            report["regressions"] = compare(json.load(f), report, args.threshold)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for row in report["results"]:
+            print(f"{row['name']:<60} {str(row['value']):>12} {row['unit']}")
+        for row in report.get("regressions", ()):
+            print(f"❌ Hồi quy {row['name']}: {row['before']} -> {row['after']} {row['unit']} ({row['change_pct']:+}%)")
+        if args.output: print(f"Đã ghi kết quả vào {args.output}")
+    return 1 if report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
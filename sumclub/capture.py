@@ -0,0 +1,110 @@
+import gzip
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+
+from .config import CAPTURE_FLUSH_INTERVAL
+
+# ================== GHI LẠI FRAME WEBSOCKET THÔ (Raw Frame Capture) ==================
+# Mỗi bàn ghi mọi frame SignalR nhận được (kể cả keepalive "{}") vào một file .cap.gz riêng, để phát
+# lại đúng những gì đường ingest đã thấy mà không cần mạng (python -m sumclub.replay). Bố cục gzip:
+#   magic "SCCAP01\n" | bản ghi đầu: header JSON (bàn, base_url, hub_name) | các bản ghi frame
+# Mỗi bản ghi = CAPTURE_RECORD (thời điểm nhận, epoch giây f64 | độ dài u32) + frame UTF-8.
+# Luồng ingest chỉ nén vào bộ đệm; luồng nền flush (Z_SYNC_FLUSH) theo lô nên tiến trình chết chỉ mất
+# tối đa CAPTURE_FLUSH_INTERVAL giây cuối, và phần đã flush vẫn đọc được.
+CAPTURE_MAGIC = b"SCCAP01\n"
+CAPTURE_RECORD = struct.Struct("<dI")
+
+
+def capture_path(name, directory):
+    # Mỗi lần khởi động một file mới, nên không bao giờ ghi nối vào capture đang được phát lại
+    return os.path.join(directory, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.cap.gz")
+
+
+class FrameRecorder:
+    def __init__(self, path, table, flush_interval=CAPTURE_FLUSH_INTERVAL):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = 0
+        self._closed = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = gzip.open(path, "wb", compresslevel=6)
+        self._file.write(CAPTURE_MAGIC)
+        self._write(time.time(), json.dumps({"table": table.name, "base_url": table.base_url,
+                                             "hub_name": table.hub_name}).encode("utf-8"))
+
+    def _write(self, received, payload):
+        self._file.write(CAPTURE_RECORD.pack(received, len(payload)))
+        self._file.write(payload)
+
+    def write(self, frame, received=None):
+        payload = frame.encode("utf-8") if isinstance(frame, str) else frame
+        with self._lock:
+            if self._closed: return
+            self._write(time.time() if received is None else received, payload)
+            self._pending += 1
+
+    def flush(self):
+        with self._lock:
+            if not self._pending or self._closed: return
+            self._file.flush(zlib.Z_SYNC_FLUSH)
+            self._pending = 0
+
+    def _flusher(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logging.error(f"❌ Lỗi ghi capture {self.path}: {e}")
+
+    def start_flusher(self):
+        threading.Thread(target=self._flusher, daemon=True, name="capture-flusher").start()
+        return self
+
+    def close(self):
+        with self._lock:
+            if self._closed: return
+            self._closed = True
+            self._file.close()
+        self._wake.set()
+
+
+def read_capture(path):
+    # Trả về (header, iterator các (thời điểm nhận, frame str)). Capture bị cắt ngang (tiến trình chết
+    # giữa lúc ghi) vẫn đọc được tới bản ghi trọn vẹn cuối cùng.
+    f = gzip.open(path, "rb")
+    if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+        f.close()
+        raise ValueError(f"{path} không phải file capture frame (thiếu magic {CAPTURE_MAGIC!r})")
+    header = next(_records(f, path), None)
+    if header is None:
+        f.close()
+        raise ValueError(f"{path} thiếu header capture")
+
+    def frames():
+        with f:
+            for received, payload in _records(f, path):
+                yield received, payload.decode("utf-8")
+
+    return dict(json.loads(header[1]), started=header[0]), frames()
+
+
+def _records(f, path):
+    size = CAPTURE_RECORD.size
+    try:
+        while True:
+            head = f.read(size)
+            if len(head) < size: return
+            received, length = CAPTURE_RECORD.unpack(head)
+            payload = f.read(length)
+            if len(payload) < length: return
+            yield received, payload
+    except (EOFError, zlib.error, gzip.BadGzipFile):
+        logging.warning(f"⚠️ Capture {path} bị cắt ngang, dừng ở bản ghi trọn vẹn cuối cùng")
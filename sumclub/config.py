@@ -0,0 +1,106 @@
+import logging
+import os
+
+# ================== CẤU HÌNH HỆ THỐNG VÀ BIẾN TOÀN CỤC ==================
+# Chỉ đọc biến môi trường, không có tác dụng phụ lúc import: logging chỉ được cấu hình bởi các
+# điểm chạy (python -m sumclub...), không phải bởi thư viện.
+BASE_URL = "https://taixiu1.gsum01.com"
+HUB_NAME = "luckydice1Hub"
+USER_ID = "SUPER_VIP_ANALYST_60_FORMULAS_V3"
+
+# Các bàn theo dõi đồng thời trong một tiến trình: "ten=BASE_URL|HUB_NAME;ten2=...".
+# Bàn đầu tiên là bàn mặc định, phục vụ ở /api/taimd5; mọi bàn có /api/<ten>/taimd5.
+TABLES_SPEC = os.environ.get("SUMCLUB_TABLES", f"luckydice1={BASE_URL}|{HUB_NAME}")
+
+# Số phiên giữ lại trong RAM để phân tích (có thể nâng lên hàng triệu, ~2.25 byte/phiên)
+HISTORY_CAPACITY = int(os.environ.get("SUMCLUB_HISTORY_CAPACITY", "300"))
+
+# Số phiên gần nhất đóng băng kèm mỗi snapshot công bố cho API
+SNAPSHOT_HISTORY = 15
+# Thời gian tối đa giữ một request long-poll / khoảng gửi keepalive của SSE (giây)
+LONG_POLL_TIMEOUT = 25
+SSE_KEEPALIVE = 15
+# Máy chủ đẩy asyncio (push.py) phục vụ SSE + long-poll, mỗi subscriber một task thay vì một thread;
+# Flask chuyển hướng (307) các request đó sang cổng này. Mặc định 0 = tắt (opt-in): Flask tự giữ request
+# như cũ, triển khai chỉ mở một cổng / đứng sau proxy một cổng không bị hỏng khi nâng cấp.
+# PUSH_PUBLIC_URL: gốc URL công khai của máy chủ đẩy khi đứng sau reverse proxy (mặc định: cùng host, PUSH_PORT)
+PUSH_PORT = int(os.environ.get("SUMCLUB_PUSH_PORT", "0"))
+PUSH_PUBLIC_URL = os.environ.get("SUMCLUB_PUSH_PUBLIC_URL", "")
+
+# Nhật ký phiên nhị phân (append-only) để khởi động lại "nóng"; đặt rỗng để tắt
+SESSION_LOG_PATH = os.environ.get("SUMCLUB_SESSION_LOG", "sumclub_sessions.bin")
+# fsync theo lô: tối đa mỗi SESSION_LOG_FSYNC_INTERVAL giây, hoặc sớm hơn khi đủ SESSION_LOG_FSYNC_EVERY bản ghi
+SESSION_LOG_FSYNC_INTERVAL = 1.0
+SESSION_LOG_FSYNC_EVERY = 256
+
+# Chuỗi Markov bậc k trên toàn bộ lịch sử đang giữ (1..12 phiên làm trạng thái) và hệ số suy giảm
+# mỗi phiên (1.0 = không suy giảm, 0.99 = phiên cách đây 69 phiên chỉ còn nửa trọng số)
+MARKOV_ORDER = int(os.environ.get("SUMCLUB_MARKOV_ORDER", "3"))
+MARKOV_DECAY = float(os.environ.get("SUMCLUB_MARKOV_DECAY", "1.0"))
+
+# Thư mục chứa snapshot dùng chung giữa tiến trình ingest và các tiến trình API (api_worker.py);
+# rỗng = chỉ phục vụ trong tiến trình (mặc định). Nên đặt trên tmpfs, VD /dev/shm/sumclub.
+SHARED_SNAPSHOT_DIR = os.environ.get("SUMCLUB_SHARED_DIR", "")
+SHARED_SNAPSHOT_BYTES = 64 * 1024 # dung lượng tối đa body /api/taimd5 trong segment
+SHARED_POLL_INTERVAL = 0.05       # chu kỳ thăm dò segment của MỘT luồng poller / tiến trình API
+
+# Thư mục ghi lại mọi frame SignalR thô nhận được (gzip, có dấu thời gian) để phát lại offline bằng
+# python -m sumclub.replay; rỗng = tắt (mặc định). Bộ ghi flush theo lô tối đa mỗi CAPTURE_FLUSH_INTERVAL giây.
+CAPTURE_DIR = os.environ.get("SUMCLUB_CAPTURE_DIR", "")
+CAPTURE_FLUSH_INTERVAL = 1.0
+
+# Cửa sổ thống kê phân bố tổng của /api/stats (độc lập với HISTORY_CAPACITY, xem SessionIndex) và kích thước trang /api/history
+STATS_WINDOWS = (1000, 10000, 100000)
+# Cửa sổ thống kê xúc xắc của /api/dice (mặt, vị trí, bộ ba / đôi), ví dụ SUMCLUB_DICE_WINDOWS=50,500
+DICE_STATS_WINDOWS = tuple(int(w) for w in os.environ.get("SUMCLUB_DICE_WINDOWS", "100,1000,10000").split(",") if w.strip())
+HISTORY_PAGE_DEFAULT = 100
+HISTORY_PAGE_MAX = 1000
+# Số chuỗi tối đa mỗi request POST /api/predict/batch
+PREDICT_BATCH_MAX = int(os.environ.get("SUMCLUB_PREDICT_BATCH_MAX", "10000"))
+
+# Bảng điểm trực tuyến của 25 chiến lược: cửa sổ tỷ lệ đúng, và chế độ consensus
+#   "confidence" (mặc định): trọng số = do_tin_cay tự khai báo (như bản gốc)
+#   "accuracy": do_tin_cay x tỷ lệ đúng đo được trên cửa sổ SCOREBOARD_WEIGHT_WINDOW
+SCOREBOARD_WINDOWS = (20, 100, 500)
+SCOREBOARD_WEIGHT_WINDOW = 100
+CONSENSUS_MODE = os.environ.get("SUMCLUB_CONSENSUS_MODE", "confidence")
+
+# Tính trước consensus cho cả 16 tổng có thể của phiên kế tiếp trong lúc rảnh giữa hai phiên, để công bố
+# phiên mới chỉ còn một lần tra bảng (đặt SUMCLUB_SPECULATE=0 để tắt)
+SPECULATE_ENABLED = os.environ.get("SUMCLUB_SPECULATE", "1") != "0"
+
+# Số khóa hậu tố tối đa của mỗi ConsensusMemo (LRU) cho backtest / POST /api/predict/batch; 0 = tắt (mặc định).
+# Kho phiên ngẫu nhiên gần như không lặp lại hậu tố 20 tổng, nên chỉ nên bật cho dữ liệu lặp lại (lịch sử
+# ngắn, chấm lại cùng dữ liệu, client gửi lại cùng cửa sổ).
+CONSENSUS_MEMO_SIZE = int(os.environ.get("SUMCLUB_CONSENSUS_MEMO_SIZE", "0"))
+
+# Đo độ trễ hot path và xuất ra /metrics (đặt SUMCLUB_METRICS=0 để tắt hoàn toàn)
+METRICS_ENABLED = os.environ.get("SUMCLUB_METRICS", "1") != "0"
+
+
+# Logging không chặn (xem logpipe.py): luồng ingest chỉ đẩy bản ghi vào hàng đợi có giới hạn LOG_QUEUE_SIZE,
+# một luồng nền định dạng và ghi stderr (hàng đợi đầy -> bỏ bản ghi, không bao giờ chờ). SUMCLUB_LOG_QUEUE=0
+# quay về ghi đồng bộ như cũ. SUMCLUB_LOG_FORMAT=json ghi mỗi dòng một JSON (kèm table / event / phien).
+# Lỗi lặp lại (cùng mẫu thông điệp + bàn) chỉ ghi LOG_RATE_BURST dòng mỗi LOG_RATE_INTERVAL giây;
+# dòng dự đoán mỗi phiên chỉ ghi 1 / LOG_SESSION_EVERY phiên.
+LOG_QUEUE_ENABLED = os.environ.get("SUMCLUB_LOG_QUEUE", "1") != "0"
+LOG_QUEUE_SIZE = 10000
+LOG_FORMAT = os.environ.get("SUMCLUB_LOG_FORMAT", "text")
+LOG_RATE_INTERVAL = float(os.environ.get("SUMCLUB_LOG_RATE_INTERVAL", "60"))
+LOG_RATE_BURST = int(os.environ.get("SUMCLUB_LOG_RATE_BURST", "5"))
+LOG_SESSION_EVERY = max(1, int(os.environ.get("SUMCLUB_LOG_SESSION_EVERY", "1")))
+
+# Nhật ký kiểm toán phiên (phiên, xúc xắc, dự đoán đã công bố) mỗi bàn một file trong AUDIT_DIR, ghi bởi
+# luồng nền: "jsonl" (mặc định) hoặc "bin" (AUDIT_RECORD 24 byte). Rỗng = tắt.
+AUDIT_DIR = os.environ.get("SUMCLUB_AUDIT_DIR", "")
+AUDIT_FORMAT = os.environ.get("SUMCLUB_AUDIT_FORMAT", "jsonl")
+AUDIT_QUEUE_SIZE = 10000
+
+
+def setup_logging(level=logging.INFO, queued=LOG_QUEUE_ENABLED):
+    # Cấu hình logging; mặc định qua hàng đợi + luồng nền để không handler nào chặn luồng ingest
+    if queued or LOG_FORMAT == "json":
+        from .logpipe import install_logging # chỉ entrypoint mới cần, import lõi không nạp
+        install_logging(level, queued=queued)
+        return
+    logging.basicConfig(level=level, format='[%(asctime)s] [%(levelname)s] %(message)s')
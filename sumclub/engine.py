@@ -0,0 +1,572 @@
+import copy
+import time
+from array import array
+from collections import deque
+
+from .config import MARKOV_ORDER, SCOREBOARD_WEIGHT_WINDOW, SCOREBOARD_WINDOWS
+from .metrics import CONSENSUS_SECONDS
+from .strategies import _strategy_timers, aggregate_consensus
+
+# ================== ĐỘNG CƠ PHÂN TÍCH GIA TĂNG O(1) (Incremental Analysis Engine) ==================
+# Thay vì cắt lại history[-20:] và quét lại toàn bộ cho mỗi phiên, động cơ giữ sẵn các bộ đếm trượt
+# (chuỗi bệt, số Tài theo cửa sổ, chẵn/lẻ, chạm biên, tổng trọng số...) và cập nhật O(1) mỗi phiên.
+# Kết quả 25 chiến lược GIỐNG HỆT các hàm sN_* ở trên (chúng vẫn là bản tham chiếu), miễn là
+# lịch sử được giữ >= ENGINE_MAX_WINDOW phiên (mọi chiến lược chỉ nhìn tối đa 20 phiên cuối).
+ENGINE_MAX_WINDOW = 20
+
+def _label(bit):
+    return "Tài" if bit else "Xỉu"
+
+
+# ================== BẢNG TRA MẪU HÌNH ĐUÔI (Compiled Suffix-Pattern Table) ==================
+# Các chiến lược "hình dạng" (gương 8, 2-1-2, bệt cung, A A B B A A, lặp 3, bệt 4) chỉ phụ thuộc vào
+# vài bit kết quả cuối + độ dài lịch sử. Động cơ giữ một số nguyên trượt SHAPE_BITS bit (bit 0 = phiên
+# mới nhất); mọi quy tắc được biên dịch sẵn thành một bảng tra theo (độ dài, đuôi bit), nên tất cả
+# các mẫu hình cộng lại chỉ tốn MỘT lần tra bảng mỗi phiên.
+#
+# Thêm mẫu hình mới: thêm một dòng vào SHAPE_RULES (tên, số phiên tối thiểu, kết quả khi chưa đủ phiên,
+# độ tin cậy mặc định, hàm khớp). Hàm khớp nhận tuple bit b (cũ -> mới, đọc b[-1], b[-2]...) và trả về
+# (bit dự đoán, độ tin cậy) hoặc None -> dùng kết quả mặc định (theo phiên cuối). Chi phí mỗi phiên
+# không đổi; chỉ thời gian biên dịch bảng (lúc import) tăng.
+SHAPE_BITS = 8
+SHAPE_MASK = (1 << SHAPE_BITS) - 1
+
+SHAPE_RULES = [
+    # 5. Gương 8: A B C D D C B A -> lặp lại A
+    ("s5_complex_mirror_8", 8, ("Tài", 60.0), 70.0,
+     lambda b: (b[-8], 98.5) if b[-8] == b[-1] and b[-7] == b[-2] and b[-6] == b[-3] and b[-5] == b[-4] else None),
+    # 8. Bệt 4 (T T T T / X X X X) -> đảo chiều
+    ("s8_anti_martingale_rebalance", 6, ("Xỉu", 60.0), 70.0,
+     lambda b: (1 - b[-1], 96.0) if b[-4] == b[-3] == b[-2] == b[-1] else None),
+    # 11. Cầu 2-1-2: T T X T T -> đảo chiều
+    ("s11_double_alternating_reversal", 6, ("Tài", 60.0), 70.0,
+     lambda b: (1 - b[-1], 95.0) if b[-5] == b[-4] and b[-2] == b[-1] and b[-5] == b[-1] and b[-3] != b[-5] else None),
+    # 13. Bệt 3 - Đảo 1 - Bệt 3 -> đảo chiều
+    ("s13_arc_streak_pattern", 9, ("Tài", 60.0), 70.0,
+     lambda b: (1 - b[-7], 95.0) if b[-7] == b[-6] == b[-5] and b[-3] == b[-2] == b[-1] and b[-4] != b[-7] else None),
+    # 18. A A B B A A -> B
+    ("s18_mirror_repeat_6", 6, ("Xỉu", 60.0), 70.0,
+     lambda b: (b[-4], 93.0) if b[-6] == b[-5] and b[-4] == b[-3] and b[-2] == b[-1] and b[-6] == b[-2]
+     and b[-6] != b[-4] else None),
+    # 22. Lặp 3 phiên: A B C A B C -> đảo chiều
+    ("s22_three_session_repeat", 6, ("Xỉu", 60.0), 70.0,
+     lambda b: (1 - b[-1], 95.0) if b[-6] == b[-3] and b[-5] == b[-2] and b[-4] == b[-1] else None),
+]
+
+def compile_shape_table(rules, bits=SHAPE_BITS):
+    # Trả về (bảng, số độ dài tối đa, vị trí theo tên); bảng[(min(length, cap) << bits) | đuôi] là tuple
+    # kết quả theo đúng thứ tự rules. Các dict kết quả được dùng chung -> chỉ đọc, không được sửa.
+    cap = max(rule[1] for rule in rules)
+    interned = {}
+    def result(du_doan, conf):
+        return interned.setdefault((du_doan, conf), {"du_doan": du_doan, "do_tin_cay": conf})
+    table = []
+    for length in range(cap + 1):
+        for suffix in range(1 << bits):
+            b = tuple((suffix >> (bits - 1 - i)) & 1 for i in range(bits))
+            row = []
+            for name, min_length, short, fallback, match in rules:
+                if length < min_length:
+                    row.append(result(*short))
+                    continue
+                hit = match(b)
+                row.append(result(_label(hit[0]), hit[1]) if hit else result(_label(b[-1]), fallback))
+            table.append(tuple(row))
+    return table, cap, {rule[0]: i for i, rule in enumerate(rules)}
+
+SHAPE_TABLE, SHAPE_LENGTH_CAP, SHAPE_SLOTS = compile_shape_table(SHAPE_RULES)
+
+_SHAPE_S5 = SHAPE_SLOTS["s5_complex_mirror_8"]
+_SHAPE_S8 = SHAPE_SLOTS["s8_anti_martingale_rebalance"]
+_SHAPE_S11 = SHAPE_SLOTS["s11_double_alternating_reversal"]
+_SHAPE_S13 = SHAPE_SLOTS["s13_arc_streak_pattern"]
+_SHAPE_S18 = SHAPE_SLOTS["s18_mirror_repeat_6"]
+_SHAPE_S22 = SHAPE_SLOTS["s22_three_session_repeat"]
+
+class IncrementalAnalysisEngine:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.length = 0
+        # Bit kết quả (1 = Tài) và tổng điểm của ENGINE_MAX_WINDOW phiên gần nhất
+        self.bits = deque(maxlen=ENGINE_MAX_WINDOW)
+        self.tots = deque(maxlen=ENGINE_MAX_WINDOW)
+        self.streak = 0                    # s1, s8: độ dài chuỗi bệt hiện tại
+        self.tai5 = self.tai14 = self.tai20 = 0  # s15/s19, s16, s4/s24: số Tài trong cửa sổ
+        self.same_pairs10 = 0              # s14: số cặp liền kề giống nhau trong 10 phiên
+        self.sum5 = self.sum10 = self.sum15 = 0  # s19, s3: tổng điểm theo cửa sổ
+        self.wsum15 = 0                    # s3: tổng trọng số 1..15 (phiên mới nhất trọng số 15)
+        self.extreme5 = 0                  # s6: số lần ra 3 hoặc 18 trong 5 phiên
+        self.high4 = 0                     # s21: số tổng 13..17 trong 4 phiên
+        self.center7 = 0                   # s23: số tổng 10/11 trong 7 phiên
+        self.odd8 = 0                      # s7: số tổng lẻ trong 8 phiên
+        self.tai_dist10 = self.xiu_dist10 = 0  # s12: khoảng cách tới 10.5, nhân 2 để giữ số nguyên
+        self.hi15 = self.lo15 = 0          # s20: số lần chạm biên >= 15 / <= 6 trong 15 phiên
+        self.suffix = 0                    # SHAPE_BITS kết quả cuối, bit 0 = phiên mới nhất
+        self.shapes = SHAPE_TABLE[0]       # kết quả các mẫu hình (SHAPE_RULES) cho phiên hiện tại
+
+    def push(self, ketqua, tong):
+        bit = 1 if ketqua == "Tài" else 0
+        bits, tots = self.bits, self.tots
+        n = len(bits)
+
+        # Phần tử rơi khỏi cửa sổ k là phần tử thứ k tính từ cuối (trước khi thêm phiên mới)
+        if n >= 5:
+            old = tots[-5]
+            self.tai5 -= bits[-5]
+            self.sum5 -= old
+            self.extreme5 -= old in (3, 18)
+        if n >= 4:
+            self.high4 -= 13 <= tots[-4] <= 17
+        if n >= 7:
+            self.center7 -= tots[-7] in (10, 11)
+        if n >= 8:
+            self.odd8 -= tots[-8] % 2
+        if n >= 10:
+            old = tots[-10]
+            self.sum10 -= old
+            if bits[-10]: self.tai_dist10 -= 2 * old - 21
+            else: self.xiu_dist10 -= 21 - 2 * old
+            self.same_pairs10 -= bits[-10] == bits[-9]
+        if n >= 14:
+            self.tai14 -= bits[-14]
+        # Tổng trọng số: mọi trọng số giảm 1 (trừ đi tổng cửa sổ cũ), phiên mới nhận trọng số 15
+        self.wsum15 -= self.sum15
+        if n >= 15:
+            old = tots[-15]
+            self.sum15 -= old
+            self.hi15 -= old >= 15
+            self.lo15 -= old <= 6
+        if n >= 20:
+            self.tai20 -= bits[-20]
+
+        if n and bits[-1] == bit:
+            self.streak += 1
+        else:
+            self.streak = 1
+        if n:
+            self.same_pairs10 += bits[-1] == bit
+
+        bits.append(bit)
+        tots.append(tong)
+        self.length += 1
+        self.tai5 += bit
+        self.tai14 += bit
+        self.tai20 += bit
+        self.sum5 += tong
+        self.sum10 += tong
+        self.sum15 += tong
+        self.wsum15 += 15 * tong
+        self.extreme5 += tong in (3, 18)
+        self.high4 += 13 <= tong <= 17
+        self.center7 += tong in (10, 11)
+        self.odd8 += tong % 2
+        if bit: self.tai_dist10 += 2 * tong - 21
+        else: self.xiu_dist10 += 21 - 2 * tong
+        self.hi15 += tong >= 15
+        self.lo15 += tong <= 6
+        self.suffix = ((self.suffix << 1) | bit) & SHAPE_MASK
+        self.shapes = SHAPE_TABLE[(min(self.length, SHAPE_LENGTH_CAP) << SHAPE_BITS) | self.suffix]
+
+    # ---- 25 chiến lược, cùng thứ tự với all_super_vip_algos ----
+    def _s1(self):
+        if self.length < 13: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        last = _label(self.bits[-1])
+        streak = min(self.streak, self.length)
+        if streak in (5, 8): return {"du_doan": last, "do_tin_cay": 90.0}
+        if streak >= 13: return {"du_doan": _label(not self.bits[-1]), "do_tin_cay": 99.5}
+        return {"du_doan": last, "do_tin_cay": 70.0}
+
+    def _s2(self):
+        if self.length < 10: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        b = self.bits
+        recent = [b[i] for i in range(-10, 0)]
+        last_3 = recent[-3:]
+        tai_prob = xiu_prob = 0
+        for i in range(7):
+            if recent[i:i+3] == last_3:
+                if recent[i+3]: tai_prob += 1
+                else: xiu_prob += 1
+        if tai_prob + xiu_prob > 2:
+            if tai_prob > xiu_prob * 2: return {"du_doan": "Tài", "do_tin_cay": 94.0}
+            if xiu_prob > tai_prob * 2: return {"du_doan": "Xỉu", "do_tin_cay": 94.0}
+        return {"du_doan": _label(b[-1]), "do_tin_cay": 75.0}
+
+    def _s3(self):
+        if self.length < 15: return {"du_doan": "Xỉu", "do_tin_cay": 65.0}
+        weighted_mean = self.wsum15 / 120 # sum(range(1, 16))
+        if weighted_mean > 11.5: return {"du_doan": "Xỉu", "do_tin_cay": 96.0}
+        if weighted_mean < 9.5: return {"du_doan": "Tài", "do_tin_cay": 96.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 72.0}
+
+    def _s4(self):
+        if self.length < 20: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        b = self.bits
+        tai_count, xiu_count = self.tai20, 20 - self.tai20
+        if max(tai_count, xiu_count) >= 15: return {"du_doan": _label(not b[-1]), "do_tin_cay": 97.0}
+        if min(tai_count, xiu_count) >= 8:
+            if b[-2] != b[-1]: return {"du_doan": _label(b[-2]), "do_tin_cay": 85.0}
+            return {"du_doan": _label(not b[-1]), "do_tin_cay": 90.0}
+        return {"du_doan": _label(b[-1]), "do_tin_cay": 70.0}
+
+    def _s5(self):
+        return self.shapes[_SHAPE_S5]
+
+    def _s6(self):
+        if self.length < 5: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        if self.extreme5:
+            if self.tots[-1] >= 11: return {"du_doan": "Xỉu", "do_tin_cay": 95.0}
+            return {"du_doan": "Tài", "do_tin_cay": 95.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 75.0}
+
+    def _s7(self):
+        if self.length < 8: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        if self.odd8 >= 6: return {"du_doan": "Xỉu", "do_tin_cay": 92.0}
+        if 8 - self.odd8 >= 6: return {"du_doan": "Tài", "do_tin_cay": 92.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 70.0}
+
+    def _s8(self):
+        return self.shapes[_SHAPE_S8]
+
+    def _s9(self):
+        if self.length < 7: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        t = self.tots
+        trend = (t[-3] + t[-2] + t[-1]) / 3 - (t[-7] + t[-6] + t[-5]) / 3
+        if trend > 1.5: return {"du_doan": "Tài", "do_tin_cay": 90.0}
+        if trend < -1.5: return {"du_doan": "Xỉu", "do_tin_cay": 90.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 75.0}
+
+    def _s10(self):
+        if self.length < 3: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        t1, t2, t3 = self.tots[-3], self.tots[-2], self.tots[-1]
+        if t3 > t2 and t2 > t1:
+            if t3 >= 12: return {"du_doan": "Xỉu", "do_tin_cay": 93.0}
+            return {"du_doan": "Tài", "do_tin_cay": 90.0}
+        if t3 < t2 and t2 < t1:
+            if t3 <= 9: return {"du_doan": "Tài", "do_tin_cay": 93.0}
+            return {"du_doan": "Xỉu", "do_tin_cay": 90.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 70.0}
+
+    def _s11(self):
+        return self.shapes[_SHAPE_S11]
+
+    def _s12(self):
+        if self.length < 10: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        # Cả hai vế đều nhân 2 nên phép so sánh tỷ lệ 1.5 không đổi
+        if self.tai_dist10 > self.xiu_dist10 * 1.5: return {"du_doan": "Xỉu", "do_tin_cay": 92.0}
+        if self.xiu_dist10 > self.tai_dist10 * 1.5: return {"du_doan": "Tài", "do_tin_cay": 92.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 75.0}
+
+    def _s13(self):
+        return self.shapes[_SHAPE_S13]
+
+    def _s14(self):
+        if self.length < 10: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        b = self.bits
+        streak_count = self.same_pairs10
+        alternating_count = 9 - streak_count
+        if streak_count > alternating_count * 2 and b[-1] == b[-2]:
+            return {"du_doan": _label(b[-1]), "do_tin_cay": 90.0}
+        if alternating_count > streak_count * 2 and b[-1] != b[-2]:
+            return {"du_doan": _label(b[-2]), "do_tin_cay": 90.0}
+        return {"du_doan": _label(b[-1]), "do_tin_cay": 73.0}
+
+    def _s15(self):
+        if self.length < 5: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        b = self.bits
+        if self.tai5 in (2, 3) and b[-2] != b[-1]: return {"du_doan": _label(b[-1]), "do_tin_cay": 93.0}
+        return {"du_doan": _label(b[-1]), "do_tin_cay": 70.0}
+
+    def _s16(self):
+        if self.length < 14: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        if self.tai14 >= 10: return {"du_doan": "Xỉu", "do_tin_cay": 95.0}
+        if self.tai14 <= 4: return {"du_doan": "Tài", "do_tin_cay": 95.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 70.0}
+
+    def _s17(self):
+        if self.length < 2: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        t = self.tots
+        if abs(t[-1] - t[-2]) >= 10:
+            return {"du_doan": "Xỉu" if t[-1] >= 11 else "Tài", "do_tin_cay": 99.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 75.0}
+
+    def _s18(self):
+        return self.shapes[_SHAPE_S18]
+
+    def _s19(self):
+        if self.length < 12: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        history_trend = 1 if self.tai5 > 2 else -1
+        sum_trend = self.sum5 / 5 - (self.sum10 - self.sum5) / 5
+        if history_trend == 1 and sum_trend < -0.5: return {"du_doan": "Xỉu", "do_tin_cay": 96.0}
+        if history_trend == -1 and sum_trend > 0.5: return {"du_doan": "Tài", "do_tin_cay": 96.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 75.0}
+
+    def _s20(self):
+        if self.length < 15: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        if self.hi15 >= 4: return {"du_doan": "Xỉu", "do_tin_cay": 94.0}
+        if self.lo15 >= 4: return {"du_doan": "Tài", "do_tin_cay": 94.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 70.0}
+
+    def _s21(self):
+        if self.length < 4: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        if self.high4 >= 3: return {"du_doan": "Xỉu", "do_tin_cay": 92.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 70.0}
+
+    def _s22(self):
+        return self.shapes[_SHAPE_S22]
+
+    def _s23(self):
+        if self.length < 7: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        if self.center7 >= 5:
+            return {"du_doan": "Tài" if self.tots[-1] == 11 else "Xỉu", "do_tin_cay": 97.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 75.0}
+
+    def _s24(self):
+        if self.length < 20: return {"du_doan": "Xỉu", "do_tin_cay": 60.0}
+        if self.tai20 >= 15: return {"du_doan": "Xỉu", "do_tin_cay": 98.0}
+        if self.tai20 <= 5: return {"du_doan": "Tài", "do_tin_cay": 98.0}
+        return {"du_doan": _label(self.bits[-1]), "do_tin_cay": 70.0}
+
+    def _s25(self):
+        if self.length < 4: return {"du_doan": "Tài", "do_tin_cay": 60.0}
+        b = self.bits
+        score = sum((1 if b[-4 + i] else -1) * w for i, w in enumerate((4, 3, 2, 1)))
+        if score >= 5: return {"du_doan": "Tài", "do_tin_cay": 92.0}
+        if score <= -5: return {"du_doan": "Xỉu", "do_tin_cay": 92.0}
+        return {"du_doan": _label(b[-1]), "do_tin_cay": 70.0}
+
+    def suffix_key(self):
+        # Cùng định dạng suffix_key(history, totals) của lịch sử đã đẩy vào (khóa cho ConsensusMemo)
+        n = min(self.length, ENGINE_MAX_WINDOW)
+        return bytes((n, n)) + bytes(self.tots) + bytes(self.bits)
+
+    def copy(self):
+        # Bản sao độc lập (2 deque <= 20 phần tử + vài số nguyên) để tính consensus ngoài khóa
+        twin = copy.copy(self)
+        twin.bits = deque(self.bits, maxlen=ENGINE_MAX_WINDOW)
+        twin.tots = deque(self.tots, maxlen=ENGINE_MAX_WINDOW)
+        return twin
+
+    def results(self):
+        return [fn(self) for fn in _INCREMENTAL_ALGOS]
+
+    def timed_results(self):
+        # Như results() nhưng ghi thời gian từng chiến lược vào sumclub_strategy_seconds
+        out = []
+        for fn, timer in zip(_INCREMENTAL_ALGOS, _strategy_timers):
+            t0 = time.perf_counter()
+            out.append(fn(self))
+            timer.observe(time.perf_counter() - t0)
+        return out
+
+    def evaluate(self, timed=False, weights=None):
+        # (kết quả 25 chiến lược, consensus); weights != None -> consensus thích ứng theo tỷ lệ đúng
+        if not timed:
+            results = self.results()
+            return results, aggregate_consensus(results, weights)
+        started = time.perf_counter()
+        results = self.timed_results()
+        consensus = aggregate_consensus(results, weights)
+        CONSENSUS_SECONDS.observe(time.perf_counter() - started)
+        return results, consensus
+
+    def predict(self, timed=False, weights=None):
+        return self.evaluate(timed, weights)[1]
+
+
+_INCREMENTAL_ALGOS = [getattr(IncrementalAnalysisEngine, f"_s{i}") for i in range(1, 26)]
+
+
+# ================== BẢNG CHUYỂN TRẠNG THÁI MARKOV BẬC K (k-order Markov Table) ==================
+# s2 chỉ xét 10 phiên cuối nên hiếm khi đủ mẫu. Bảng này đếm chuyển trạng thái trên TOÀN BỘ lịch sử
+# đang giữ: trạng thái là số nguyên k bit (k phiên cuối, bit 0 = mới nhất), bộ đếm là mảng phẳng
+# chỉ số (trạng thái << 1) | bit_kế_tiếp. Cập nhật và tra cứu đều O(1), không phụ thuộc độ dài lịch sử.
+#   window: chỉ giữ window chuyển trạng thái gần nhất (trừ dần chuyển trạng thái rơi khỏi cửa sổ); vòng
+#           chỉ lưu chỉ số đã nén (array('H'), 2 byte / phiên như SessionRingBuffer), trọng số của chuyển
+#           trạng thái rơi khỏi cửa sổ tính lại từ vị trí: weight * decay^window
+#   decay:  suy giảm mũ theo phiên; cài đặt "lười" bằng trọng số tăng dần thay vì nhân cả bảng
+MARKOV_MAX_ORDER = 12
+# Trọng số lười vượt ngưỡng này thì chuẩn hóa lại cả bảng (hiếm, chi phí khấu hao O(1))
+_MARKOV_RESCALE_AT = 1e200
+
+class MarkovTransitionTable:
+    def __init__(self, order=MARKOV_ORDER, window=None, decay=1.0):
+        if not 1 <= order <= MARKOV_MAX_ORDER:
+            raise ValueError(f"Bậc Markov phải trong 1..{MARKOV_MAX_ORDER}: {order}")
+        if not 0.0 < decay <= 1.0:
+            raise ValueError(f"Hệ số suy giảm phải trong (0, 1]: {decay}")
+        self.order = order
+        self.window = window
+        self.decay = decay
+        self.reset()
+
+    def reset(self):
+        self.mask = (1 << self.order) - 1
+        self.state = 0
+        self.seen = 0     # số phiên đã đẩy vào (trạng thái chỉ hợp lệ khi seen >= order)
+        # Không suy giảm: đếm số nguyên chính xác; có suy giảm: số thực theo trọng số lười
+        self.counts = [0 if self.decay == 1.0 else 0.0] * (2 << self.order)
+        self.weight = 1
+        # Vòng chỉ số (trạng thái << 1 | bit) của window chuyển trạng thái gần nhất; None = không giới hạn
+        self.recent = array("H", bytes(2 * self.window)) if self.window else None
+        self.transitions = 0 # số chuyển trạng thái đã đếm (vị trí ghi kế tiếp = transitions % window)
+        self._expire_factor = self.decay ** self.window if self.window else 0.0
+
+    def push(self, bit):
+        if self.seen >= self.order:
+            index = (self.state << 1) | bit
+            if self.decay != 1.0:
+                self.weight /= self.decay
+                if self.weight > _MARKOV_RESCALE_AT: self._rescale()
+            self.counts[index] += self.weight
+            if self.recent is not None:
+                slot = self.transitions % self.window
+                if self.transitions >= self.window:
+                    # Chuyển trạng thái cách đây đúng window lần đẩy: trọng số = weight hiện tại * decay^window
+                    old_index = self.recent[slot]
+                    if self.decay == 1.0: self.counts[old_index] -= 1
+                    else: self.counts[old_index] = max(0.0, self.counts[old_index] - self.weight * self._expire_factor)
+                self.recent[slot] = index
+            self.transitions += 1
+        self.state = ((self.state << 1) | bit) & self.mask
+        self.seen += 1
+
+    def _rescale(self):
+        scale = self.weight
+        self.counts = [c / scale for c in self.counts]
+        self.weight = 1.0
+
+    def lookup(self, state=None):
+        # (trọng số Tài, trọng số Xỉu) đã chuẩn hóa theo phiên hiện tại, cho trạng thái state
+        # (mặc định: k phiên cuối). Trả về (0, 0) khi chưa đủ k phiên.
+        if state is None:
+            if self.seen < self.order: return 0, 0
+            state = self.state
+        base = state << 1
+        if self.decay == 1.0: return self.counts[base | 1], self.counts[base]
+        return self.counts[base | 1] / self.weight, self.counts[base] / self.weight
+
+    def predict(self):
+        tai, xiu = self.lookup()
+        samples = tai + xiu
+        if not samples: return {"du_doan": None, "xac_suat_tai": None, "so_mau": 0, "bac": self.order}
+        return {"du_doan": "Tài" if tai >= xiu else "Xỉu", "xac_suat_tai": round(tai / samples, 4),
+                "so_mau": round(samples, 2), "bac": self.order}
+
+
+# ================== ĐỌC SEQLOCK (Bounded Seqlock Read) ==================
+# Người ghi tăng owner._version lên số lẻ trước khi sửa bộ đếm và lên số chẵn sau khi sửa xong. Người đọc
+# đọc lại nếu version lẻ / đã đổi, nhưng mỗi lần thất bại đều nhường GIL (time.sleep(0)) để luồng ghi
+# làm xong thay vì quay tại chỗ; sau SEQLOCK_RETRIES lần vẫn hỏng thì đọc dưới khóa ghi (nếu có).
+SEQLOCK_RETRIES = 64
+
+
+def seqlock_read(owner, read, lock=None):
+    for _ in range(SEQLOCK_RETRIES):
+        version = owner._version
+        if not version & 1:
+            snapshot = read()
+            if owner._version == version: return snapshot
+        time.sleep(0)
+    if lock is not None:
+        with lock:
+            return read()
+    while True:
+        version = owner._version
+        if not version & 1:
+            snapshot = read()
+            if owner._version == version: return snapshot
+        time.sleep(0)
+
+
+# ================== BẢNG ĐIỂM CHIẾN LƯỢC TRỰC TUYẾN (Online Strategy Scoreboard) ==================
+# Ghi lại dự đoán của từng chiến lược cho phiên N (record), chấm khi kết quả phiên N về (score).
+# Mỗi phiên được nén thành MỘT số nguyên: bit i = chiến lược i đoán đúng (bit cuối = consensus đã công bố);
+# vòng các số này cho phép cộng phiên mới / trừ phiên rơi khỏi từng cửa sổ -> O(1) mỗi phiên,
+# không phụ thuộc độ dài cửa sổ. Luồng API đọc qua stats() (seqlock_read), không lấy khóa trừ khi bị ghi chen liên tục.
+class StrategyScoreboard:
+    def __init__(self, names, windows=SCOREBOARD_WINDOWS, lock=None):
+        self.names = list(names)
+        self.slots = len(self.names) + 1 # + consensus
+        self.windows = tuple(sorted(set(windows)))
+        self._span = self.windows[-1]
+        self._masks = [0] * self._span
+        self._full = (1 << self.slots) - 1
+        self.scored = 0
+        self.window_hits = {w: [0] * self.slots for w in self.windows}
+        self.lifetime_hits = [0] * self.slots
+        self.pending = None # bit i = chiến lược i đoán Tài cho phiên kế tiếp
+        self.pending_after = None # mã phiên mà dự đoán đang chờ được lập sau đó (None = không rõ)
+        self.skipped = 0 # số dự đoán bị bỏ vì phiên kế tiếp không nối tiếp (mất phiên)
+        self._version = 0
+        self._lock = lock # khóa ghi của bàn, chỉ dùng khi seqlock_read thất bại quá nhiều lần
+
+    def record(self, results, consensus, phien=None):
+        mask = 0
+        for i, r in enumerate(results):
+            if r["du_doan"] == "Tài": mask |= 1 << i
+        if consensus["du_doan"] == "Tài": mask |= 1 << (self.slots - 1)
+        self.pending, self.pending_after = mask, phien
+
+    def score(self, bit, phien=None):
+        # Chấm dự đoán đang chờ với kết quả thực tế (bit 1 = Tài); bỏ qua nếu chưa có dự đoán. Như
+        # Speculator.lookup: phiên về không nối tiếp phiên đã dự đoán (phien != after + 1) -> dự đoán
+        # chưa từng thấy kết quả này, bỏ chứ không chấm
+        if self.pending is None: return
+        if phien is not None and self.pending_after is not None and phien != self.pending_after + 1:
+            self.pending = None
+            self.skipped += 1
+            return
+        self._version += 1
+        hits = ~(self.pending ^ (self._full if bit else 0)) & self._full
+        n = self.scored
+        for w in self.windows:
+            counts = self.window_hits[w]
+            if n >= w:
+                old = self._masks[(n - w) % self._span]
+                while old:
+                    low = old & -old
+                    counts[low.bit_length() - 1] -= 1
+                    old ^= low
+            fresh = hits
+            while fresh:
+                low = fresh & -fresh
+                counts[low.bit_length() - 1] += 1
+                fresh ^= low
+        fresh = hits
+        while fresh:
+            low = fresh & -fresh
+            self.lifetime_hits[low.bit_length() - 1] += 1
+            fresh ^= low
+        self._masks[n % self._span] = hits
+        self.scored = n + 1
+        self.pending = None
+        self._version += 1
+
+    def weights(self, window=SCOREBOARD_WEIGHT_WINDOW):
+        # Tỷ lệ đúng đã làm mượt Laplace (hits + 1) / (n + 2): chiến lược chưa có dữ liệu nhận 0.5
+        window = min((w for w in self.windows if w >= window), default=self._span)
+        n = min(self.scored, window)
+        counts = self.window_hits[window]
+        return [(counts[i] + 1) / (n + 2) for i in range(self.slots - 1)]
+
+    def weights_if(self, bit, window=SCOREBOARD_WEIGHT_WINDOW):
+        # Trọng số weights() SẼ có nếu phiên kế tiếp ra bit, không sửa bảng điểm (dùng cho tính trước).
+        # Cùng phép chia trên cùng số nguyên nên khớp từng bit với score(bit) rồi weights().
+        if self.pending is None: return self.weights(window)
+        window = min((w for w in self.windows if w >= window), default=self._span)
+        n = self.scored
+        hits = ~(self.pending ^ (self._full if bit else 0)) & self._full
+        old = self._masks[(n - window) % self._span] if n >= window else 0
+        counts = self.window_hits[window]
+        samples = min(n + 1, window)
+        return [(counts[i] + (hits >> i & 1) - (old >> i & 1) + 1) / (samples + 2) for i in range(self.slots - 1)]
+
+    def stats(self):
+        return seqlock_read(self, lambda: {
+            "scored": self.scored,
+            "skipped": self.skipped,
+            "windows": {w: list(c) for w, c in self.window_hits.items()},
+            "lifetime": list(self.lifetime_hits),
+        }, self._lock)
@@ -0,0 +1,78 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# ================== NGÂN SÁCH THỜI GIAN IMPORT LÕI (Import-time Budget) ==================
+# Worker batch chỉ cần chiến lược + consensus: `import sumclub` phải xong trong vài ms, không kéo theo
+# tầng web/ingest/numpy và không đụng vào cấu hình logging của tiến trình gọi. Mỗi lần đo chạy trong một
+# trình thông dịch mới (cache module trống), lấy lần nhanh nhất để giảm nhiễu; vượt ngân sách -> exit 1.
+#
+#   python -m sumclub.importtime                 # mặc định 25 ms, 5 lần đo
+#   python -m sumclub.importtime --budget-ms 10 --json
+
+IMPORT_BUDGET_MS = 25.0
+FORBIDDEN_MODULES = ("flask", "flask_cors", "werkzeug", "requests", "websocket", "aiohttp", "numpy")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import sumclub
+from sumclub import aggregate_consensus, ai_predict_super_consensus, all_super_vip_algos
+elapsed = time.perf_counter() - start
+import logging
+print(json.dumps({
+    "ms": elapsed * 1000,
+    "loaded": sorted(name for name in %r if name in sys.modules),
+    "root_handlers": len(logging.getLogger().handlers),
+}))
+"""
+
+
+def measure(repeat=5):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [root, os.environ.get("PYTHONPATH")])))
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", _PROBE % (FORBIDDEN_MODULES,)], env=env, check=True,
+                             capture_output=True, text=True).stdout
+        runs.append(json.loads(out))
+    best = min(runs, key=lambda run: run["ms"])
+    return {
+        "best_ms": round(best["ms"], 3),
+        "runs_ms": [round(run["ms"], 3) for run in runs],
+        "loaded": sorted({name for run in runs for name in run["loaded"]}),
+        "root_handlers": max(run["root_handlers"] for run in runs),
+    }
+
+
+def check(report, budget_ms=IMPORT_BUDGET_MS):
+    problems = []
+    if report["best_ms"] > budget_ms: problems.append(f"import sumclub mất {report['best_ms']:.1f} ms > {budget_ms:.1f} ms")
+    if report["loaded"]: problems.append(f"lõi nạp kèm module nặng: {', '.join(report['loaded'])}")
+    if report["root_handlers"]: problems.append("import sumclub đã cấu hình logging (root logger có handler)")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kiểm tra ngân sách thời gian import lõi sumclub")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args(argv)
+
+    report = measure(args.repeat)
+    problems = check(report, args.budget_ms)
+    if args.json:
+        print(json.dumps(dict(report, budget_ms=args.budget_ms, ok=not problems), ensure_ascii=False))
+    else:
+        print(f"import sumclub: {report['best_ms']:.2f} ms (ngân sách {args.budget_ms:.1f} ms), "
+              f"các lần đo: {', '.join(f'{ms:.2f}' for ms in report['runs_ms'])}")
+        for problem in problems: print(f"❌ {problem}")
+        if not problems: print("✅ Đạt ngân sách import")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+import argparse
+import json
+import logging
+import random
+import threading
+import time
+import urllib.parse
+
+import requests
+import websocket
+
+from .config import AUDIT_DIR, CAPTURE_DIR, METRICS_ENABLED, SHARED_SNAPSHOT_DIR, setup_logging
+from .metrics import WS_RECONNECTS
+from .state import prepare_tables, tables
+
+# ================== KẾT NỐI VÀ XỬ LÝ DỮ LIỆU REAL-TIME (WS) ==================
+# Lùi thời gian nối lại: lần đầu nối lại ngay, sau đó ngẫu nhiên trong [0, min(MAX, BASE * 2^n)]
+RECONNECT_BACKOFF_BASE = 0.25
+RECONNECT_BACKOFF_MAX = 15.0
+# Kết nối sống được lâu hơn mức này thì đếm lùi lại từ đầu
+RECONNECT_RESET_AFTER = 30.0
+
+
+def backoff_delay(attempt, base=RECONNECT_BACKOFF_BASE, cap=RECONNECT_BACKOFF_MAX, rng=random):
+    # Full jitter: tránh mọi bàn / mọi tiến trình cùng nối lại một lúc sau sự cố mạng
+    if attempt <= 0: return 0.0
+    return rng.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
+def get_connection_token(table):
+    try:
+        r = requests.get(f"{table.base_url}/signalr/negotiate?clientProtocol=1.5", timeout=5)
+        r.raise_for_status()
+        token = urllib.parse.quote(r.json()["ConnectionToken"], safe="")
+        logging.info("✅ [%s] Token: %s", table.name, token[:10] + "...", extra={"table": table.name, "event": "token"})
+        return token
+    except requests.exceptions.RequestException as e:
+        # Dạng lười (%s): khóa giới hạn tần suất là mẫu thông điệp, không phải nội dung lỗi thay đổi mỗi lần
+        logging.error("❌ [%s] Lỗi lấy token: %s", table.name, e, extra={"table": table.name, "event": "token_error"})
+        return None
+
+def ws_connect_url(table, token):
+    params = f"transport=webSockets&clientProtocol=1.5&connectionToken={token}&connectionData=%5B%7B%22name%22%3A%22{table.hub_name}%22%7D%5D&tid=5"
+    return f"{table.base_url.replace('https://', 'wss://', 1).replace('http://', 'ws://', 1)}/signalr/connect?{params}"
+
+def handle_hub_frame(table, message, received=None):
+    # Phân tích một frame SignalR thô và đưa các phiên đã có kết quả vào bàn; trả về số phiên đã công bố.
+    # Dùng chung cho client WebSocket đồng bộ, client asyncio (async_ingest.py) và bộ phát lại (replay.py).
+    received = time.perf_counter() if received is None else received
+    published = 0
+    try:
+        data = json.loads(message)
+        if "M" not in data: return published
+        
+        for m in data["M"]:
+            if m["H"].lower()==table.hub_name.lower() and m["M"]=="notifyChangePhrase":
+                info = m["A"][0]
+                res = info["Result"]
+                # Chỉ xử lý khi kết quả đã công bố (Dice1 != -1)
+                if res.get("Dice1", -1) == -1: return published
+                
+                dice = [res["Dice1"],res["Dice2"],res["Dice3"]]
+                if table.ingest(info["SessionID"], dice):
+                    published += 1
+                    if METRICS_ENABLED: table.ws_publish_timer.observe(time.perf_counter() - received)
+    except Exception as e:
+        logging.error("[%s] Lỗi Xử Lý Tin Nhắn WS: %s", table.name, e, extra={"table": table.name, "event": "frame_error"})
+    return published
+
+def connect_ws(table, token):
+    if not token: return
+    
+    ws_url = ws_connect_url(table, token)
+
+    def on_message(ws, message):
+        if table.recorder is not None: table.recorder.write(message)
+        handle_hub_frame(table, message)
+
+    def on_open(ws):
+        table.mark_ws_connected()
+
+    def on_error(ws, error):
+        logging.error("[%s] Lỗi WebSocket: %s", table.name, error, extra={"table": table.name, "event": "ws_error"})
+        
+    def on_close(ws, close_status_code, close_msg):
+        # Thời gian chờ nối lại do main_loop quyết định (backoff_delay), không ngủ cố định ở đây
+        logging.warning("⚠️ [%s] WebSocket đóng kết nối, sẽ tự động kết nối lại", table.name,
+                        extra={"table": table.name, "event": "ws_closed"})
+
+    ws = websocket.WebSocketApp(ws_url, on_open=on_open, on_message=on_message, on_error=on_error, on_close=on_close)
+    ws.run_forever(ping_interval=30, ping_timeout=10) # Thêm ping để duy trì kết nối
+
+# ================== CHU TRÌNH CHÍNH (MỖI BÀN MỘT THREAD) ==================
+# Client websocket-client cũ, giữ cho mã gọi trực tiếp main_loop; dịch vụ dùng AsyncIngestClient
+# (start_ingest_threads). Nối lại theo backoff_delay như client asyncio, không ngủ cố định 5-10s.
+def main_loop(table, stopping=None):
+    reconnects = WS_RECONNECTS.labels(table.name)
+    stopping = stopping or threading.Event()
+    attempt = 0
+    while not stopping.is_set():
+        if attempt: reconnects.inc()
+        connected_at = None
+        try:
+            logging.info("⚙️ [%s] Bắt đầu chu trình MAIN LOOP: Lấy token & Kết nối WebSocket...", table.name,
+                         extra={"table": table.name, "event": "connect"})
+            token = get_connection_token(table)
+            if token:
+                connected_at = time.monotonic()
+                connect_ws(table, token)
+                table.mark_ws_disconnected()
+            else:
+                logging.warning("[%s] Không lấy được Token, thử lại.", table.name,
+                                extra={"table": table.name, "event": "token_retry"})
+        except Exception as e:
+            logging.error("❌ [%s] Lỗi CRITICAL MAIN LOOP, khởi động lại: %s", table.name, e,
+                          extra={"table": table.name, "event": "main_loop_error"})
+        if connected_at is not None and time.monotonic() - connected_at >= RECONNECT_RESET_AFTER: attempt = 0
+        stopping.wait(backoff_delay(attempt))
+        attempt += 1
+
+
+def start_ingest_threads(table_states=None):
+    # Một event loop asyncio (một thread) cho mọi bàn, xem async_ingest.py; trả về (client, thread)
+    from .async_ingest import run_in_thread # aiohttp chỉ nạp khi thật sự chạy ingest
+    return run_in_thread(table_states)
+
+
+def run_ingest(shared_dir=None, capture_dir=None, audit_dir=None):
+    # Chỉ ingest (không Flask): dùng cùng api_worker, các tiến trình API đọc snapshot qua shared_dir
+    shared_dir = SHARED_SNAPSHOT_DIR if shared_dir is None else shared_dir
+    logging.info(f"🚀 Khởi động tiến trình ingest cho {len(tables)} bàn: {', '.join(tables)} -> {shared_dir or '(không chia sẻ)'}")
+    prepare_tables(shared_dir, capture_dir, audit_dir)
+    start_ingest_threads()
+    threading.Event().wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tiến trình ingest WebSocket (không Flask)")
+    parser.add_argument("--shared-dir", default=SHARED_SNAPSHOT_DIR,
+                        help="Thư mục ghi snapshot dùng chung cho api_worker (mặc định SUMCLUB_SHARED_DIR)")
+    parser.add_argument("--capture-dir", default=CAPTURE_DIR,
+                        help="Thư mục ghi lại frame WebSocket thô để phát lại (mặc định SUMCLUB_CAPTURE_DIR)")
+    parser.add_argument("--audit-dir", default=AUDIT_DIR,
+                        help="Thư mục ghi nhật ký kiểm toán phiên (mặc định SUMCLUB_AUDIT_DIR)")
+    args = parser.parse_args(argv)
+    setup_logging()
+    run_ingest(args.shared_dir, args.capture_dir, args.audit_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+from .config import AUDIT_FORMAT, AUDIT_QUEUE_SIZE, LOG_FORMAT, LOG_QUEUE_SIZE, LOG_RATE_BURST, LOG_RATE_INTERVAL
+from .metrics import LOG_RECORDS_DROPPED
+
+# ================== LOGGING KHÔNG CHẶN (Queue-based Logging Pipeline) ==================
+# Luồng ingest không bao giờ tự ghi stderr: DroppingQueueHandler chỉ put_nowait bản ghi CHƯA định dạng vào
+# hàng đợi có giới hạn, một QueueListener nền mới ghép thông điệp và ghi ra. Sink chậm (terminal, journald,
+# pipe bị nghẽn) chỉ làm đầy hàng đợi -> bản ghi bị bỏ và đếm ở sumclub_log_records_dropped_total, không
+# kéo dài thời gian giữ khóa / độ trễ công bố. RateLimitFilter chặn bão lỗi lặp lại (reconnect storm) ngay
+# ở luồng gọi, trước khi tốn chỗ trong hàng đợi. Log nên dùng dạng lười "... %s", arg và extra={"table": ...}
+# để khóa giới hạn tần suất ổn định và formatter JSON có trường có cấu trúc.
+TEXT_FORMAT = "[%(asctime)s] [%(levelname)s] %(message)s"
+STRUCTURED_FIELDS = ("table", "event", "phien")
+
+_listener = None
+_installed = None # (level, fmt) của install_logging có hàng đợi, để cài lại trong tiến trình con sau fork
+
+
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self._dropped = LOG_RECORDS_DROPPED.labels("log", "queue")
+
+    def prepare(self, record):
+        # Không định dạng ở luồng gọi (QueueHandler gốc gọi self.format); tham số log chỉ là str / số /
+        # list không bị sửa sau đó, nên luồng nền ghép msg % args vẫn ra đúng thông điệp
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._dropped.inc()
+
+
+class RateLimitFilter(logging.Filter):
+    # Bản ghi >= level cùng (logger, mức, mẫu thông điệp, bàn): tối đa burst dòng mỗi interval giây. Dòng
+    # đầu tiên của cửa sổ kế tiếp mang record.suppressed = số dòng đã bỏ để formatter ghi kèm.
+    def __init__(self, interval=LOG_RATE_INTERVAL, burst=LOG_RATE_BURST, level=logging.WARNING):
+        super().__init__()
+        self.interval, self.burst, self.level = interval, burst, level
+        self._windows = {} # khóa -> [đầu cửa sổ (monotonic), số dòng đã ghi, số dòng đã bỏ]
+        self._lock = threading.Lock()
+        self._dropped = LOG_RECORDS_DROPPED.labels("log", "rate_limited")
+
+    def filter(self, record):
+        if record.levelno < self.level or self.burst <= 0: return True
+        key = (record.name, record.levelno, record.msg, getattr(record, "table", None))
+        now = time.monotonic()
+        suppressed = 0
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                if window is not None: suppressed = window[2]
+                self._windows[key] = [now, 1, 0]
+                if len(self._windows) > 1024: self._prune(now)
+            elif window[1] < self.burst:
+                window[1] += 1
+            else:
+                window[2] += 1
+                self._dropped.inc()
+                return False
+        if suppressed: record.suppressed = suppressed
+        return True
+
+    def _prune(self, now):
+        # Mẫu thông điệp chứa dữ liệu động (f-string) sinh khóa mới liên tục: bỏ các cửa sổ đã hết hạn
+        for key in [key for key, window in self._windows.items() if now - window[0] >= self.interval]:
+            del self._windows[key]
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record):
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{line} (bỏ qua {suppressed} dòng tương tự)" if suppressed else line
+
+
+class JsonFormatter(logging.Formatter):
+    # Mỗi dòng một JSON: ts, level, logger, thread, msg + các trường có cấu trúc truyền qua extra
+    def format(self, record):
+        entry = {"ts": round(record.created, 3), "level": record.levelname, "logger": record.name,
+                 "thread": record.threadName, "msg": record.getMessage()}
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None: entry[field] = value
+        if getattr(record, "suppressed", 0): entry["suppressed"] = record.suppressed
+        if record.exc_info: entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def install_logging(level=logging.INFO, queued=True, fmt=LOG_FORMAT):
+    # Như logging.basicConfig: root logger đã có handler -> giữ nguyên cấu hình đang có
+    global _listener, _installed
+    root = logging.getLogger()
+    if root.handlers: return _listener
+    root.setLevel(level)
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT))
+    if not queued:
+        stream.addFilter(RateLimitFilter())
+        root.addHandler(stream)
+        return None
+    handler = DroppingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    handler.addFilter(RateLimitFilter())
+    root.addHandler(handler)
+    _listener = QueueListener(handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+    # Ghi nốt các bản ghi còn trong hàng đợi khi thoát bình thường
+    atexit.register(_listener.stop)
+    if _installed is None: os.register_at_fork(after_in_child=_reinstall_after_fork)
+    _installed = (level, fmt)
+    return _listener
+
+
+def _reinstall_after_fork():
+    # Luồng QueueListener không sống qua fork: tiến trình con (worker API, ingest của api_worker / bench)
+    # thừa kế QueueHandler không người đọc -> hàng đợi đầy rồi bỏ hết bản ghi; khóa của hàng đợi cũng có thể
+    # bị sao chép khi đang bị giữ. Bỏ handler cũ, dựng hàng đợi + listener mới cho chính tiến trình con.
+    global _listener
+    if _installed is None or _listener is None: return
+    root = logging.getLogger()
+    for handler in [h for h in root.handlers if isinstance(h, DroppingQueueHandler)]: root.removeHandler(handler)
+    _listener = None
+    level, fmt = _installed
+    listener = install_logging(level, queued=True, fmt=fmt)
+    if listener is None: return # root còn handler khác (cấu hình bên ngoài): giữ nguyên
+    # Tiến trình con của multiprocessing thoát bằng os._exit (không chạy atexit) và xóa Finalize thừa kế ngay
+    # sau fork: đăng ký Finalize xả hàng đợi từ hook after-fork của chính multiprocessing (chạy sau bước xóa)
+    from multiprocessing import util
+    util.register_after_fork(listener, lambda listener: util.Finalize(None, listener.stop, exitpriority=0))
+
+
+# ================== NHẬT KÝ KIỂM TOÁN PHIÊN (Session Audit Sink) ==================
+# Mỗi phiên đã công bố: thời điểm, mã phiên, xúc xắc, tổng, dự đoán + độ tin cậy đã công bố cho phiên đó.
+# Luồng ingest chỉ put_nowait một tuple; luồng nền gom lô, mã hóa và ghi nối (JSONL hoặc AUDIT_RECORD),
+# hàng đợi đầy -> bỏ và đếm ở sumclub_log_records_dropped_total{sink="audit"}.
+#   AUDIT_RECORD: thời điểm f64 | phiên i64 | d1 d2 d3 tổng u8 | dự đoán u8 (1 = Tài) | đệm | tin cậy x10 u16
+AUDIT_RECORD = struct.Struct("<dqBBBBBxH")
+AUDIT_BATCH = 1024
+
+
+def audit_path(name, directory, fmt=AUDIT_FORMAT):
+    # Ghi nối: cùng bàn luôn dùng cùng file qua các lần khởi động
+    return os.path.join(directory, f"{name}-audit.{'bin' if fmt == 'bin' else 'jsonl'}")
+
+
+class SessionAuditSink:
+    def __init__(self, path, name="audit", maxsize=AUDIT_QUEUE_SIZE):
+        self.path = path
+        self.binary = path.endswith(".bin")
+        self._queue = queue.Queue(maxsize)
+        self._dropped = LOG_RECORDS_DROPPED.labels("audit", "queue")
+        self._closed = False
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = open(path, "ab")
+        # Bỏ bản ghi nhị phân ghi dở ở cuối file (tiến trình chết giữa lúc ghi)
+        size = self._file.tell()
+        if self.binary and size % AUDIT_RECORD.size: self._file.truncate(size - size % AUDIT_RECORD.size)
+        self._thread = threading.Thread(target=self._writer, daemon=True, name=f"audit-{name}")
+        self._thread.start()
+
+    def record(self, phien_id, dice, result):
+        if self._closed: return
+        try:
+            self._queue.put_nowait((time.time(), phien_id, tuple(dice), result["du_doan"], result["do_tin_cay"]))
+        except queue.Full:
+            self._dropped.inc()
+
+    def _encode(self, item):
+        received, phien_id, dice, du_doan, do_tin_cay = item
+        if self.binary:
+            return AUDIT_RECORD.pack(received, phien_id, *dice, sum(dice), du_doan == "Tài", round(do_tin_cay * 10))
+        return (json.dumps({"ts": round(received, 3), "phien": phien_id, "xucxac": list(dice), "tong": sum(dice),
+                            "du_doan": du_doan, "do_tin_cay": do_tin_cay}, ensure_ascii=False) + "\n").encode("utf-8")
+
+    def _writer(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < AUDIT_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            chunks = []
+            for item in batch:
+                if item is None: continue
+                try:
+                    chunks.append(self._encode(item))
+                except (struct.error, TypeError, ValueError) as e:
+                    logging.error("❌ Bỏ bản ghi kiểm toán không hợp lệ %r: %s", item, e)
+            try:
+                self._file.write(b"".join(chunks))
+                self._file.flush()
+            except OSError as e:
+                logging.error("❌ Lỗi ghi nhật ký kiểm toán %s: %s", self.path, e)
+            if None in batch: return
+
+    def close(self):
+        if self._closed: return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=5)
+        self._file.close()
+
+
+def read_audit(path):
+    # Đọc lại nhật ký kiểm toán (JSONL hoặc nhị phân) thành các dict cùng khóa
+    if not path.endswith(".bin"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip(): yield json.loads(line)
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    for received, phien_id, d1, d2, d3, tong, tai, conf in AUDIT_RECORD.iter_unpack(data[:len(data) - len(data) % AUDIT_RECORD.size]):
+        yield {"ts": round(received, 3), "phien": phien_id, "xucxac": [d1, d2, d3], "tong": tong,
+               "du_doan": "Tài" if tai else "Xỉu", "do_tin_cay": conf / 10}
@@ -0,0 +1,152 @@
+import bisect
+import functools
+import threading
+import time
+
+from .config import METRICS_ENABLED
+
+# ================== ĐO LƯỜNG ĐỘ TRỄ (Prometheus Histograms) ==================
+# Histogram tối giản theo định dạng text của Prometheus, không cần thư viện ngoài. observe() chỉ
+# tăng một ô đếm (bisect trên các mốc); phần cộng dồn / định dạng chỉ chạy khi có người scrape.
+MICRO_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 5e-3, 1e-2, 0.1)
+REQUEST_BUCKETS = (1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 5e-2, 0.1, 0.5, 1, 5, 30)
+DOWNTIME_BUCKETS = (0.1, 0.5, 1, 2, 5, 10, 15, 30, 60, 300)
+
+_metrics_registry = []
+
+
+def _format_labels(names, values, extra=""):
+    parts = [f'{k}="{v}"' for k, v in zip(names, values)]
+    if extra: parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name, self.documentation = name, documentation
+        self.buckets, self.labelnames = tuple(buckets), tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if not labelnames: self._default = self.labels()
+        _metrics_registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def observe(self, value):
+        self._default.observe(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total = list(child._counts), child._sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{float(bound)!r}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, values)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class _CounterChild:
+    __slots__ = ("_value", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name, self.documentation = name, documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._children_lock = threading.Lock()
+        if not labelnames: self._default = self.labels()
+        _metrics_registry.append(self)
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._children_lock:
+                child = self._children.setdefault(values, _CounterChild())
+        return child
+
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {child._value!r}")
+        return lines
+
+
+def render_metrics():
+    lines = []
+    for metric in _metrics_registry: lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+STRATEGY_SECONDS = Histogram("sumclub_strategy_seconds", "Thời gian chạy từng chiến lược", MICRO_BUCKETS, ("strategy",))
+CONSENSUS_SECONDS = Histogram("sumclub_consensus_seconds", "Thời gian tính toàn bộ consensus 25 chiến lược", MICRO_BUCKETS)
+WS_PUBLISH_SECONDS = Histogram("sumclub_ws_frame_to_publish_seconds", "Từ lúc nhận frame WebSocket tới lúc công bố snapshot", MICRO_BUCKETS, ("table",))
+LOCK_WAIT_SECONDS = Histogram("sumclub_data_lock_wait_seconds", "Thời gian chờ lấy data_lock", MICRO_BUCKETS, ("table",))
+LOCK_HOLD_SECONDS = Histogram("sumclub_data_lock_hold_seconds", "Thời gian giữ data_lock", MICRO_BUCKETS, ("table",))
+HTTP_REQUEST_SECONDS = Histogram("sumclub_http_request_seconds", "Độ trễ xử lý request API", REQUEST_BUCKETS, ("endpoint",))
+WS_RECONNECTS = Counter("sumclub_ws_reconnects_total", "Số lần MAIN LOOP kết nối lại WebSocket", ("table",))
+SPECULATIVE_LOOKUPS = Counter("sumclub_speculative_lookups_total", "Tra bảng dự đoán tính trước khi phiên mới về (hit/miss/gap/cold)", ("table", "outcome"))
+LOG_RECORDS_DROPPED = Counter("sumclub_log_records_dropped_total", "Bản ghi log / kiểm toán bị bỏ vì hàng đợi đầy (queue) hoặc bị giới hạn tần suất (rate_limited)", ("sink", "reason"))
+WS_DOWNTIME_SECONDS = Histogram("sumclub_ws_downtime_seconds", "Thời gian mất kết nối WebSocket trước khi nối lại được", DOWNTIME_BUCKETS, ("table",))
+
+
+def long_poll_label(endpoint):
+    # Nhãn riêng cho request long-poll: thời gian chờ phiên mới (tới LONG_POLL_TIMEOUT giây) không được
+    # lẫn vào phân bố độ trễ phục vụ của chính endpoint
+    return f"{endpoint}?after"
+
+
+def timed_endpoint(endpoint, long_poll=None):
+    # Decorator đo độ trễ một route Flask theo nhãn endpoint; long_poll(): True nếu request hiện tại là
+    # long-poll -> ghi vào nhãn long_poll_label(endpoint)
+    child = HTTP_REQUEST_SECONDS.labels(endpoint)
+    waiting = HTTP_REQUEST_SECONDS.labels(long_poll_label(endpoint)) if long_poll is not None else None
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not METRICS_ENABLED: return view(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                (waiting if waiting is not None and long_poll() else child).observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from aiohttp import web
+
+from .config import LONG_POLL_TIMEOUT, METRICS_ENABLED, PUSH_PORT, SSE_KEEPALIVE
+from .metrics import HTTP_REQUEST_SECONDS, long_poll_label
+from .snapshot import render_taimd5
+from .state import DEFAULT_TABLE
+
+# ================== MÁY CHỦ ĐẨY ASYNCIO (SSE / Long-poll không cần thread) ==================
+# Flask (werkzeug threaded) giữ mỗi client SSE / long-poll bằng một thread ngủ trong Condition.wait, nên
+# vài nghìn subscriber rảnh = vài nghìn thread. Máy chủ này chạy trên MỘT event loop (luồng riêng của tiến
+# trình API): mỗi subscriber chỉ là một task ngủ trên asyncio.Event dùng chung của bàn. SnapshotBroadcaster
+# chuyển mỗi lần công bố sang loop bằng call_soon_threadsafe; Flask trả 307 về đây cho ?after= và /stream.
+#
+#   /api/taimd5?after=<phien>, /api/<bàn>/taimd5?after=   long-poll (ETag / 304 như Flask)
+#   /api/taimd5/stream, /api/<bàn>/taimd5/stream           Server-Sent Events (Last-Event-ID)
+#
+# sources: tên bàn -> (hàm trả về snapshot hiện tại, SnapshotBroadcaster) - TableState ở tiến trình đơn,
+# SharedSnapshotReader (+ SharedSnapshotPoller) ở worker của api_worker.
+
+
+class AsyncSnapshotFeed:
+    def __init__(self, loop, current, broadcaster):
+        self.current = current
+        self._loop = loop
+        self._changed = asyncio.Event()
+        broadcaster.subscribe(self._notify)
+
+    def _notify(self):
+        # Gọi từ luồng công bố: chỉ xếp lịch đánh thức lên loop, không chờ gì
+        try:
+            self._loop.call_soon_threadsafe(self._wake)
+        except RuntimeError:
+            pass # loop đã đóng (đang tắt)
+
+    def _wake(self):
+        # set() hoàn tất future của mọi task đang chờ; clear() ngay để lần chờ sau lại ngủ
+        self._changed.set()
+        self._changed.clear()
+
+    async def wait_newer(self, after, timeout):
+        deadline = self._loop.time() + timeout
+        while True:
+            snapshot = self.current()
+            if snapshot.phien is not None and (after is None or snapshot.phien > after): return snapshot
+            remaining = deadline - self._loop.time()
+            if remaining <= 0: return snapshot
+            try:
+                await asyncio.wait_for(self._changed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class PushServer:
+    def __init__(self, sources, default=DEFAULT_TABLE):
+        self.sources = sources
+        self.default = default
+        self.feeds = {}
+        self.loop = None
+        self.port = None
+        self._runner = None
+        self._ready = threading.Event()
+        self._timer = HTTP_REQUEST_SECONDS.labels("/api/taimd5")
+        self._long_poll_timer = HTTP_REQUEST_SECONDS.labels(long_poll_label("/api/taimd5"))
+
+    def _feed_or_404(self, request):
+        name = request.match_info.get("table")
+        feed = self.feeds.get(self.default if name is None else name)
+        if feed is None:
+            raise web.HTTPNotFound(text=json.dumps({"status": "error", "message": f"Không có bàn '{name}'"},
+                                                   ensure_ascii=False), content_type="application/json")
+        return feed
+
+    async def taimd5(self, request):
+        started = time.perf_counter()
+        feed = self._feed_or_404(request)
+        after = _int_or_none(request.query.get("after"))
+        snapshot = await feed.wait_newer(after, LONG_POLL_TIMEOUT) if after is not None else feed.current()
+        body, etag = snapshot.rendered or render_taimd5(snapshot)
+        headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+        if any(tag.value in (etag, "*") for tag in request.if_none_match or ()):
+            response = web.Response(status=304, headers=headers)
+        else:
+            response = web.Response(body=body, content_type="application/json", headers=headers)
+        # Long-poll chờ tới LONG_POLL_TIMEOUT giây: ghi ở nhãn riêng, không lẫn vào độ trễ /api/taimd5
+        if METRICS_ENABLED:
+            (self._timer if after is None else self._long_poll_timer).observe(time.perf_counter() - started)
+        return response
+
+    async def taimd5_stream(self, request):
+        feed = self._feed_or_404(request)
+        last = _int_or_none(request.headers.get("Last-Event-ID"))
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache",
+                                               "X-Accel-Buffering": "no"})
+        await response.prepare(request)
+        try:
+            await response.write(b"retry: 2000\n\n")
+            while True:
+                snapshot = await feed.wait_newer(last, SSE_KEEPALIVE)
+                if snapshot.phien is not None and snapshot.phien != last:
+                    if snapshot.sse_frame is None: render_taimd5(snapshot)
+                    last = snapshot.phien
+                    await response.write(snapshot.sse_frame)
+                else:
+                    await response.write(b": keepalive\n\n") # giữ kết nối qua proxy khi chưa có phiên mới
+        except ConnectionResetError:
+            pass # client đã ngắt
+        return response
+
+    @staticmethod
+    async def _cors(request, response):
+        response.headers["Access-Control-Allow-Origin"] = "*"
+
+    def make_app(self):
+        # Tạo feed trên loop đang chạy: asyncio.Event và call_soon_threadsafe phải gắn đúng loop này
+        self.loop = asyncio.get_running_loop()
+        self.feeds = {name: AsyncSnapshotFeed(self.loop, current, broadcaster)
+                      for name, (current, broadcaster) in self.sources.items()}
+        app = web.Application()
+        app.on_response_prepare.append(self._cors)
+        app.router.add_get("/api/taimd5", self.taimd5)
+        app.router.add_get("/api/{table}/taimd5", self.taimd5)
+        app.router.add_get("/api/taimd5/stream", self.taimd5_stream)
+        app.router.add_get("/api/{table}/taimd5/stream", self.taimd5_stream)
+        return app
+
+    async def start(self, host="0.0.0.0", port=PUSH_PORT, sock=None):
+        # sock: socket nghe kế thừa từ tiến trình cha (pre-fork), mọi worker accept() trên cùng một cổng
+        self._runner = web.AppRunner(self.make_app(), handle_signals=False, access_log=None,
+                                    shutdown_timeout=1.0)
+        await self._runner.setup()
+        site = web.SockSite(self._runner, sock) if sock is not None else web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        logging.info(f"📡 Máy chủ đẩy asyncio (SSE / long-poll) phục vụ {host}:{self.port}")
+
+    def run_in_thread(self, host="0.0.0.0", port=PUSH_PORT, sock=None):
+        # Event loop riêng trên một luồng nền; trả về sau khi đã nghe cổng (self.port)
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                loop.run_until_complete(self.start(host, port, sock))
+            finally:
+                self._ready.set()
+            loop.run_forever()
+            loop.run_until_complete(self._runner.cleanup())
+            # Hủy nốt task subscriber còn treo (SSE / long-poll) trước khi đóng loop
+            pending = asyncio.all_tasks(loop)
+            for task in pending: task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+            loop.close()
+
+        thread = threading.Thread(target=run, daemon=True, name="push-server")
+        thread.start()
+        self._ready.wait()
+        if self.port is None: raise RuntimeError("Không khởi động được máy chủ đẩy asyncio")
+        return thread
+
+    def stop(self):
+        if self.loop is not None: self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,122 @@
+import argparse
+import hashlib
+import json
+import logging
+import sys
+import time
+
+from .capture import read_capture
+from .config import setup_logging
+from .ingest import handle_hub_frame
+from .state import TableState
+
+# ================== PHÁT LẠI FRAME ĐÃ GHI (Deterministic Replay) ==================
+# Đưa từng frame của một capture (xem capture.py) qua đúng handle_hub_frame mà on_message của
+# connect_ws dùng, trên một TableState mới (không nhật ký, không snapshot dùng chung): phân tích frame ->
+# trạng thái -> consensus -> công bố, không cần mạng. Tốc độ: 1 = nhịp thật, N = nhanh gấp N, 0 = tối đa.
+# Cùng capture + cùng cấu hình luôn cho cùng digest (SHA-256 các body /api/taimd5 đã công bố), nên
+# --expect-digest biến một capture thành kiểm thử hồi quy của toàn bộ đường ingest.
+#
+#   SUMCLUB_CAPTURE_DIR=captures python -m sumclub.ingest       # ghi capture khi chạy thật
+#   python -m sumclub.replay captures/luckydice1-*.cap.gz --speed 0 --json
+#   python -m sumclub.replay cap.gz --speed 10 --expect-digest 3f2a...
+
+
+def _percentile_ms(sorted_values, q):
+    if not sorted_values: return None
+    return round(sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))] * 1000, 3)
+
+
+def replay_frames(frames, table, speed=0.0):
+    digest = hashlib.sha256()
+    latencies = []
+    frame_count = sessions = 0
+    first_received = None
+    lag = 0.0
+    began = time.perf_counter()
+    for received, frame in frames:
+        if speed > 0:
+            # Giữ đúng khoảng cách giữa các frame như lúc ghi, chia cho speed
+            if first_received is None: first_received = received
+            delay = (received - first_received) / speed - (time.perf_counter() - began)
+            if delay > 0: time.sleep(delay)
+            else: lag = max(lag, -delay)
+        started = time.perf_counter()
+        published = handle_hub_frame(table, frame, started)
+        if published:
+            latencies.append(time.perf_counter() - started)
+            sessions += published
+            digest.update(table.current_snapshot.rendered[0])
+        frame_count += 1
+    elapsed = time.perf_counter() - began
+
+    latencies.sort()
+    last = table.current_snapshot.result
+    return {
+        "table": table.name,
+        "frames": frame_count,
+        "sessions": sessions,
+        "speed": speed,
+        "elapsed_s": round(elapsed, 4),
+        "frames_per_s": round(frame_count / elapsed, 1) if elapsed else None,
+        "sessions_per_s": round(sessions / elapsed, 1) if elapsed else None,
+        "max_lag_ms": round(lag * 1000, 3),
+        "publish_latency_ms": {
+            "p50": _percentile_ms(latencies, 0.50),
+            "p90": _percentile_ms(latencies, 0.90),
+            "p99": _percentile_ms(latencies, 0.99),
+            "max": _percentile_ms(latencies, 1.0),
+        },
+        "last": {"phien": last["phien"], "du_doan": last["du_doan"], "do_tin_cay": last["do_tin_cay"]},
+        "digest": digest.hexdigest(),
+    }
+
+
+def replay_capture(path, speed=0.0, capacity=None, memo_size=0):
+    header, frames = read_capture(path)
+    kwargs = {} if capacity is None else {"capacity": capacity}
+    table = TableState(header["table"], header["base_url"], header["hub_name"], memo_size=memo_size, **kwargs)
+    report = replay_frames(frames, table, speed)
+    report["capture"] = path
+    if table.memo is not None: report["memo"] = table.memo.stats()
+    frames.close()
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Phát lại frame WebSocket đã ghi qua đường ingest")
+    parser.add_argument("captures", nargs="+", help="File .cap.gz ghi bởi SUMCLUB_CAPTURE_DIR / --capture-dir")
+    parser.add_argument("--speed", type=float, default=0.0, help="1 = nhịp thật, N = nhanh gấp N, 0 = tối đa (mặc định)")
+    parser.add_argument("--capacity", type=int, default=None, help="Số phiên giữ trong RAM (mặc định SUMCLUB_HISTORY_CAPACITY)")
+    parser.add_argument("--memo-size", type=int, default=0,
+                        help="Nhớ consensus theo hậu tố 20 phiên (0 = tắt, mặc định; digest không đổi)")
+    parser.add_argument("--expect-digest", action="append", default=[],
+                        help="Digest mong đợi (theo thứ tự capture); lệch -> exit 1")
+    parser.add_argument("--verbose", action="store_true", help="In log từng phiên như dịch vụ thật")
+    parser.add_argument("--json", action="store_true", help="In báo cáo dạng JSON")
+    args = parser.parse_args(argv)
+    setup_logging(logging.INFO if args.verbose else logging.WARNING)
+
+    reports = [replay_capture(path, args.speed, args.capacity, args.memo_size) for path in args.captures]
+    mismatched = [report["capture"] for report, expected in zip(reports, args.expect_digest)
+                  if report["digest"] != expected]
+    if args.json:
+        print(json.dumps(reports, ensure_ascii=False, indent=2))
+    else:
+        for report in reports:
+            latency = report["publish_latency_ms"]
+            print(f"{report['capture']} [{report['table']}]: {report['frames']} frame, {report['sessions']} phiên "
+                  f"trong {report['elapsed_s']}s | {report['frames_per_s']} frame/s, {report['sessions_per_s']} phiên/s")
+            print(f"  Độ trễ công bố: p50 {latency['p50']} ms, p99 {latency['p99']} ms, max {latency['max']} ms"
+                  f" | trễ nhịp tối đa {report['max_lag_ms']} ms")
+            print(f"  Phiên cuối {report['last']['phien']}: {report['last']['du_doan']} ({report['last']['do_tin_cay']}%)"
+                  f" | digest {report['digest']}")
+            if "memo" in report:
+                memo = report["memo"]
+                print(f"  Memo consensus: {memo['hits']} trúng / {memo['misses']} trượt ({memo['hit_rate']}%)")
+    for path in mismatched: print(f"❌ Digest lệch: {path}", file=sys.stderr)
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+
+from .config import SHARED_POLL_INTERVAL, SHARED_SNAPSHOT_BYTES, SHARED_SNAPSHOT_DIR, USER_ID
+from .engine import SEQLOCK_RETRIES
+from .strategies import all_super_vip_algos
+
+# ================== SNAPSHOT BẤT BIẾN (Copy-on-Write Publishing) ==================
+# Ingest dựng một ResultSnapshot mới (kết quả mới nhất + lịch sử gần nhất) NGOÀI khóa rồi công bố
+# bằng một phép gán tham chiếu duy nhất (nguyên tử trong CPython). Người đọc chỉ cần đọc
+# current_snapshot một lần là có dữ liệu nhất quán, không bao giờ phải chờ phân tích chiến lược.
+class ResultSnapshot:
+    __slots__ = ("table", "result", "history", "totals", "rendered", "sse_frame")
+
+    def __init__(self, table, result, history=(), totals=()):
+        self.table = table       # tên bàn sở hữu snapshot
+        self.result = result     # dict latest_result - KHÔNG được sửa sau khi công bố
+        self.history = history   # tuple SNAPSHOT_HISTORY kết quả gần nhất
+        self.totals = totals     # tuple SNAPSHOT_HISTORY tổng điểm gần nhất
+        self.rendered = None     # (bytes, etag) của /api/taimd5, xem render_taimd5
+        self.sse_frame = None    # khung SSE dựng sẵn cho /api/taimd5/stream
+
+    @property
+    def phien(self):
+        return self.result["phien"]
+
+
+class SnapshotBroadcaster:
+    # Mọi subscriber (SSE / long-poll) cùng ngủ trên MỘT Condition; mỗi lần công bố chỉ cần một
+    # notify_all, không có hàng đợi riêng cho từng client và không ai phải thăm dò (polling).
+    # subscribe(): callback gọi mỗi lần công bố (VD: chuyển tín hiệu sang event loop của push.py);
+    # chạy trên luồng công bố nên phải rẻ và không chặn.
+    def __init__(self, source):
+        self._source = source # hàm trả về snapshot hiện tại
+        self._cond = threading.Condition()
+        self._listeners = ()
+
+    def subscribe(self, callback):
+        self._listeners = self._listeners + (callback,) # tuple mới: notify() không cần khóa
+
+    def notify(self):
+        with self._cond:
+            self._cond.notify_all()
+        for callback in self._listeners: callback()
+
+    def wait_newer(self, after, timeout):
+        # Chờ tới khi có snapshot mới hơn phiên after (hoặc hết timeout), trả về snapshot hiện tại
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                snapshot = self._source()
+                if snapshot.phien is not None and (after is None or snapshot.phien > after): return snapshot
+                remaining = deadline - time.monotonic()
+                if remaining <= 0: return snapshot
+                self._cond.wait(remaining)
+
+
+# ================== SNAPSHOT DÙNG CHUNG GIỮA TIẾN TRÌNH (Seqlock mmap Segment) ==================
+# Tiến trình ingest ghi bytes /api/taimd5 đã dựng sẵn của mỗi snapshot vào một file mmap theo bàn;
+# bao nhiêu tiến trình API cũng đọc được mà không khóa, nên thông lượng tăng theo số lõi (không bị GIL
+# của một tiến trình giới hạn). Bố cục (little-endian):
+#   0  magic "SCSNAP01" | 8 seq (u64, lẻ = đang ghi) | 16 phien (i64, -1 = chưa có) | 24 độ dài body (u32)
+#   28 độ dài etag (u32) | 32 dung lượng body (u32) | 64..128 etag | 128.. body
+# Người ghi: seq += 1 -> ghi dữ liệu -> seq += 1. Người đọc: đọc seq, sao chép, đọc lại seq; khác
+# nhau hoặc lẻ thì đọc lại. Người đọc cache theo seq nên request không đổi phiên không sao chép gì.
+SHARED_MAGIC = b"SCSNAP01"
+SHARED_HEADER = struct.Struct("<8sQqIII")
+SHARED_SEQ = struct.Struct("<Q")
+SHARED_ETAG_OFFSET = 64
+SHARED_BODY_OFFSET = 128
+
+
+def shared_snapshot_path(name, directory=None):
+    return os.path.join(directory or SHARED_SNAPSHOT_DIR, f"{name}.snap")
+
+
+class SharedSnapshotWriter:
+    def __init__(self, path, capacity=SHARED_SNAPSHOT_BYTES):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        size = SHARED_BODY_OFFSET + capacity
+        # Không bao giờ tạo lại file đã có: người đọc đang mmap inode cũ sẽ không thấy file mới
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size: os.ftruncate(fd, size)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self.capacity = capacity
+        magic, seq, _, _, _, _ = SHARED_HEADER.unpack_from(self._mm, 0)
+        # Ingest khởi động lại: tiếp tục seq cũ để cache của người đọc không nhầm bản cũ là bản mới
+        self._seq = (seq + 2) & ~1 if magic == SHARED_MAGIC else 0
+        if magic != SHARED_MAGIC:
+            SHARED_HEADER.pack_into(self._mm, 0, SHARED_MAGIC, 0, -1, 0, 0, capacity)
+
+    def write(self, snapshot):
+        body, etag = snapshot.rendered or render_taimd5(snapshot)
+        etag = etag.encode("ascii")
+        if len(body) > self.capacity or len(etag) > SHARED_BODY_OFFSET - SHARED_ETAG_OFFSET:
+            logging.error(f"❌ [{snapshot.table}] Snapshot {len(body)} byte vượt dung lượng segment {self.capacity}")
+            return
+        mm = self._mm
+        SHARED_SEQ.pack_into(mm, 8, self._seq + 1)
+        mm[SHARED_ETAG_OFFSET:SHARED_ETAG_OFFSET + len(etag)] = etag
+        mm[SHARED_BODY_OFFSET:SHARED_BODY_OFFSET + len(body)] = body
+        phien = snapshot.phien
+        SHARED_HEADER.pack_into(mm, 0, SHARED_MAGIC, self._seq + 1, -1 if phien is None else phien,
+                                len(body), len(etag), self.capacity)
+        self._seq += 2
+        SHARED_SEQ.pack_into(mm, 8, self._seq)
+
+    def close(self):
+        self._mm.close()
+
+
+class SharedSnapshotReader:
+    # Nguồn snapshot cho tiến trình API: current() / wait_newer() / broadcaster cùng giao diện với
+    # TableState, trả về ResultSnapshot chỉ có phien + bytes đã dựng sẵn. Người chờ ngủ trên broadcaster;
+    # chỉ MỘT SharedSnapshotPoller mỗi tiến trình thăm dò segment và notify khi seq đổi.
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+        self._mm = None
+        self._seq = None
+        self._snapshot = ResultSnapshot(name, {"phien": None})
+        self.broadcaster = SnapshotBroadcaster(self.current)
+
+    def changed(self):
+        # Rẻ: chỉ đọc seq; True nếu segment có bản mới hơn bản đã cache (poller gọi định kỳ)
+        if self._mm is None and not self._open(): return False
+        seq = SHARED_SEQ.unpack_from(self._mm, 8)[0]
+        return seq != self._seq and not seq & 1
+
+    def _open(self):
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size < SHARED_BODY_OFFSET: return False
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def current(self):
+        if self._mm is None and not self._open(): return self._snapshot # ingest chưa chạy: "initializing"
+        mm = self._mm
+        # Tối đa SEQLOCK_RETRIES lần (như engine.seqlock_read): ingest chết giữa hai lần ghi seq để lại seq lẻ
+        # vĩnh viễn -> trả bản đã cache (cũ) thay vì quay mãi; ingest khởi động lại sẽ ghi seq chẵn mới
+        for _ in range(SEQLOCK_RETRIES):
+            seq = SHARED_SEQ.unpack_from(mm, 8)[0]
+            if seq == self._seq: return self._snapshot
+            if seq & 1:
+                time.sleep(0)
+                continue
+            magic, _, phien, body_len, etag_len, _ = SHARED_HEADER.unpack_from(mm, 0)
+            body = mm[SHARED_BODY_OFFSET:SHARED_BODY_OFFSET + body_len]
+            etag = mm[SHARED_ETAG_OFFSET:SHARED_ETAG_OFFSET + etag_len].decode("ascii", "replace")
+            if SHARED_SEQ.unpack_from(mm, 8)[0] != seq:
+                time.sleep(0)
+                continue
+            if magic != SHARED_MAGIC or phien < 0: return self._snapshot
+            snapshot = ResultSnapshot(self.name, {"phien": phien})
+            snapshot.rendered = (body, etag)
+            snapshot.sse_frame = b"id: %d\nevent: session\ndata: %s\n\n" % (phien, body.rstrip(b"\n"))
+            self._snapshot, self._seq = snapshot, seq
+            return snapshot
+        return self._snapshot
+
+    def wait_newer(self, after, timeout):
+        shared_poller().watch(self)
+        return self.broadcaster.wait_newer(after, timeout)
+
+
+class SharedSnapshotPoller:
+    # Một luồng nền mỗi tiến trình thăm dò seq của mọi segment đang được chờ, mỗi SHARED_POLL_INTERVAL
+    # giây; seq đổi -> đọc bản mới một lần rồi notify broadcaster của bàn đó (đánh thức mọi subscriber).
+    def __init__(self, interval=SHARED_POLL_INTERVAL):
+        self.interval = interval
+        self._readers = ()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, reader):
+        if reader in self._readers and self._thread is not None: return
+        with self._lock:
+            if reader not in self._readers: self._readers = self._readers + (reader,)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True, name="snapshot-poller")
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            for reader in self._readers:
+                try:
+                    if reader.changed():
+                        reader.current()
+                        reader.broadcaster.notify()
+                except (OSError, ValueError) as e:
+                    logging.error(f"❌ [{reader.name}] Lỗi đọc segment snapshot: {e}")
+            time.sleep(self.interval)
+
+
+_poller = None
+_poller_pid = None
+
+
+def shared_poller():
+    # Luồng không sống qua fork: mỗi worker (pre-fork) tự tạo poller riêng ở lần chờ đầu tiên
+    global _poller, _poller_pid
+    if _poller is None or _poller_pid != os.getpid():
+        _poller, _poller_pid = SharedSnapshotPoller(), os.getpid()
+    return _poller
+
+
+# ================== DỰNG SẴN RESPONSE /api/taimd5 ==================
+def render_taimd5(snapshot):
+    # Dựng sẵn bytes JSON + ETag mạnh MỘT LẦN cho mỗi snapshot; các request sau chỉ trả lại bytes đã cache,
+    # không mã hóa JSON lại. Định dạng giống hệt jsonify (gọn, sort_keys).
+    # ETag băm từ chính body: cùng mã phiên nhưng markov / đồng thuận có trọng số (weighted consensus) đổi
+    # thì ETag cũng đổi, client không nhận 304 cho dữ liệu cũ. Đủ ngắn cho ô etag 64 byte của vùng chia sẻ.
+    current_result = snapshot.result
+    if not current_result["phien"]:
+        response_data = {
+            "status": "initializing", 
+            "message": "Đang chờ kết quả phiên đầu tiên từ WebSocket... (Hệ thống Super VIP Pro V3 đang khởi động)", 
+            "analyst_id": USER_ID
+        }
+    else:
+        response_data = dict(current_result)
+        # 15 phiên gần nhất (phân tích trend) đã được đóng băng sẵn trong snapshot
+        response_data["history_last_15"] = list(snapshot.history)
+        response_data["totals_last_15"] = list(snapshot.totals)
+        response_data["total_strategies_used"] = len(all_super_vip_algos)
+
+    body = (json.dumps(response_data, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8")
+    etag = f"taimd5-{current_result['phien'] or 'init'}-{hashlib.blake2b(body, digest_size=12).hexdigest()}"
+    if current_result["phien"]:
+        snapshot.sse_frame = b"id: %d\nevent: session\ndata: %s\n\n" % (current_result["phien"], body.rstrip(b"\n"))
+    snapshot.rendered = (body, etag)
+    return snapshot.rendered
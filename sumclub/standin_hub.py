@@ -0,0 +1,103 @@
+import argparse
+import asyncio
+import itertools
+import json
+import random
+import uuid
+
+from aiohttp import web
+
+# ================== MÁY CHỦ SIGNALR GIẢ LẬP (Local Stand-in Hub) ==================
+# Mô phỏng tối thiểu /signalr/negotiate + /signalr/connect của bàn thật để chạy thử ingest (đồng bộ
+# lẫn asyncio) không cần mạng: phát frame notifyChangePhrase (pha đặt cược Dice1 = -1 rồi pha kết quả),
+# keepalive "{}", và có thể cố ý treo / ngắt kết nối để kiểm tra watchdog và cơ chế nối lại.
+#
+#   python -m sumclub.standin_hub --port 8765 --interval 0.5 --stall-after 20 --drop-after 50
+
+
+class StandinHub:
+    def __init__(self, hub_name="luckydice1Hub", interval=1.0, keepalive=5.0, first_session=1,
+                 stall_after=None, drop_after=None, seed=None):
+        self.hub_name = hub_name
+        self.interval = interval
+        self.keepalive = keepalive
+        self.stall_after = stall_after # số phiên gửi trước khi im lặng (giữ kết nối nhưng không gửi gì)
+        self.drop_after = drop_after   # số phiên gửi trước khi chủ động đóng kết nối
+        self._rng = random.Random(seed)
+        self._session_ids = itertools.count(first_session)
+        self.negotiations = 0
+        self.connections = 0
+
+    def frame(self, session_id, dice):
+        result = {"Dice1": dice[0], "Dice2": dice[1], "Dice3": dice[2]}
+        return json.dumps({"C": f"d-{session_id}", "M": [{"H": self.hub_name, "M": "notifyChangePhrase",
+                                                          "A": [{"SessionID": session_id, "Result": result}]}]})
+
+    async def negotiate(self, request):
+        self.negotiations += 1
+        return web.json_response({"Url": "/signalr", "ConnectionToken": uuid.uuid4().hex,
+                                  "ConnectionId": uuid.uuid4().hex, "KeepAliveTimeout": 20.0,
+                                  "TryWebSockets": True, "ProtocolVersion": "1.5"})
+
+    async def connect(self, request):
+        ws = web.WebSocketResponse(autoping=True)
+        await ws.prepare(request)
+        self.connections += 1
+        # Luôn đọc phía client song song để xử lý ping / bắt tay đóng kết nối
+        reader = asyncio.create_task(self._drain(ws))
+        await ws.send_str(json.dumps({"C": "s-0", "S": 1, "M": []}))
+        sent = 0
+        loop = asyncio.get_running_loop()
+        last_keepalive = loop.time()
+        try:
+            while not ws.closed and not reader.done():
+                if self.drop_after is not None and sent >= self.drop_after: break
+                if self.stall_after is not None and sent >= self.stall_after:
+                    await reader # treo: không frame, không keepalive, chỉ chờ client đóng
+                    break
+                session_id = next(self._session_ids)
+                # Pha đặt cược: kết quả chưa công bố
+                await ws.send_str(self.frame(session_id, [-1, -1, -1]))
+                await asyncio.sleep(self.interval / 2)
+                await ws.send_str(self.frame(session_id, [self._rng.randint(1, 6) for _ in range(3)]))
+                sent += 1
+                await asyncio.sleep(self.interval / 2)
+                if loop.time() - last_keepalive >= self.keepalive:
+                    await ws.send_str("{}")
+                    last_keepalive = loop.time()
+        except (ConnectionResetError, asyncio.CancelledError):
+            pass
+        finally:
+            reader.cancel()
+            await ws.close()
+        return ws
+
+    async def _drain(self, ws):
+        async for _ in ws:
+            pass
+
+    def make_app(self):
+        application = web.Application()
+        application.router.add_get("/signalr/negotiate", self.negotiate)
+        application.router.add_get("/signalr/connect", self.connect)
+        return application
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Máy chủ SignalR giả lập cho ingest cục bộ")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--hub", default="luckydice1Hub")
+    parser.add_argument("--interval", type=float, default=1.0, help="Số giây giữa hai phiên")
+    parser.add_argument("--keepalive", type=float, default=5.0)
+    parser.add_argument("--stall-after", type=int, default=None)
+    parser.add_argument("--drop-after", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    hub = StandinHub(args.hub, args.interval, args.keepalive, stall_after=args.stall_after,
+                     drop_after=args.drop_after, seed=args.seed)
+    web.run_app(hub.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
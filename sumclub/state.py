@@ -0,0 +1,324 @@
+import atexit
+import logging
+import mmap
+import os
+import threading
+import time
+
+from .capture import FrameRecorder, capture_path
+from .config import (AUDIT_DIR, CAPTURE_DIR, CONSENSUS_MODE, HISTORY_CAPACITY, LOG_SESSION_EVERY, MARKOV_DECAY,
+                     MARKOV_ORDER, METRICS_ENABLED, SESSION_LOG_PATH, SHARED_SNAPSHOT_DIR, SNAPSHOT_HISTORY, SPECULATE_ENABLED, TABLES_SPEC, USER_ID)
+from .engine import ENGINE_MAX_WINDOW, IncrementalAnalysisEngine, MarkovTransitionTable, StrategyScoreboard, _label
+from .metrics import (LOCK_HOLD_SECONDS, LOCK_WAIT_SECONDS, SPECULATIVE_LOOKUPS, WS_DOWNTIME_SECONDS,
+                      WS_PUBLISH_SECONDS)
+from .snapshot import (ResultSnapshot, SharedSnapshotWriter, SnapshotBroadcaster, render_taimd5,
+                       shared_snapshot_path)
+from .storage import SESSION_RECORD, SessionIndex, SessionLog, SessionRingBuffer
+from .strategies import ConsensusMemo, all_super_vip_algos
+
+# ================== TÍNH TRƯỚC PHIÊN KẾ TIẾP (Speculative Precompute) ==================
+# Phiên kế tiếp chỉ có 16 tổng khả dĩ (3..18). Sau mỗi lần công bố, một luồng nền dùng thời gian rảnh giữa
+# hai phiên để tính sẵn (25 kết quả, consensus) cho từng tổng trên bản sao động cơ; khi kết quả thật về,
+# ingest chỉ tra bảng thay vì chạy lại 25 chiến lược. Bảng gắn với phiên đã công bố cuối cùng: phiên mới
+# không liền kề (gap), mất/kết nối lại WebSocket hay trạng thái mới đều hủy phần đang tính; tra trượt thì
+# ingest tự tính như cũ, nên kết quả công bố luôn giống hệt đường không tính trước.
+# Tính theo thứ tự xác suất giảm dần (10/11 trước, 3/18 sau) để bảng tính dở vẫn trúng nhiều nhất.
+_DICE_WAYS = [sum(1 for a in range(1, 7) for b in range(1, 7) if 1 <= t - a - b <= 6) for t in range(19)]
+SPECULATIVE_ORDER = sorted(range(3, 19), key=lambda t: (-_DICE_WAYS[t], t))
+
+
+class _Speculation:
+    __slots__ = ("phien", "engine", "weights", "results")
+
+    def __init__(self, phien, engine, weights):
+        self.phien = phien       # phiên đã công bố mà bảng này nối tiếp
+        self.engine = engine     # bản sao động cơ đóng băng sau phiên đó (không ai sửa)
+        self.weights = weights   # (trọng số nếu ra Xỉu, nếu ra Tài) ở chế độ accuracy, hoặc None
+        self.results = {}        # tổng -> (25 kết quả, consensus); điền dần bởi luồng nền
+
+
+class Speculator:
+    def __init__(self, name):
+        self.name = name
+        self._current = None # _Speculation đang dùng; thay tham chiếu = hủy bảng cũ
+        self._latest = None  # trạng thái công bố gần nhất, để tính lại sau khi kết nối lại
+        self._wake = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread = None
+        self._lookups = {outcome: SPECULATIVE_LOOKUPS.labels(name, outcome) for outcome in ("hit", "miss", "gap", "cold")}
+
+    def submit(self, phien, engine, weights=None):
+        self._latest = (phien, engine, weights)
+        self._current = _Speculation(phien, engine, weights)
+        self._idle.clear()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name=f"speculate-{self.name}")
+            self._thread.start()
+        self._wake.set()
+
+    def cancel(self):
+        self._current = None
+        self._wake.set()
+
+    def restart(self):
+        # Kết nối lại: bỏ phần đã tính, tính lại từ đầu cho trạng thái công bố gần nhất
+        if self._latest is not None: self.submit(*self._latest)
+
+    def lookup(self, after, phien_id, tong):
+        # (25 kết quả, consensus) đã tính sẵn cho phiên phien_id nối tiếp phiên after, hoặc None
+        current = self._current
+        if current is None or current.phien != after: outcome, found = "cold", None
+        elif phien_id != after + 1: outcome, found = "gap", None
+        else:
+            found = current.results.get(tong)
+            outcome = "miss" if found is None else "hit"
+        if found is None: self._current = None
+        if METRICS_ENABLED: self._lookups[outcome].inc()
+        return found
+
+    def wait_idle(self, timeout=None):
+        return self._idle.wait(timeout)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            job = self._current
+            if job is None:
+                self._idle.set()
+                continue
+            for tong in SPECULATIVE_ORDER:
+                # Có phiên mới / bị hủy -> bỏ dở, luồng sẽ được đánh thức lại cho trạng thái mới
+                if self._current is not job: break
+                bit = tong >= 11
+                twin = job.engine.copy()
+                twin.push(_label(bit), tong)
+                job.results[tong] = twin.evaluate(weights=None if job.weights is None else job.weights[bit])
+            if self._current is job or self._current is None: self._idle.set()
+
+
+# ================== TRẠNG THÁI THEO BÀN (Per-table State) ==================
+# Mỗi bàn (hub) có kho lịch sử, động cơ, khóa ghi, snapshot, nhật ký và luồng ingest riêng, nên
+# một tiến trình theo dõi được nhiều bàn song song mà các bàn không chặn lẫn nhau.
+class TableState:
+    def __init__(self, name, base_url, hub_name, capacity=HISTORY_CAPACITY, speculate=SPECULATE_ENABLED, memo_size=0):
+        self.name = name
+        self.base_url = base_url
+        self.hub_name = hub_name
+        # KHÓA GHI: chỉ luồng ingest của bàn dùng để bảo vệ session_store / analysis_engine.
+        # Luồng API KHÔNG lấy khóa này, chỉ đọc snapshot đã công bố (xem publish).
+        self.data_lock = threading.Lock()
+        self.session_store = SessionRingBuffer(capacity)
+        self.analysis_engine = IncrementalAnalysisEngine()
+        # Markov bậc k trên đúng phần lịch sử session_store đang giữ
+        self.markov = MarkovTransitionTable(MARKOV_ORDER, window=max(1, capacity - MARKOV_ORDER), decay=MARKOV_DECAY)
+        # Chỉ mục theo mã phiên / tổng + thống kê gia tăng cho /api/history, /api/stats (đọc không khóa)
+        self.session_index = SessionIndex(capacity, lock=self.data_lock)
+        # Tỷ lệ đúng thực tế của từng chiến lược + consensus (xem /api/scoreboard)
+        self.scoreboard = StrategyScoreboard([fn.__name__ for fn in all_super_vip_algos], lock=self.data_lock)
+        self.session_log = None # chỉ mở khi chạy dịch vụ (xem __main__), import thư viện không ghi file
+        self.shared = None      # SharedSnapshotWriter khi phục vụ API ở tiến trình khác (SHARED_SNAPSHOT_DIR)
+        self.recorder = None    # FrameRecorder ghi frame WebSocket thô khi bật CAPTURE_DIR
+        self.audit = None       # SessionAuditSink (logpipe.py) khi bật AUDIT_DIR
+        self._published = 0     # đếm phiên đã công bố, để lấy mẫu dòng log mỗi LOG_SESSION_EVERY phiên
+        self.speculator = Speculator(name) if speculate else None
+        # ConsensusMemo theo hậu tố 20 phiên (chỉ dùng ở chế độ consensus không trọng số)
+        self.memo = ConsensusMemo(memo_size) if memo_size > 0 else None
+        self.current_snapshot = ResultSnapshot(name, {"phien": None, "xucxac": [], "tong": None, "ketqua": None,
+                                                      "du_doan": None, "do_tin_cay": None, "analyst_id": USER_ID})
+        self.broadcaster = SnapshotBroadcaster(lambda: self.current_snapshot)
+        # Thời điểm mất kết nối (monotonic) để đo downtime; None khi đang kết nối hoặc chưa từng kết nối
+        self._ws_down_since = None
+        self._lock_wait = LOCK_WAIT_SECONDS.labels(name)
+        self._lock_hold = LOCK_HOLD_SECONDS.labels(name)
+        self.ws_publish_timer = WS_PUBLISH_SECONDS.labels(name)
+
+    def publish(self, snapshot):
+        # Mã hóa response một lần trước khi công bố, để mọi request đều nhận bytes có sẵn
+        render_taimd5(snapshot)
+        self.current_snapshot = snapshot
+        if self.shared is not None: self.shared.write(snapshot)
+        # Đánh thức toàn bộ client SSE / long-poll đang chờ phiên mới
+        self.broadcaster.notify()
+        return snapshot
+
+    def ingest(self, phien_id, dice):
+        # Nhận một phiên đã công bố kết quả; trả về snapshot mới, hoặc None nếu phiên trùng/cũ
+        tong = sum(dice)
+        ketqua = "Tài" if tong >= 11 else "Xỉu"
+
+        # === KHỐI AN TOÀN LUỒNG: chỉ các cập nhật O(1) nằm trong khóa ===
+        wait_started = time.perf_counter()
+        with self.data_lock:
+            acquired = time.perf_counter()
+            # Chỉ cập nhật lịch sử khi có phiên mới, tránh trùng lặp
+            after = self.current_snapshot.phien
+            duplicate = len(self.session_store) and phien_id <= after
+            if not duplicate:
+                # Bộ đệm vòng tự ghi đè phiên cũ nhất khi đầy (HISTORY_CAPACITY)
+                self.session_store.append(ketqua, tong)
+                self.analysis_engine.push(ketqua, tong)
+                self.markov.push(tong >= 11)
+                markov = self.markov.predict()
+                self.session_index.append(phien_id, tong, dice)
+                # Chấm dự đoán của phiên trước với kết quả vừa về, rồi chốt trọng số cho phiên này
+                self.scoreboard.score(tong >= 11, phien_id)
+                weights = self.scoreboard.weights() if CONSENSUS_MODE == "accuracy" else None
+                # Ghi đệm vào nhật ký (không fsync ở đây, luồng nền sẽ fsync theo lô)
+                if self.session_log is not None: self.session_log.append(phien_id, dice)
+                frozen_engine = self.analysis_engine.copy()
+                history_tail = tuple(self.session_store.history_view(SNAPSHOT_HISTORY))
+                totals_tail = tuple(self.session_store.totals_view(SNAPSHOT_HISTORY))
+        # === KẾT THÚC KHÓA: phần tính toán bên dưới không chặn ai ===
+        if METRICS_ENABLED:
+            self._lock_wait.observe(acquired - wait_started)
+            self._lock_hold.observe(time.perf_counter() - acquired)
+        if duplicate: return None
+
+        # Trúng bảng tính trước -> bỏ qua 25 chiến lược, chỉ còn một lần tra
+        speculated = self.speculator.lookup(after, phien_id, tong) if self.speculator is not None else None
+        snapshot = self._publish_session(phien_id, dice, frozen_engine, history_tail, totals_tail, markov, weights,
+                                         speculated)
+        pred = snapshot.result
+        # Nhật ký kiểm toán giữ đủ mọi phiên; dòng log cho người đọc chỉ lấy mẫu (định dạng lười ở luồng log)
+        if self.audit is not None: self.audit.record(phien_id, dice, pred)
+        self._published += 1
+        if self._published % LOG_SESSION_EVERY == 0:
+            logging.info("🎯 [%s] PHIÊN %s | KQ: %s -> %s | 👑 DỰ ĐOÁN SUPER VIP: %s (%s%%)", self.name, phien_id, dice,
+                         ketqua, pred["du_doan"], pred["do_tin_cay"],
+                         extra={"table": self.name, "event": "session", "phien": phien_id})
+        return snapshot
+
+    def _publish_session(self, phien_id, dice, frozen_engine, history_tail, totals_tail, markov, weights=None,
+                         speculated=None):
+        tong = sum(dice)
+        ketqua = "Tài" if tong >= 11 else "Xỉu"
+        # Thực hiện dự đoán SUPER CONSENSUS trên bản sao đã đóng băng (trừ khi đã tính trước / có trong memo)
+        if speculated is None and weights is None and self.memo is not None:
+            speculated = self.memo.get_or_compute(frozen_engine.suffix_key(), frozen_engine.evaluate, METRICS_ENABLED)
+        results, pred = speculated or frozen_engine.evaluate(timed=METRICS_ENABLED, weights=weights)
+        # Chỉ luồng ingest của bàn gọi tới đây, nên dự đoán chờ chấm không bị ghi chéo
+        self.scoreboard.record(results, pred, phien_id)
+        snapshot = self.publish(ResultSnapshot(self.name, {
+            "phien": phien_id,
+            "xucxac": dice,
+            "tong": tong,
+            "ketqua": ketqua,
+            "du_doan": pred["du_doan"],
+            "do_tin_cay": pred["do_tin_cay"],
+            "markov": markov,
+            "analyst_id": USER_ID
+        }, history_tail, totals_tail))
+        # Đã công bố xong: giao trạng thái mới cho luồng tính trước (trọng số chốt ngay ở đây vì chỉ
+        # luồng ingest được đọc bảng điểm)
+        if self.speculator is not None:
+            speculative_weights = ((self.scoreboard.weights_if(0), self.scoreboard.weights_if(1))
+                                   if CONSENSUS_MODE == "accuracy" else None)
+            self.speculator.submit(phien_id, frozen_engine, speculative_weights)
+        return snapshot
+
+    def warm_start(self, path):
+        # Memory-map nhật ký và phát lại capacity phiên cuối vào session_store / analysis_engine,
+        # rồi công bố snapshot của phiên cuối cùng. Trả về số phiên đã nạp.
+        if not path or not os.path.exists(path) or os.path.getsize(path) < SESSION_RECORD.size: return 0
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            count = len(mm) // SESSION_RECORD.size
+            # Bảng điểm chỉ cần phát lại đủ cửa sổ lớn nhất (mỗi phiên phải chạy 25 chiến lược), cộng
+            # ENGINE_MAX_WINDOW phiên làm nóng động cơ; phần còn lại chỉ nạp lại capacity phiên cuối
+            score_from = count - self.scoreboard.windows[-1] - 1
+            start = max(0, min(count - self.session_store.capacity, score_from - ENGINE_MAX_WINDOW))
+            # Chỉ mục thống kê nạp lại đủ cửa sổ lớn nhất (rẻ: không chạy chiến lược)
+            index_from = min(start, max(0, count - self.session_index.span))
+            last = None
+            with memoryview(mm) as view, self.data_lock:
+                records = view[index_from * SESSION_RECORD.size:count * SESSION_RECORD.size]
+                for i, (phien_id, d1, d2, d3, tong) in enumerate(SESSION_RECORD.iter_unpack(records), index_from):
+                    if last is not None and phien_id <= last[0]: continue
+                    self.session_index.append(phien_id, tong, (d1, d2, d3))
+                    last = (phien_id, [d1, d2, d3])
+                    if i < start: continue
+                    ketqua = "Tài" if tong >= 11 else "Xỉu"
+                    self.session_store.append(ketqua, tong)
+                    self.analysis_engine.push(ketqua, tong)
+                    self.markov.push(tong >= 11)
+                    self.scoreboard.score(tong >= 11, phien_id)
+                    if i >= score_from and i < count - 1:
+                        weights = self.scoreboard.weights() if CONSENSUS_MODE == "accuracy" else None
+                        self.scoreboard.record(*self.analysis_engine.evaluate(weights=weights), phien_id)
+                records.release()
+                weights = self.scoreboard.weights() if CONSENSUS_MODE == "accuracy" else None
+                frozen_engine = self.analysis_engine.copy()
+                history_tail = tuple(self.session_store.history_view(SNAPSHOT_HISTORY))
+                totals_tail = tuple(self.session_store.totals_view(SNAPSHOT_HISTORY))
+                markov = self.markov.predict()
+        if last is None: return 0
+        self._publish_session(last[0], last[1], frozen_engine, history_tail, totals_tail, markov, weights)
+        logging.info(f"♻️ [{self.name}] Khởi động nóng từ nhật ký: {len(self.session_store)} phiên, phiên cuối {last[0]}")
+        return len(self.session_store)
+
+    def mark_ws_connected(self):
+        if self._ws_down_since is not None and METRICS_ENABLED:
+            WS_DOWNTIME_SECONDS.labels(self.name).observe(time.monotonic() - self._ws_down_since)
+        self._ws_down_since = None
+        if self.speculator is not None: self.speculator.restart()
+
+    def mark_ws_disconnected(self):
+        if self._ws_down_since is None: self._ws_down_since = time.monotonic()
+        if self.speculator is not None: self.speculator.cancel()
+
+
+def _parse_tables(spec):
+    # "ten=https://host|hubName;ten2=..." -> [(ten, base_url, hub_name), ...]
+    tables = []
+    for item in filter(None, (part.strip() for part in spec.split(";"))):
+        name, _, target = item.partition("=")
+        base_url, _, hub_name = target.partition("|")
+        tables.append((name.strip(), base_url.strip().rstrip("/"), hub_name.strip()))
+    return tables
+
+
+def table_log_path(name):
+    # SESSION_LOG_PATH có thể chứa "{table}"; nếu không, bàn mặc định dùng đúng đường dẫn đó
+    # và các bàn khác thêm hậu tố _<tên bàn> trước phần mở rộng.
+    if not SESSION_LOG_PATH: return None
+    if "{table}" in SESSION_LOG_PATH: return SESSION_LOG_PATH.format(table=name)
+    if name == DEFAULT_TABLE: return SESSION_LOG_PATH
+    stem, ext = os.path.splitext(SESSION_LOG_PATH)
+    return f"{stem}_{name}{ext}"
+
+
+# Tất cả các bàn đang theo dõi, theo tên; bàn đầu tiên là bàn mặc định của /api/taimd5
+tables = {}
+for _name, _base_url, _hub_name in _parse_tables(TABLES_SPEC):
+    tables[_name] = TableState(_name, _base_url, _hub_name)
+DEFAULT_TABLE = next(iter(tables))
+default_table = tables[DEFAULT_TABLE]
+
+
+# ================== KHỞI ĐỘNG CÁC BÀN ==================
+def prepare_tables(shared_dir=None, capture_dir=None, audit_dir=None):
+    # Nạp lại lịch sử từ nhật ký phiên của từng bàn rồi tiếp tục ghi nối vào đó;
+    # shared_dir (mặc định SHARED_SNAPSHOT_DIR) bật ghi snapshot dùng chung cho api_worker,
+    # capture_dir (mặc định CAPTURE_DIR) bật ghi lại frame WebSocket thô,
+    # audit_dir (mặc định AUDIT_DIR) bật nhật ký kiểm toán phiên
+    shared_dir = SHARED_SNAPSHOT_DIR if shared_dir is None else shared_dir
+    capture_dir = CAPTURE_DIR if capture_dir is None else capture_dir
+    audit_dir = AUDIT_DIR if audit_dir is None else audit_dir
+    for table in tables.values():
+        if audit_dir and table.audit is None:
+            from .logpipe import SessionAuditSink, audit_path
+            table.audit = SessionAuditSink(audit_path(table.name, audit_dir), table.name)
+            atexit.register(table.audit.close)
+            logging.info(f"🧾 [{table.name}] Ghi nhật ký kiểm toán phiên vào {table.audit.path}")
+        if capture_dir and table.recorder is None:
+            table.recorder = FrameRecorder(capture_path(table.name, capture_dir), table).start_flusher()
+            # Đóng gzip khi thoát bình thường (Ctrl+C) để capture có trailer đầy đủ
+            atexit.register(table.recorder.close)
+            logging.info(f"🎞️ [{table.name}] Ghi frame WebSocket vào {table.recorder.path}")
+        if shared_dir and table.shared is None:
+            table.shared = SharedSnapshotWriter(shared_snapshot_path(table.name, shared_dir))
+        log_path = table_log_path(table.name)
+        if log_path and table.session_log is None:
+            table.warm_start(log_path)
+            table.session_log = SessionLog(log_path).start_flusher()
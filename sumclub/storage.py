@@ -0,0 +1,381 @@
+import logging
+import os
+import struct
+import threading
+from array import array
+
+from .config import (DICE_STATS_WINDOWS, HISTORY_PAGE_DEFAULT, SESSION_LOG_FSYNC_EVERY, SESSION_LOG_FSYNC_INTERVAL,
+                     STATS_WINDOWS)
+from .engine import ENGINE_MAX_WINDOW, _label, seqlock_read
+
+# ================== KHO LỊCH SỬ VÒNG (Compact Ring Buffer) ==================
+# Mỗi phiên chiếm 1 bit (Tài/Xỉu) + 1 byte (tổng 3-18) thay vì 1 chuỗi + 1 int Python (~100 byte).
+# Ghi gương (mirror-write): mỗi giá trị được ghi ở ô i và i + capacity, nên "N phiên cuối" luôn là
+# một đoạn liền mạch -> trả về view không sao chép (zero-copy), không cần pop(0) O(n).
+class OutcomeView:
+    # Dãy "Tài"/"Xỉu" chỉ đọc trên mảng bit, dùng thay cho list history trong các hàm sN_*
+    __slots__ = ("_bits", "_start", "_stop")
+
+    def __init__(self, bits, start, stop):
+        self._bits, self._start, self._stop = bits, start, stop
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def _bit(self, i):
+        return (self._bits[i >> 3] >> (i & 7)) & 1
+
+    def __getitem__(self, key):
+        idx = range(self._start, self._stop)[key]
+        if isinstance(key, slice):
+            if idx.step != 1: return [_label(self._bit(i)) for i in idx]
+            return OutcomeView(self._bits, idx.start, max(idx.start, idx.stop))
+        return _label(self._bit(idx))
+
+    def __iter__(self):
+        for i in range(self._start, self._stop):
+            yield _label(self._bit(i))
+
+    def __eq__(self, other):
+        if isinstance(other, (OutcomeView, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def bit_count(self):
+        # Đếm số Tài bằng popcount trên đoạn byte thay vì duyệt từng phần tử
+        if self._stop <= self._start: return 0
+        lo, hi = self._start >> 3, (self._stop + 7) >> 3
+        word = int.from_bytes(self._bits[lo:hi], "little") >> (self._start & 7)
+        return (word & ((1 << len(self)) - 1)).bit_count()
+
+    def count(self, value):
+        tai = self.bit_count()
+        if value == "Tài": return tai
+        if value == "Xỉu": return len(self) - tai
+        return 0
+
+    def tolist(self):
+        return list(self)
+
+    def __repr__(self):
+        return f"OutcomeView({self.tolist()!r})"
+
+
+class SessionRingBuffer:
+    def __init__(self, capacity):
+        if capacity < ENGINE_MAX_WINDOW:
+            raise ValueError(f"capacity phải >= {ENGINE_MAX_WINDOW} (cửa sổ lớn nhất của các chiến lược)")
+        self.capacity = capacity
+        self._totals = bytearray(2 * capacity)
+        self._bits = bytearray((2 * capacity + 7) // 8)
+        self._pos = 0 # ô sẽ ghi tiếp theo, trong [0, capacity)
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def _set_bit(self, i, bit):
+        if bit: self._bits[i >> 3] |= 1 << (i & 7)
+        else: self._bits[i >> 3] &= ~(1 << (i & 7)) & 0xFF
+
+    def append(self, ketqua, tong):
+        bit = 1 if ketqua == "Tài" else 0
+        for i in (self._pos, self._pos + self.capacity):
+            self._totals[i] = tong
+            self._set_bit(i, bit)
+        self._pos = (self._pos + 1) % self.capacity
+        if self._len < self.capacity: self._len += 1
+
+    def clear(self):
+        self._pos = self._len = 0
+
+    def _span(self, n):
+        n = self._len if n is None else max(0, min(n, self._len))
+        end = self._pos + self.capacity
+        return end - n, end
+
+    # Các view chỉ hợp lệ khi còn giữ data_lock của bàn: phiên mới sẽ ghi đè trực tiếp lên vùng nhớ bên dưới
+    def totals_view(self, n=None):
+        start, end = self._span(n)
+        return memoryview(self._totals)[start:end]
+
+    def history_view(self, n=None):
+        start, end = self._span(n)
+        return OutcomeView(self._bits, start, end)
+
+
+# ================== XÚC XẮC NÉN 1 BYTE (Packed Dice Triple) ==================
+# Bộ ba có thứ tự (d1, d2, d3) chỉ có 6^3 = 216 khả năng -> mã 0..215 = 36(d1-1) + 6(d2-1) + (d3-1);
+# DICE_UNKNOWN đánh dấu phiên không rõ xúc xắc. Bộ đếm xúc xắc là một mảng phẳng DICE_COUNTERS ô:
+#   [0, 6): số lần mỗi mặt xuất hiện | [6, 24): mặt theo vị trí (6 ô mỗi vị trí)
+#   [24, 30): bộ ba theo mặt | [30, 36): đúng một đôi theo mặt của đôi
+# DICE_DELTAS[mã] liệt kê sẵn các ô cần +1/-1, nên cập nhật mỗi phiên chỉ là ~7 phép cộng mỗi cửa sổ.
+DICE_UNKNOWN = 255
+DICE_FACES, DICE_POSITIONS, DICE_TRIPLES, DICE_PAIRS, DICE_COUNTERS = 0, 6, 24, 30, 36
+DICE_UNPACK = [(c // 36 + 1, c // 6 % 6 + 1, c % 6 + 1) for c in range(216)]
+
+
+def pack_dice(dice):
+    d1, d2, d3 = dice
+    if not (1 <= d1 <= 6 and 1 <= d2 <= 6 and 1 <= d3 <= 6): return DICE_UNKNOWN
+    return 36 * (d1 - 1) + 6 * (d2 - 1) + (d3 - 1)
+
+
+def unpack_dice(code):
+    return list(DICE_UNPACK[code]) if code != DICE_UNKNOWN else None
+
+
+def _dice_deltas(dice):
+    cells = [DICE_FACES + d - 1 for d in dice] + [DICE_POSITIONS + 6 * p + d - 1 for p, d in enumerate(dice)]
+    if dice[0] == dice[1] == dice[2]: cells.append(DICE_TRIPLES + dice[0] - 1)
+    elif len(set(dice)) == 2: cells.append(DICE_PAIRS + max(dice, key=dice.count) - 1)
+    return tuple(cells)
+
+
+DICE_DELTAS = [_dice_deltas(dice) for dice in DICE_UNPACK] + [()] * (256 - 216)
+
+
+# ================== CHỈ MỤC LỊCH SỬ & THỐNG KÊ GIA TĂNG (Session Index & Aggregates) ==================
+# Phục vụ /api/history và /api/stats mà KHÔNG quét toàn bộ lịch sử mỗi request:
+#   - mã phiên luôn tăng dần -> tìm khoảng phiên X..Y / con trỏ phân trang bằng tìm kiếm nhị phân
+#   - lọc theo tổng 3..18 quét vòng tổng đã nén (1 byte / phiên) bằng bytearray.find / rfind (memchr ở C),
+#     không giữ danh sách vị trí riêng -> chỉ mục tốn vài byte / phiên kể cả khi capacity lên hàng triệu
+#   - phân bố tổng theo cửa sổ, tổng tích lũy, histogram độ dài chuỗi bệt được cập nhật O(1) mỗi phiên
+#   - xúc xắc nén 1 byte / phiên cùng bộ đếm mặt / vị trí / bộ ba / đôi theo cửa sổ (DICE_DELTAS)
+# Vị trí là chỉ số tuyệt đối (phiên thứ bao nhiêu từ khi khởi động); vòng có capacity + 1 ô nên ô đang
+# ghi không bao giờ thuộc capacity phiên đang giữ -> luồng API đọc không cần khóa, chỉ cần kiểm tra lại
+# bộ đếm sau khi đọc (giống seqlock) và đọc lại nếu ingest đã ghi đè vùng vừa đọc.
+# Cửa sổ thống kê KHÔNG bị giới hạn bởi capacity: một vòng đuôi riêng (span = cửa sổ lớn nhất) chỉ giữ
+# tổng + mã xúc xắc (2 byte / phiên) để trừ đúng phiên vừa rơi khỏi mỗi cửa sổ 1k / 10k / 100k.
+class SessionIndex:
+    def __init__(self, capacity, windows=STATS_WINDOWS, dice_windows=DICE_STATS_WINDOWS, lock=None):
+        self.capacity = capacity
+        self._lock = lock # khóa ghi của bàn, chỉ dùng khi seqlock_read thất bại quá nhiều lần
+        self._slots = capacity + 1
+        self._ids = array("q", bytes(8 * self._slots))
+        self._totals = bytearray(self._slots)
+        self._dice = bytearray([DICE_UNKNOWN]) * self._slots
+        self.count = 0 # tổng số phiên đã thêm; chỉ tăng SAU khi ghi xong ô
+        self._version = 0 # lẻ trong lúc append đang cập nhật bộ đếm (seqlock cho stats)
+        self.retained_totals = [0] * 16           # phân bố tổng trong capacity phiên đang giữ
+        self.lifetime_totals = [0] * 16           # phân bố tổng từ lúc khởi động
+        self.window_sizes = sorted(set(windows))
+        self.window_totals = {w: [0] * 16 for w in self.window_sizes}
+        self.streak_lengths = [0]                 # chỉ số = độ dài chuỗi bệt đã kết thúc -> số lần
+        self.streak_bit = None
+        self.streak = 0
+        # Bộ đếm xúc xắc (xem DICE_DELTAS): theo cửa sổ, trong capacity phiên đang giữ, từ lúc khởi động
+        self.dice_window_sizes = sorted(set(dice_windows) | {capacity})
+        # Vòng đuôi cho cửa sổ: ô (n % span) giữ phiên thứ n, đủ dài để trừ phiên rơi khỏi cửa sổ lớn nhất
+        self.span = max(self.window_sizes + self.dice_window_sizes)
+        self._tail_totals = bytearray(self.span)
+        self._tail_dice = bytearray([DICE_UNKNOWN]) * self.span
+        self.dice_windows = {w: [0] * DICE_COUNTERS for w in self.dice_window_sizes}
+        self.dice_lifetime = [0] * DICE_COUNTERS
+        self.dice_known = 0 # số phiên có xúc xắc hợp lệ từ lúc khởi động
+
+    def append(self, phien_id, tong, dice=None):
+        self._version += 1
+        n, slots, totals, packed = self.count, self._slots, self._totals, self._dice
+        span, tail_totals, tail_dice = self.span, self._tail_totals, self._tail_dice
+        for w in self.window_sizes:
+            if n >= w: self.window_totals[w][tail_totals[(n - w) % span] - 3] -= 1
+        for w in self.dice_window_sizes:
+            if n >= w:
+                counts = self.dice_windows[w]
+                for cell in DICE_DELTAS[tail_dice[(n - w) % span]]: counts[cell] -= 1
+        if n >= self.capacity:
+            evicted = totals[(n - self.capacity) % slots] - 3
+            self.retained_totals[evicted] -= 1
+        slot = n % slots
+        self._ids[slot] = phien_id
+        totals[slot] = tong
+        code = packed[slot] = DICE_UNKNOWN if dice is None else pack_dice(dice)
+        # Ghi SAU khi đã trừ: với w == span, ô của phiên rơi khỏi cửa sổ chính là ô của phiên mới
+        tail_totals[n % span] = tong
+        tail_dice[n % span] = code
+        deltas = DICE_DELTAS[code]
+        for w in self.dice_window_sizes:
+            counts = self.dice_windows[w]
+            for cell in deltas: counts[cell] += 1
+        for cell in deltas: self.dice_lifetime[cell] += 1
+        if deltas: self.dice_known += 1
+        k = tong - 3
+        for w in self.window_sizes: self.window_totals[w][k] += 1
+        self.retained_totals[k] += 1
+        self.lifetime_totals[k] += 1
+
+        bit = tong >= 11
+        if bit == self.streak_bit:
+            self.streak += 1
+        else:
+            if self.streak:
+                if self.streak >= len(self.streak_lengths):
+                    self.streak_lengths.extend([0] * (self.streak + 1 - len(self.streak_lengths)))
+                self.streak_lengths[self.streak] += 1
+            self.streak_bit, self.streak = bit, 1
+        self.count = n + 1
+        self._version += 1
+
+    def _oldest(self, count):
+        return max(0, count - self.capacity)
+
+    def _bisect(self, phien_id, lo, hi, right=False):
+        # Vị trí tuyệt đối đầu tiên trong [lo, hi) có mã phiên >= phien_id (> nếu right)
+        ids, slots = self._ids, self._slots
+        while lo < hi:
+            mid = (lo + hi) // 2
+            value = ids[mid % slots]
+            if value < phien_id or (right and value == phien_id): lo = mid + 1
+            else: hi = mid
+        return lo
+
+    def _find_total(self, tong, lo, hi, limit, descending=False):
+        # Tối đa limit vị trí tuyệt đối trong [lo, hi) có tổng = tong (giảm dần nếu descending). Mỗi vòng
+        # lặp tìm trong một đoạn liền mạch của vòng: vị trí p nằm ở ô p - base với base = p // slots * slots
+        needle, totals, slots = bytes((tong,)), self._totals, self._slots
+        found = []
+        if descending:
+            p = hi
+            while len(found) < limit and p > lo:
+                base = (p - 1) // slots * slots
+                start = max(lo, base)
+                i = totals.rfind(needle, start - base, p - base)
+                if i < 0:
+                    p = start
+                    continue
+                found.append(base + i)
+                p = base + i
+        else:
+            p = lo
+            while len(found) < limit and p < hi:
+                base = p // slots * slots
+                end = min(hi, base + slots)
+                i = totals.find(needle, p - base, end - base)
+                if i < 0:
+                    p = end
+                    continue
+                found.append(base + i)
+                p = base + i + 1
+        return found
+
+    def query(self, start=None, stop=None, tong=None, cursor=None, limit=HISTORY_PAGE_DEFAULT, descending=False):
+        # Trả về ([(phien, tong, mã xúc xắc), ...], next_cursor). start/stop: khoảng mã phiên (bao gồm hai đầu);
+        # cursor: mã phiên cuối của trang trước; tong: chỉ lấy phiên có tổng này.
+        for _ in range(3):
+            count = self.count
+            lo, hi = self._oldest(count), count
+            if start is not None: lo = self._bisect(start, lo, hi)
+            if stop is not None: hi = self._bisect(stop, lo, hi, right=True)
+            if cursor is not None:
+                if descending: hi = self._bisect(cursor, lo, hi)
+                else: lo = self._bisect(cursor, lo, hi, right=True)
+            if tong is None:
+                if descending: positions = range(hi - 1, max(lo, hi - limit - 1) - 1, -1)
+                else: positions = range(lo, min(hi, lo + limit + 1))
+            else:
+                positions = self._find_total(tong, lo, hi, limit + 1, descending)
+            rows = [(self._ids[p % self._slots], self._totals[p % self._slots], self._dice[p % self._slots])
+                    for p in positions]
+            # Mọi vị trí vừa đọc vẫn còn trong vòng sau khi đọc xong -> dữ liệu nhất quán
+            if not rows or min(positions[0], positions[-1]) >= self._oldest(self.count): break
+        else:
+            floor = self._oldest(self.count)
+            rows = [row for p, row in zip(positions, rows) if p >= floor]
+        if len(rows) > limit: return rows[:limit], rows[limit - 1][0]
+        return rows, None
+
+    def stats(self):
+        # Sao chép các bộ đếm (O(16 x số cửa sổ)); đọc lại nếu ingest chen vào giữa chừng (seqlock_read)
+        return seqlock_read(self, self._read_stats, self._lock)
+
+    def _read_stats(self):
+        count = self.count
+        return {
+            "sessions_total": count,
+            "sessions_retained": count - self._oldest(count),
+            "retained": list(self.retained_totals),
+            "lifetime": list(self.lifetime_totals),
+            "windows": {w: list(c) for w, c in self.window_totals.items()},
+            "streak_lengths": list(self.streak_lengths),
+            "streak": (self.streak_bit, self.streak),
+            "first_phien": self._ids[self._oldest(count) % self._slots] if count else None,
+            "last_phien": self._ids[(count - 1) % self._slots] if count else None,
+        }
+
+    def dice_stats(self):
+        # Như stats() nhưng cho bộ đếm xúc xắc (O(36 x số cửa sổ)), không quét lại lịch sử
+        return seqlock_read(self, self._read_dice_stats, self._lock)
+
+    def _read_dice_stats(self):
+        count = self.count
+        return {
+            "sessions_total": count,
+            "known": self.dice_known,
+            "windows": {w: list(c) for w, c in self.dice_windows.items()},
+            "lifetime": list(self.dice_lifetime),
+            "last_phien": self._ids[(count - 1) % self._slots] if count else None,
+            "last": self._dice[(count - 1) % self._slots] if count else DICE_UNKNOWN,
+        }
+
+
+# ================== NHẬT KÝ PHIÊN BỀN VỮNG (Append-only Session Log) ==================
+# Mỗi phiên là một bản ghi cố định 12 byte: phiên (int64), 3 xúc xắc, tổng. Cùng định dạng với
+# file .bin mà backtest.py đọc, nên nhật ký chạy thật dùng trực tiếp cho phân tích offline.
+SESSION_RECORD = struct.Struct("<qBBBB")
+
+
+class SessionLog:
+    def __init__(self, path, fsync_interval=SESSION_LOG_FSYNC_INTERVAL, fsync_every=SESSION_LOG_FSYNC_EVERY):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._pending = 0
+        self._closed = False
+        self._thread = None
+        self._file = open(path, "ab")
+        # Bỏ bản ghi ghi dở ở cuối file (tiến trình chết giữa lúc ghi)
+        size = self._file.tell()
+        if size % SESSION_RECORD.size:
+            self._file.truncate(size - size % SESSION_RECORD.size)
+
+    def append(self, phien_id, dice):
+        with self._lock:
+            if self._file.closed: return
+            self._file.write(SESSION_RECORD.pack(phien_id, dice[0], dice[1], dice[2], sum(dice)))
+            self._pending += 1
+            if self._pending >= self.fsync_every: self._wake.set()
+
+    def sync(self):
+        with self._lock:
+            if not self._pending: return
+            self._file.flush()
+            self._pending = 0
+        # fsync nằm ngoài khóa để luồng ingest không bao giờ phải chờ đĩa
+        os.fsync(self._file.fileno())
+
+    def _flusher(self):
+        while not self._closed:
+            self._wake.wait(self.fsync_interval)
+            self._wake.clear()
+            try:
+                self.sync()
+            except OSError as e:
+                logging.error(f"❌ Lỗi fsync nhật ký phiên: {e}")
+
+    def start_flusher(self):
+        self._thread = threading.Thread(target=self._flusher, daemon=True, name="session-log-flusher")
+        self._thread.start()
+        return self
+
+    def close(self):
+        if self._closed: return
+        self._closed = True
+        self._wake.set()
+        # Chờ flusher thoát hẳn (nó có thể đang flush / fsync) rồi mới đóng file, và đóng dưới khóa ghi
+        if self._thread is not None: self._thread.join()
+        self.sync()
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,282 @@
+import argparse
+import inspect
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .backtest import _base_ext, iter_sessions
+from .vectorized import _pick, _rolling_sum, evaluate_strategies
+
+# ================== QUÉT THAM SỐ SONG SONG (Parallel Parameter Sweep) ==================
+# Các ngưỡng của chiến lược (s16 >= 10 / <= 4, s24 >= 15 / <= 5, s9 ±1.5, s3 ±1.0, s20 >= 4 lần chạm biên...)
+# vốn được chỉnh tay. Công cụ này nạp mảng phiên MỘT lần vào bộ nhớ chia sẻ (shared memory), tiến trình
+# con chỉ gắn vào (không sao chép), rồi chấm từng điểm lưới song song và xếp hạng theo tỷ lệ đúng.
+#
+#   python -m sumclub.sweep phien_2025.bin --param s16:hi=8:13 --param s16:lo=2:7 --param s9:threshold=0.5:3:0.25
+#
+# Mỗi điểm lưới chỉ thay MỘT chiến lược: chênh lệch điểm Tài - Xỉu của 24 chiến lược còn lại được tính
+# sẵn một lần (nằm trong bộ nhớ chia sẻ), nên consensus của mỗi điểm chỉ là vài phép toán vector O(N).
+# Consensus ở đây chỉ dùng để chọn cửa (tai >= xiu) nên không cần khớp từng bit với bước làm tròn của
+# consensus_from_scores.
+
+
+# ---- Chiến lược có tham số: mặc định khớp đúng hàng tương ứng của vectorized.evaluate_strategies ----
+def _s3(f, band=1.0):
+    weighted_mean = f.weighted_mean()
+    return _pick(f.L, 15, (0, 65.0), [
+        (weighted_mean > 10.5 + band, 0, 96.0),
+        (weighted_mean < 10.5 - band, 1, 96.0),
+    ], (f.B, 72.0))
+
+
+def _s9(f, threshold=1.5):
+    trend = f.trend()
+    return _pick(f.L, 7, (1, 60.0), [
+        (trend > threshold, 1, 90.0),
+        (trend < -threshold, 0, 90.0),
+    ], (f.B, 75.0))
+
+
+def _s16(f, window=14, hi=10, lo=4):
+    tai = f.rolling("tai", window)
+    return _pick(f.L, window, (0, 60.0), [
+        (tai >= hi, 0, 95.0),
+        (tai <= lo, 1, 95.0),
+    ], (f.B, 70.0))
+
+
+def _s20(f, window=15, hits=4, hi_total=15, lo_total=6):
+    return _pick(f.L, window, (0, 60.0), [
+        (f.rolling(("ge", hi_total), window) >= hits, 0, 94.0),
+        (f.rolling(("le", lo_total), window) >= hits, 1, 94.0),
+    ], (f.B, 70.0))
+
+
+def _s24(f, window=20, hi=15, lo=5):
+    tai = f.rolling("tai", window)
+    return _pick(f.L, window, (0, 60.0), [
+        (tai >= hi, 0, 98.0),
+        (tai <= lo, 1, 98.0),
+    ], (f.B, 70.0))
+
+
+# tên ngắn -> (chỉ số trong all_super_vip_algos, hàm có tham số); thêm chiến lược mới chỉ cần một dòng
+SWEEPABLE = {
+    "s3": (2, _s3),
+    "s9": (8, _s9),
+    "s16": (15, _s16),
+    "s20": (19, _s20),
+    "s24": (23, _s24),
+}
+INTEGER_PARAMS = {"window", "hi", "lo", "hits", "hi_total", "lo_total"}
+
+
+class Features:
+    # Đặc trưng trượt dùng lại giữa các điểm lưới trong cùng một tiến trình con (cache theo khóa).
+    # totals là view uint8 trên shared memory, chỉ các đặc trưng dẫn xuất mới được cấp phát riêng.
+    def __init__(self, totals):
+        self.T = totals
+        self.B = (totals >= 11).astype(np.int8)
+        self.L = np.arange(1, len(self.T) + 1)
+        self._cache = {}
+
+    def _cached(self, key, build):
+        if key not in self._cache: self._cache[key] = build()
+        return self._cache[key]
+
+    def rolling(self, source, window):
+        def build():
+            if source == "tai": x = self.B
+            elif source[0] == "ge": x = self.T >= source[1]
+            else: x = self.T <= source[1]
+            return _rolling_sum(x, window)
+        return self._cached((source, window), build)
+
+    def weighted_mean(self):
+        return self._cached("weighted_mean", lambda: np.convolve(self.T, np.arange(15, 0, -1))[:len(self.T)] / 120)
+
+    def trend(self):
+        def build():
+            T = self.T.astype(np.int64)
+            lag = lambda k: np.concatenate((np.zeros(k, dtype=np.int64), T[:len(T) - k]))
+            return (lag(2) + lag(1) + T) / 3 - (lag(6) + lag(5) + lag(4)) / 3
+        return self._cached("trend", build)
+
+
+# ================== BỘ NHỚ CHIA SẺ ==================
+def _to_shared(blocks, name, array):
+    shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+    np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+    blocks[name] = (shm, array.shape, array.dtype.str)
+    return shm
+
+
+_worker = {} # trạng thái của tiến trình con: handles shared memory, mảng view, Features
+
+
+def _attach(spec):
+    # initializer của process pool: gắn vào các khối shared memory theo tên (không sao chép dữ liệu)
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker.setdefault("handles", []).append(shm) # giữ tham chiếu để khối không bị đóng
+        _worker[name] = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+    _worker["features"] = Features(_worker["totals"])
+
+
+def score_point(point):
+    # point = (tên chiến lược, dict tham số) -> dict kết quả
+    strategy, params = point
+    fn = SWEEPABLE[strategy][1]
+    f = _worker["features"]
+    pred, conf = fn(f, **params)
+    # Chênh lệch điểm Tài - Xỉu của 24 chiến lược còn lại đã tính sẵn -> chỉ cộng phần của chiến lược mới
+    margin = _worker["margins"][list(SWEEPABLE).index(strategy)]
+    consensus = (margin + np.where(pred == 1, conf, -conf)) >= 0
+
+    # Dự đoán sau phiên p được chấm với kết quả phiên p + 1
+    actual = f.B[1:]
+    hit = pred[:-1] == actual
+    fired = conf[:-1] > 75.0 # độ tin cậy vượt mức mặc định = một quy tắc ngưỡng đã kích hoạt
+    n, n_fired = len(actual), int(fired.sum())
+    return {
+        "strategy": strategy,
+        "params": params,
+        "hit_rate": round(float(hit.mean()) * 100, 3) if n else None,
+        "fired": n_fired,
+        "fired_hit_rate": round(float(hit[fired].mean()) * 100, 3) if n_fired else None,
+        "consensus_hit_rate": round(float((consensus[:-1] == actual).mean()) * 100, 3) if n else None,
+    }
+
+
+# ================== NẠP DỮ LIỆU & LƯỚI THAM SỐ ==================
+def load_totals(paths):
+    # Nối các file thành một dãy tổng điểm; bỏ phiên trùng/cũ hơn giống on_message
+    parts = []
+    for path in paths:
+        if _base_ext(path) in (".csv", ".jsonl", ".ndjson", ".json"):
+            rows = np.array([(phien, tong) for phien, _, tong in iter_sessions(path)], dtype=np.int64).reshape(-1, 2)
+            parts.append((rows[:, 0], rows[:, 1]))
+        else:
+            # Đọc thẳng bản ghi SESSION_RECORD ("<qBBBB") bằng dtype có cấu trúc, không qua vòng lặp Python
+            records = np.fromfile(path, dtype=np.dtype([("phien", "<i8"), ("dice", "u1", 3), ("tong", "u1")]))
+            parts.append((records["phien"], records["tong"].astype(np.int64)))
+    if not parts: return np.zeros(0, dtype=np.uint8)
+    phien = np.concatenate([p for p, _ in parts])
+    totals = np.concatenate([t for _, t in parts])
+    previous_max = np.maximum.accumulate(np.concatenate(([np.iinfo(np.int64).min], phien[:-1])))
+    return totals[phien > previous_max].astype(np.uint8)
+
+
+def _parse_values(text, integer):
+    # "8:13" -> 8..12, "0.5:3:0.25" -> dải bước 0.25, "8,10,12" -> danh sách
+    cast = int if integer else float
+    if ":" in text:
+        parts = [float(x) for x in text.split(":")]
+        start, stop, step = parts[0], parts[1], parts[2] if len(parts) > 2 else 1
+        values = np.arange(start, stop, step)
+        return [cast(round(v, 10)) for v in values]
+    return [cast(x) for x in text.split(",")]
+
+
+def check_grid(grid):
+    # Tên tham số phải có trong chữ ký hàm của chiến lược: sai chính tả thì báo ngay, trước khi cấp shared
+    # memory và dựng process pool (nếu không chỉ thấy TypeError từ trong tiến trình con)
+    for strategy, params in grid.items():
+        if strategy not in SWEEPABLE:
+            raise ValueError(f"Chiến lược không hỗ trợ quét: {strategy!r} (hỗ trợ: {', '.join(SWEEPABLE)})")
+        accepted = list(inspect.signature(SWEEPABLE[strategy][1]).parameters)[1:] # bỏ đối số Features
+        unknown = [name for name in params if name not in accepted]
+        if unknown:
+            raise ValueError(f"{strategy} không có tham số {', '.join(unknown)} (có: {', '.join(accepted)})")
+    return grid
+
+
+def parse_grid(specs):
+    # ["s16:hi=8:13", "s16:lo=2,3,4"] -> {"s16": {"hi": [...], "lo": [...]}}
+    grid = {}
+    for spec in specs:
+        strategy, _, assignment = spec.partition(":")
+        name, _, values = assignment.partition("=")
+        if strategy not in SWEEPABLE or not name or not values:
+            raise ValueError(f"Tham số lưới không hợp lệ: {spec!r} (chiến lược hỗ trợ: {', '.join(SWEEPABLE)})")
+        grid.setdefault(strategy, {})[name] = _parse_values(values, name in INTEGER_PARAMS)
+    return check_grid(grid)
+
+
+def grid_points(grid):
+    for strategy, params in grid.items():
+        names = list(params)
+        for combo in itertools.product(*(params[n] for n in names)):
+            yield strategy, dict(zip(names, combo))
+
+
+def sweep(totals, grid, workers=None, chunksize=16):
+    points = list(grid_points(check_grid(grid)))
+    if not points: return []
+    preds, confs = evaluate_strategies(totals)
+    signed = np.where(preds == 1, confs, -confs)
+    total_margin = signed.sum(axis=0)
+    blocks = {}
+    try:
+        _to_shared(blocks, "totals", np.ascontiguousarray(totals, dtype=np.uint8))
+        _to_shared(blocks, "margins", np.stack([total_margin - signed[SWEEPABLE[name][0]] for name in SWEEPABLE]))
+        del preds, confs, signed
+        spec = {name: (shm.name, shape, dtype) for name, (shm, shape, dtype) in blocks.items()}
+        if workers == 1:
+            _attach(spec)
+            try:
+                return [score_point(p) for p in points]
+            finally:
+                # Bỏ mọi view trước rồi mới đóng handle thứ hai do _attach mở trong chính tiến trình này
+                handles = _worker.pop("handles", [])
+                _worker.clear()
+                for shm in handles: shm.close()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(spec,)) as pool:
+            return list(pool.map(score_point, points, chunksize=chunksize))
+    finally:
+        for shm, _, _ in blocks.values():
+            shm.close()
+            shm.unlink()
+
+
+def rank(results, key="consensus_hit_rate", min_fired=0):
+    eligible = [r for r in results if r[key] is not None and r["fired"] >= min_fired]
+    return sorted(eligible, key=lambda r: r[key], reverse=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quét lưới ngưỡng chiến lược song song trên file phiên đã ghi")
+    parser.add_argument("files", nargs="+", help="File .bin (nhật ký phiên) / .csv / .jsonl")
+    parser.add_argument("--param", action="append", default=[], metavar="sN:ten=GIÁ_TRỊ",
+                        help="VD: s16:hi=8:13, s9:threshold=0.5:3:0.25, s20:hits=3,4,5 (lặp lại được)")
+    parser.add_argument("--workers", type=int, default=None, help="Số tiến trình (mặc định: số CPU)")
+    parser.add_argument("--rank", default="consensus_hit_rate",
+                        choices=("consensus_hit_rate", "hit_rate", "fired_hit_rate"))
+    parser.add_argument("--min-fired", type=int, default=0, help="Bỏ cấu hình kích hoạt ít hơn số lần này")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="In kết quả dạng JSON")
+    args = parser.parse_args(argv)
+
+    grid = parse_grid(args.param)
+    began = time.perf_counter()
+    totals = load_totals(args.files)
+    results = sweep(totals, grid, args.workers)
+    ranked = rank(results, args.rank, args.min_fired)[:args.top]
+    elapsed = time.perf_counter() - began
+    if args.json:
+        print(json.dumps({"sessions": len(totals), "points": len(results), "elapsed_s": round(elapsed, 3),
+                          "rank_by": args.rank, "top": ranked}, ensure_ascii=False, indent=2))
+        return
+    print(f"Phiên: {len(totals)} | Điểm lưới: {len(results)} | {elapsed:.1f}s | xếp hạng theo {args.rank}")
+    for r in ranked:
+        params = ", ".join(f"{k}={v}" for k, v in r["params"].items())
+        print(f"  {r['strategy']}({params}): consensus {r['consensus_hit_rate']}% | chiến lược {r['hit_rate']}% | "
+              f"kích hoạt {r['fired']} lần, đúng {r['fired_hit_rate']}%")
+
+
+if __name__ == "__main__":
+    main()
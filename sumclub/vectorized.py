@@ -0,0 +1,372 @@
+import itertools
+
+import numpy as np
+
+from .engine import ENGINE_MAX_WINDOW
+from .strategies import SUFFIX_WINDOW, all_super_vip_algos, consensus_from_scores, suffix_key
+
+# ================== BACKEND VECTOR HÓA 25 CHIẾN LƯỢC (NumPy Sliding Windows) ==================
+# Đánh giá mỗi chiến lược tại MỌI vị trí của một mảng tổng điểm dài trong một lượt:
+# vị trí p tương ứng với lịch sử totals[:p + 1]. Kết quả khớp từng bit với ai_predict_super_consensus
+# (với lịch sử giữ >= 20 phiên, xem ENGINE_MAX_WINDOW), nhưng chấm điểm hàng trăm nghìn phiên chỉ
+# mất vài giây thay vì vòng lặp Python gọi lại consensus cho từng tiền tố.
+#
+# Quy ước: dự đoán là mảng int8, 1 = Tài, 0 = Xỉu; độ tin cậy là float64.
+
+NUM_STRATEGIES = 25
+
+
+def _lag(x, k):
+    # x[p - k] tại vị trí p (điền 0 cho p < k; các vị trí đó luôn bị điều kiện độ dài chặn trước)
+    out = np.zeros_like(x)
+    if k < len(x): out[k:] = x[:len(x) - k]
+    return out
+
+
+def _rolling_sum(x, k):
+    # Tổng trượt k phần tử kết thúc tại p, dùng tổng tích lũy (cumulative sum)
+    cs = np.concatenate(([0], np.cumsum(x, dtype=np.int64)))
+    idx = np.arange(1, len(x) + 1)
+    return cs[idx] - cs[np.maximum(idx - k, 0)]
+
+
+def _pick(length, min_len, fallback, rules, default):
+    # Tương đương chuỗi if/return của hàm vô hướng: điều kiện đầu tiên đúng sẽ thắng.
+    # fallback/rules/default là các cặp (dự đoán, độ tin cậy); mỗi phần tử có thể là mảng hoặc số.
+    conds = [length < min_len] + [c for c, _, _ in rules]
+    preds = [fallback[0]] + [p for _, p, _ in rules]
+    confs = [fallback[1]] + [f for _, _, f in rules]
+    pred = np.select(conds, [np.broadcast_to(p, length.shape) for p in preds], default[0])
+    conf = np.select(conds, [np.broadcast_to(float(f), length.shape) for f in confs], float(default[1]))
+    return pred.astype(np.int8), conf
+
+
+def evaluate_strategies(totals, outcomes=None, lengths=None, streak=None):
+    # Trả về (preds, confs) dạng (25, N), cùng thứ tự với all_super_vip_algos.
+    # outcomes mặc định suy ra từ tổng (>= 11 là Tài) giống on_message.
+    # lengths / streak: độ dài lịch sử và chuỗi bệt tại từng vị trí, khi mảng là nhiều lịch sử độc lập
+    # ghép nối (xem evaluate_batch); mặc định là một lịch sử duy nhất bắt đầu từ vị trí 0.
+    T = np.asarray(totals, dtype=np.int64)
+    B = (T >= 11).astype(np.int64) if outcomes is None else np.asarray(outcomes, dtype=np.int64)
+    n = len(T)
+    if n == 0:
+        return np.zeros((NUM_STRATEGIES, 0), dtype=np.int8), np.zeros((NUM_STRATEGIES, 0))
+    L = np.arange(1, n + 1) if lengths is None else np.asarray(lengths, dtype=np.int64)
+    nB = 1 - B
+    lagB = {k: _lag(B, k) for k in range(1, 10)}
+    lagT = {k: _lag(T, k) for k in range(1, 7)}
+
+    # Độ dài chuỗi bệt tại mỗi vị trí (s1, s8)
+    if streak is None:
+        change = np.ones(n, dtype=bool)
+        change[1:] = B[1:] != B[:-1]
+        run_start = np.maximum.accumulate(np.where(change, np.arange(n), 0))
+        streak = np.arange(n) - run_start + 1
+
+    tai5, tai14, tai20 = (_rolling_sum(B, k) for k in (5, 14, 20))
+    out = []
+
+    # 1. Fibonacci
+    out.append(_pick(L, 13, (1, 60.0), [
+        ((streak == 5) | (streak == 8), B, 90.0),
+        (streak >= 13, nB, 99.5),
+    ], (B, 70.0)))
+
+    # 2. Markov 3 bước trên 10 phiên: so khớp mã 3-bit kết thúc tại p - 7 + i với 3 phiên cuối
+    code3 = lagB[2] * 4 + lagB[1] * 2 + B
+    tai_prob = np.zeros(n, dtype=np.int64)
+    xiu_prob = np.zeros(n, dtype=np.int64)
+    for i in range(7):
+        match = _lag(code3, 7 - i) == code3
+        nxt = lagB[6 - i] if 6 - i else B
+        tai_prob += match & (nxt == 1)
+        xiu_prob += match & (nxt == 0)
+    enough = tai_prob + xiu_prob > 2
+    out.append(_pick(L, 10, (0, 60.0), [
+        (enough & (tai_prob > xiu_prob * 2), 1, 94.0),
+        (enough & (xiu_prob > tai_prob * 2), 0, 94.0),
+    ], (B, 75.0)))
+
+    # 3. Hồi quy trọng số 15: tích chập với trọng số 15..1 (phiên mới nhất nặng nhất)
+    wsum = np.convolve(T, np.arange(15, 0, -1))[:n]
+    weighted_mean = wsum / 120
+    out.append(_pick(L, 15, (0, 65.0), [
+        (weighted_mean > 11.5, 0, 96.0),
+        (weighted_mean < 9.5, 1, 96.0),
+    ], (B, 72.0)))
+
+    # 4. Entropy 20
+    hi_cnt, lo_cnt = np.maximum(tai20, 20 - tai20), np.minimum(tai20, 20 - tai20)
+    out.append(_pick(L, 20, (1, 60.0), [
+        (hi_cnt >= 15, nB, 97.0),
+        ((lo_cnt >= 8) & (lagB[1] != B), lagB[1], 85.0),
+        (lo_cnt >= 8, nB, 90.0),
+    ], (B, 70.0)))
+
+    # 5. Gương 8
+    mirror8 = (lagB[7] == B) & (lagB[6] == lagB[1]) & (lagB[5] == lagB[2]) & (lagB[4] == lagB[3])
+    out.append(_pick(L, 8, (1, 60.0), [(mirror8, lagB[7], 98.5)], (B, 70.0)))
+
+    # 6. Cực biên 5
+    extreme5 = _rolling_sum((T == 3) | (T == 18), 5)
+    out.append(_pick(L, 5, (0, 60.0), [(extreme5 > 0, (T < 11).astype(np.int64), 95.0)], (B, 75.0)))
+
+    # 7. Chẵn/lẻ 8
+    odd8 = _rolling_sum(T % 2, 8)
+    out.append(_pick(L, 8, (1, 60.0), [
+        (odd8 >= 6, 0, 92.0),
+        (8 - odd8 >= 6, 1, 92.0),
+    ], (B, 70.0)))
+
+    # 8. Anti-Martingale: 4 phiên cuối cùng một cửa <=> chuỗi bệt >= 4
+    out.append(_pick(L, 6, (0, 60.0), [(streak >= 4, nB, 96.0)], (B, 70.0)))
+
+    # 9. Độ lệch tuyến tính 7
+    trend = (lagT[2] + lagT[1] + T) / 3 - (lagT[6] + lagT[5] + lagT[4]) / 3
+    out.append(_pick(L, 7, (1, 60.0), [
+        (trend > 1.5, 1, 90.0),
+        (trend < -1.5, 0, 90.0),
+    ], (B, 75.0)))
+
+    # 10. Momentum 3
+    t1, t2, t3 = lagT[2], lagT[1], T
+    up = (t3 > t2) & (t2 > t1)
+    down = (t3 < t2) & (t2 < t1)
+    out.append(_pick(L, 3, (1, 60.0), [
+        (up & (t3 >= 12), 0, 93.0),
+        (up, 1, 90.0),
+        (down & (t3 <= 9), 1, 93.0),
+        (down, 0, 90.0),
+    ], (B, 70.0)))
+
+    # 11. Luân phiên kép 2-1-2
+    alt212 = (lagB[4] == lagB[3]) & (lagB[1] == B) & (lagB[4] == B) & (lagB[2] != lagB[4])
+    out.append(_pick(L, 6, (1, 60.0), [(alt212, nB, 95.0)], (B, 70.0)))
+
+    # 12. Khoảng cách trung bình 10 (nhân 2 để giữ số nguyên, phép so sánh tỷ lệ không đổi)
+    tai_dist = _rolling_sum(np.where(B == 1, 2 * T - 21, 0), 10) / 2
+    xiu_dist = _rolling_sum(np.where(B == 0, 21 - 2 * T, 0), 10) / 2
+    out.append(_pick(L, 10, (0, 60.0), [
+        (tai_dist > xiu_dist * 1.5, 0, 92.0),
+        (xiu_dist > tai_dist * 1.5, 1, 92.0),
+    ], (B, 75.0)))
+
+    # 13. Bệt cung 3-1-3
+    arc = ((lagB[6] == lagB[5]) & (lagB[5] == lagB[4]) & (lagB[2] == lagB[1]) & (lagB[1] == B)
+           & (lagB[3] != lagB[6]))
+    out.append(_pick(L, 9, (1, 60.0), [(arc, 1 - lagB[6], 95.0)], (B, 70.0)))
+
+    # 14. Chỉ số lỗi kép: số cặp giống nhau trong 9 cặp của 10 phiên cuối
+    same = np.zeros(n, dtype=np.int64)
+    same[1:] = B[1:] == B[:-1]
+    streak_count = _rolling_sum(same, 9)
+    alternating_count = 9 - streak_count
+    out.append(_pick(L, 10, (0, 60.0), [
+        ((streak_count > alternating_count * 2) & (B == lagB[1]), B, 90.0),
+        ((alternating_count > streak_count * 2) & (B != lagB[1]), lagB[1], 90.0),
+    ], (B, 73.0)))
+
+    # 15. Phá vỡ cầu 5
+    out.append(_pick(L, 5, (1, 60.0), [(((tai5 == 2) | (tai5 == 3)) & (lagB[1] != B), B, 93.0)], (B, 70.0)))
+
+    # 16. RSI 14
+    out.append(_pick(L, 14, (0, 60.0), [
+        (tai14 >= 10, 0, 95.0),
+        (tai14 <= 4, 1, 95.0),
+    ], (B, 70.0)))
+
+    # 17. Nhảy tổng tuyệt đối
+    out.append(_pick(L, 2, (1, 60.0), [(np.abs(T - lagT[1]) >= 10, (T < 11).astype(np.int64), 99.0)], (B, 75.0)))
+
+    # 18. Lặp gương 6
+    aabbaa = ((lagB[5] == lagB[4]) & (lagB[3] == lagB[2]) & (lagB[1] == B) & (lagB[5] == lagB[1])
+              & (lagB[5] != lagB[3]))
+    out.append(_pick(L, 6, (0, 60.0), [(aabbaa, lagB[3], 93.0)], (B, 70.0)))
+
+    # 19. Phân kỳ tổng
+    sum5 = _rolling_sum(T, 5)
+    sum_trend = sum5 / 5 - (_rolling_sum(T, 10) - sum5) / 5
+    out.append(_pick(L, 12, (1, 60.0), [
+        ((tai5 > 2) & (sum_trend < -0.5), 0, 96.0),
+        ((tai5 <= 2) & (sum_trend > 0.5), 1, 96.0),
+    ], (B, 75.0)))
+
+    # 20. Tích lũy biên 15
+    out.append(_pick(L, 15, (0, 60.0), [
+        (_rolling_sum(T >= 15, 15) >= 4, 0, 94.0),
+        (_rolling_sum(T <= 6, 15) >= 4, 1, 94.0),
+    ], (B, 70.0)))
+
+    # 21. Chặn số lớn 4
+    out.append(_pick(L, 4, (1, 60.0), [(_rolling_sum((T >= 13) & (T <= 17), 4) >= 3, 0, 92.0)], (B, 70.0)))
+
+    # 22. Lặp 3 phiên
+    repeat3 = (lagB[5] == lagB[2]) & (lagB[4] == lagB[1]) & (lagB[3] == B)
+    out.append(_pick(L, 6, (0, 60.0), [(repeat3, nB, 95.0)], (B, 70.0)))
+
+    # 23. Bệt trung tâm 7
+    center7 = _rolling_sum((T == 10) | (T == 11), 7)
+    out.append(_pick(L, 7, (1, 60.0), [(center7 >= 5, (T == 11).astype(np.int64), 97.0)], (B, 75.0)))
+
+    # 24. Z-score 20
+    out.append(_pick(L, 20, (0, 60.0), [
+        (tai20 >= 15, 0, 98.0),
+        (tai20 <= 5, 1, 98.0),
+    ], (B, 70.0)))
+
+    # 25. Nhị phân trọng số 4-3-2-1 (phiên cũ nhất nặng nhất)
+    sign = 2 * B - 1
+    score = 4 * _lag(sign, 3) + 3 * _lag(sign, 2) + 2 * _lag(sign, 1) + sign
+    out.append(_pick(L, 4, (1, 60.0), [
+        (score >= 5, 1, 92.0),
+        (score <= -5, 0, 92.0),
+    ], (B, 70.0)))
+
+    return np.stack([p for p, _ in out]), np.stack([c for _, c in out])
+
+
+def vectorized_consensus(preds, confs):
+    # Cộng điểm tuần tự theo thứ tự chiến lược (giống sum() của bản vô hướng, không dùng cộng cặp
+    # của NumPy) rồi áp bước làm tròn của consensus_from_scores trên các cặp điểm khác nhau.
+    tai_score = np.zeros(preds.shape[1])
+    xiu_score = np.zeros(preds.shape[1])
+    for k in range(preds.shape[0]):
+        tai_score = tai_score + np.where(preds[k] == 1, confs[k], 0.0)
+        xiu_score = xiu_score + np.where(preds[k] == 0, confs[k], 0.0)
+
+    pairs, inverse = np.unique(np.stack([tai_score, xiu_score], axis=1), axis=0, return_inverse=True)
+    pair_pred = np.empty(len(pairs), dtype=np.int8)
+    pair_conf = np.empty(len(pairs))
+    for i, (tai, xiu) in enumerate(pairs.tolist()):
+        res = consensus_from_scores(tai, xiu)
+        pair_pred[i] = res["du_doan"] == "Tài"
+        pair_conf[i] = res["do_tin_cay"]
+    inverse = inverse.reshape(-1)
+    return pair_pred[inverse], pair_conf[inverse]
+
+
+def evaluate(totals, outcomes=None):
+    # Trả về (preds, confs, du_doan, do_tin_cay): từng chiến lược (25, N) và consensus (N,)
+    preds, confs = evaluate_strategies(totals, outcomes)
+    du_doan, do_tin_cay = vectorized_consensus(preds, confs)
+    return preds, confs, du_doan, do_tin_cay
+
+
+# ================== DỰ ĐOÁN THEO LÔ (Batch of Independent Histories) ==================
+# Mỗi chiến lược chỉ nhìn tối đa ENGINE_MAX_WINDOW phiên cuối (trừ độ dài chuỗi bệt của s1/s8), nên chỉ
+# cần ghép đuôi <= 20 phiên của mọi lịch sử thành MỘT mảng, đánh giá cả 25 chiến lược trong một lượt
+# NumPy rồi lấy vị trí cuối của từng lịch sử. Độ dài thật và chuỗi bệt thật được truyền riêng, nên cửa sổ
+# chạm sang lịch sử liền trước luôn bị điều kiện độ dài chặn như ở bản vô hướng. Kết quả khớp từng lịch sử
+# với ai_predict_super_consensus(history, totals).
+_LABEL_BITS = {"Tài": 1, "Xỉu": 0}
+
+
+def _check_sequence(i, history, totals):
+    # Kiểm tra từng phần tử theo kiểu (JSON có thể chứa số thực, bool, mảng lồng nhau): chỉ int 3..18
+    if not isinstance(totals, (list, tuple)) or not all(type(t) is int and 3 <= t <= 18 for t in totals):
+        raise ValueError(f"Chuỗi {i}: totals phải là danh sách tổng 3..18")
+    if history is None: return
+    if not isinstance(history, (list, tuple)) or not all(type(h) is str and h in _LABEL_BITS for h in history):
+        raise ValueError(f"Chuỗi {i}: history chỉ gồm 'Tài' / 'Xỉu'")
+    if len(history) != len(totals):
+        raise ValueError(f"Chuỗi {i}: history và totals phải cùng độ dài")
+
+
+def evaluate_batch(sequences, window=ENGINE_MAX_WINDOW):
+    # sequences: các cặp (history, totals); history = None -> suy ra từ totals (>= 11 là Tài).
+    # Trả về (preds, confs, du_doan, do_tin_cay): từng chiến lược (25, B) và consensus (B,).
+    T, counts, sizes, full, labelled = [], [], [], [], []
+    for i, (history, totals) in enumerate(sequences):
+        _check_sequence(i, history, totals)
+        n = len(totals)
+        k = min(n, window)
+        # Lịch sử rỗng: một vị trí giả với độ dài 0, mọi chiến lược rơi vào nhánh "chưa đủ dữ liệu"
+        if k: T.extend(totals[n - k:])
+        else: T.append(10)
+        # Kết quả mặc định suy ra từ tổng; chỉ các lịch sử có history riêng mới phải ghi đè
+        if k and history is not None: labelled.append((len(T) - k, history[n - k:]))
+        counts.append(n)
+        sizes.append(max(k, 1))
+        full.append((history, totals))
+    if not counts:
+        empty = np.zeros((NUM_STRATEGIES, 0))
+        return empty.astype(np.int8), empty, np.zeros(0, dtype=np.int8), np.zeros(0)
+
+    T = np.asarray(T, dtype=np.int64)
+    B = (T >= 11).astype(np.int64)
+    for start, labels in labelled:
+        B[start:start + len(labels)] = [_LABEL_BITS[label] for label in labels]
+    counts = np.asarray(counts, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    ends = np.cumsum(sizes) - 1
+    starts = ends - sizes + 1
+    offset = np.arange(len(T)) - np.repeat(starts, sizes)
+    lengths = np.repeat(np.maximum(counts - sizes, 0), sizes) + offset + 1
+    lengths[ends[counts == 0]] = 0
+
+    # Chuỗi bệt trong đuôi (reset ở đầu mỗi lịch sử); đuôi toàn một cửa thì đếm tiếp vào phần trước đuôi
+    change = np.ones(len(B), dtype=bool)
+    change[1:] = B[1:] != B[:-1]
+    change[starts] = True
+    run_start = np.maximum.accumulate(np.where(change, np.arange(len(B)), 0))
+    streak = np.arange(len(B)) - run_start + 1
+    for j in np.flatnonzero((streak[ends] == sizes) & (counts > sizes)).tolist():
+        history, totals = full[j]
+        before = int(counts[j] - sizes[j]) - 1
+        bits = (map(_LABEL_BITS.__getitem__, history[before::-1]) if history is not None
+                else (t >= 11 for t in totals[before::-1]))
+        last = B[ends[j]]
+        streak[ends[j]] += sum(1 for _ in itertools.takewhile(lambda bit: bit == last, bits))
+
+    preds, confs = evaluate_strategies(T, B, lengths, streak)
+    preds, confs = preds[:, ends], confs[:, ends]
+    du_doan, do_tin_cay = vectorized_consensus(preds, confs)
+    return preds, confs, du_doan, do_tin_cay
+
+
+def predict_batch(sequences, strategies=False, memo=None):
+    # Như ai_predict_super_consensus cho từng (history, totals), nhưng cả lô trong một lượt vector hóa.
+    # strategies=True kèm dự đoán của từng chiến lược (theo tên hàm trong all_super_vip_algos).
+    # memo (ConsensusMemo): chỉ vector hóa các hậu tố chưa gặp, hậu tố trùng trong lô tính một lần.
+    if memo is not None: return _predict_memoized(sequences, strategies, memo)
+    preds, confs, du_doan, do_tin_cay = evaluate_batch(sequences)
+    labels = ("Xỉu", "Tài")
+    out = [{"du_doan": labels[p], "do_tin_cay": c} for p, c in zip(du_doan.tolist(), do_tin_cay.tolist())]
+    if strategies:
+        names = [fn.__name__ for fn in all_super_vip_algos]
+        preds, confs = preds.T.tolist(), confs.T.tolist()
+        for row, p, c in zip(out, preds, confs):
+            row["strategies"] = {name: {"du_doan": labels[pk], "do_tin_cay": ck} for name, pk, ck in zip(names, p, c)}
+    return out
+
+
+def _copy_row(row):
+    # Giá trị trong memo dùng chung giữa các request: trả bản sao cả dict "strategies" lồng bên trong
+    out = dict(row)
+    if "strategies" in out: out["strategies"] = {name: dict(pred) for name, pred in out["strategies"].items()}
+    return out
+
+
+def _predict_memoized(sequences, strategies, memo):
+    keys, found, missing = [], {}, {}
+    for i, (history, totals) in enumerate(sequences):
+        _check_sequence(i, history, totals)
+        labels = history if history is not None else [("Xỉu", "Tài")[t >= 11] for t in totals[-SUFFIX_WINDOW:]]
+        key = suffix_key(labels, totals)
+        if key is None:
+            # Không nén được thành khóa: tính thẳng, không qua memo (khóa int không trùng khóa bytes)
+            keys.append(i)
+            missing[i] = (history, totals)
+            continue
+        # Kết quả có/không kèm 25 chiến lược là hai giá trị khác nhau trong cùng memo
+        if strategies: key += b"S"
+        keys.append(key)
+        if key in found or key in missing: continue
+        row = memo.lookup(key)
+        if row is None: missing[key] = (history, totals)
+        else: found[key] = row
+    if missing:
+        for key, row in zip(missing, predict_batch(list(missing.values()), strategies)):
+            if isinstance(key, bytes): memo.store(key, row)
+            found[key] = row
+    return [_copy_row(found[key]) for key in keys]
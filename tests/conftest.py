@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Chạy được `python -m pytest` lẫn `pytest` từ bất kỳ thư mục nào: gói sumclub nằm ở gốc repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,101 @@
+import asyncio
+import random
+import uuid
+
+import pytest
+
+pytest.importorskip("aiohttp")
+from aiohttp import web
+
+from sumclub.async_ingest import AsyncIngestClient
+from sumclub.ingest import backoff_delay
+from sumclub.metrics import WS_RECONNECTS
+from sumclub.standin_hub import StandinHub
+from sumclub.state import TableState
+
+
+async def _start_hub(hub):
+    runner = web.AppRunner(hub.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}"
+
+
+async def _wait_for(condition, timeout=15.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "hết thời gian chờ"
+        await asyncio.sleep(0.02)
+
+
+@pytest.mark.parametrize("fault", ["stall_after", "drop_after"])
+def test_client_reconnects_after_stall_or_drop(fault):
+    async def scenario():
+        hub = StandinHub(interval=0.02, keepalive=0.05, seed=1, **{fault: 3})
+        runner, url = await _start_hub(hub)
+        table = TableState(f"test-{fault}-{uuid.uuid4().hex[:6]}", url, hub.hub_name, speculate=False)
+        reconnects = WS_RECONNECTS.labels(table.name)
+        client = AsyncIngestClient([table], stall_timeout=0.3, heartbeat=5.0, backoff_base=0.01, backoff_max=0.05)
+        task = asyncio.create_task(client.run())
+        try:
+            # Mỗi kết nối chỉ nhận 3 phiên rồi treo / bị đóng -> phải nối lại ít nhất 2 lần để đủ 8 phiên
+            await _wait_for(lambda: table.session_index.count >= 8)
+            assert hub.connections >= 3
+            assert reconnects._value >= 2
+            assert table.current_snapshot.phien >= 8
+        finally:
+            client.stop()
+            await asyncio.wait_for(task, 5)
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_client_survives_malformed_negotiate_body():
+    async def scenario():
+        calls = []
+
+        async def negotiate(request):
+            calls.append(1)
+            return web.json_response(["không phải object"]) # TypeError khi lấy ["ConnectionToken"]
+
+        application = web.Application()
+        application.router.add_get("/signalr/negotiate", negotiate)
+        runner = web.AppRunner(application)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+        table = TableState(f"test-bad-{uuid.uuid4().hex[:6]}", url, "luckydice1Hub", speculate=False)
+        client = AsyncIngestClient([table], backoff_base=0.01, backoff_max=0.02)
+        task = asyncio.create_task(client.run())
+        try:
+            await _wait_for(lambda: len(calls) >= 3)
+            assert not task.done()
+        finally:
+            client.stop()
+            await asyncio.wait_for(task, 5)
+            await runner.cleanup()
+
+    asyncio.run(scenario())
+
+
+def test_backoff_delay_is_bounded_full_jitter():
+    rng = random.Random(0)
+    assert backoff_delay(0, rng=rng) == 0.0
+    for attempt in range(1, 12):
+        assert 0 <= backoff_delay(attempt, 0.25, 15.0, rng) <= min(15.0, 0.25 * 2 ** (attempt - 1))
+
+
+def test_stop_from_another_thread_ends_client_thread():
+    from sumclub.async_ingest import run_in_thread
+    # Cổng đóng: client chỉ lặp negotiate lỗi + chờ backoff, stop() phải đánh thức được từ thread chính
+    table = TableState(f"test-stop-{uuid.uuid4().hex[:6]}", "http://127.0.0.1:9", "luckydice1Hub", speculate=False)
+    client, thread = run_in_thread([table], backoff_base=5.0, backoff_max=5.0)
+    thread.join(0.5)
+    client.stop()
+    thread.join(3)
+    assert not thread.is_alive()
@@ -0,0 +1,66 @@
+import gzip
+import json
+import random
+
+import pytest
+
+from sumclub.backtest import backtest, iter_sessions, read_binary, replay
+from sumclub.storage import SESSION_RECORD
+
+
+def _sessions(count=500, seed=6):
+    rng = random.Random(seed)
+    out = []
+    for n in range(count):
+        dice = [rng.randint(1, 6) for _ in range(3)]
+        out.append((9000 + n, dice, sum(dice)))
+    return out
+
+
+def _write_all(tmp_path, sessions):
+    binary = tmp_path / "phien.bin"
+    binary.write_bytes(b"".join(SESSION_RECORD.pack(p, *d, t) for p, d, t in sessions) + b"\x01\x02\x03")
+    text = tmp_path / "phien.csv"
+    text.write_text("phien,dice1,dice2,dice3,tong\n" + "".join(f"{p},{d[0]},{d[1]},{d[2]},{t}\n" for p, d, t in sessions))
+    packed = tmp_path / "phien.jsonl.gz"
+    with gzip.open(packed, "wt", encoding="utf-8") as f:
+        for i, (p, d, _) in enumerate(sessions):
+            # Xen hai dạng dòng: latest_result và Result gốc của hub
+            row = {"phien": p, "xucxac": d} if i % 2 else {"SessionID": p, "Dice1": d[0], "Dice2": d[1], "Dice3": d[2]}
+            f.write(json.dumps(row) + "\n\n")
+    return str(binary), str(text), str(packed)
+
+
+def test_readers_agree_and_binary_seeks_to_shard(tmp_path):
+    sessions = _sessions()
+    paths = _write_all(tmp_path, sessions)
+    for path in paths:
+        assert list(iter_sessions(path)) == sessions, path
+    binary, text, _ = paths
+    assert list(iter_sessions(binary, 123, 321)) == sessions[123:321]
+    assert list(read_binary(binary, 490, None, chunk_records=3)) == sessions[490:] # bỏ bản ghi ghi dở ở cuối
+    with pytest.raises(ValueError):
+        iter_sessions(text, 10, 20)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_sharded_backtest_matches_one_pass(tmp_path, workers):
+    sessions = _sessions()
+    binary, text, packed = _write_all(tmp_path, sessions)
+    whole = replay(sessions).report()
+    assert whole["sessions"] == len(sessions) - 1
+    for shard_size in (37, 250, 10_000):
+        report = backtest([binary], workers=workers, shard_size=shard_size, memo_size=0).report()
+        for key in ("sessions", "hit_rate", "mean_confidence", "calibration", "strategies"):
+            assert report[key] == whole[key], (shard_size, key)
+    # Nhiều file: mỗi file là một lượt riêng, cộng dồn thống kê
+    report = backtest([text, packed], workers=workers, memo_size=16).report()
+    assert report["sessions"] == 2 * whole["sessions"] and report["hit_rate"] == whole["hit_rate"]
+
+
+def test_reference_replay_matches_engine_and_skips_stale_sessions():
+    sessions = _sessions(200)
+    noisy = sessions[:50] + [sessions[10], sessions[49]] + sessions[50:]
+    engine, reference = replay(noisy).report(), replay(sessions, reference=True).report()
+    for key in ("sessions", "hit_rate", "strategies", "calibration"):
+        assert engine[key] == reference[key]
@@ -0,0 +1,54 @@
+import random
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from sumclub import vectorized
+from sumclub.backtest import replay
+from sumclub.strategies import ConsensusMemo
+from sumclub.vectorized import predict_batch
+
+
+def _sequences(seed=1, count=200):
+    r = random.Random(seed)
+    return [(None, [r.randint(3, 18) for _ in range(r.choice([0, 1, 4, 19, 20, 30]))]) for _ in range(count)]
+
+
+def test_memoized_batch_matches_plain_and_hits_on_repeat():
+    sequences = _sequences()
+    memo = ConsensusMemo(1000)
+    plain = predict_batch(sequences, strategies=True)
+    assert predict_batch(sequences, strategies=True, memo=memo) == plain
+    assert predict_batch(sequences, strategies=True, memo=memo) == plain
+    assert memo.hits > 0
+
+
+def test_memo_hits_do_not_share_nested_dicts():
+    memo = ConsensusMemo(16)
+    sequence = [(None, [3, 18, 11, 10, 12])]
+    first = predict_batch(sequence, strategies=True, memo=memo)[0]
+    first["du_doan"] = "?"
+    for pred in first["strategies"].values(): pred["du_doan"] = "?"
+    assert predict_batch(sequence, strategies=True, memo=memo) == predict_batch(sequence, strategies=True)
+
+
+def test_memoized_batch_rejects_float_totals():
+    with pytest.raises(ValueError):
+        predict_batch([(None, [10.0, 11.0])], memo=ConsensusMemo(16))
+
+
+def test_unkeyable_sequence_bypasses_memo(monkeypatch):
+    monkeypatch.setattr(vectorized, "suffix_key", lambda history, totals: None)
+    memo = ConsensusMemo(16)
+    sequences = _sequences(count=20)
+    assert predict_batch(sequences, memo=memo) == predict_batch(sequences)
+    assert memo.stats()["size"] == 0
+
+
+def test_backtest_replay_with_memo_matches_plain():
+    r = random.Random(2)
+    sessions = [(i, None, r.randint(3, 18)) for i in range(1, 400)]
+    plain, memoized = replay(sessions).report(), replay(sessions, memo=ConsensusMemo(64)).report()
+    for key in ("sessions", "hit_rate", "strategies", "calibration"):
+        assert plain[key] == memoized[key]
@@ -0,0 +1,73 @@
+import random
+
+from sumclub.engine import (SHAPE_BITS, SHAPE_LENGTH_CAP, SHAPE_RULES, SHAPE_SLOTS, SHAPE_TABLE,
+                            IncrementalAnalysisEngine, compile_shape_table)
+from sumclub.strategies import ai_predict_super_consensus, all_super_vip_algos, suffix_key
+
+
+def _sessions(seed, count):
+    # Tổng ngẫu nhiên xen các đoạn bệt / cầu đảo để chạm cả nhánh mẫu hình của chiến lược
+    rng = random.Random(seed)
+    totals = []
+    while len(totals) < count:
+        kind = rng.random()
+        if kind < 0.6: totals.append(sum(rng.randint(1, 6) for _ in range(3)))
+        elif kind < 0.8: totals += [rng.choice((3, 12, 15, 18))] * rng.randint(3, 9)
+        else: totals += [rng.choice((4, 10)), rng.choice((11, 17))] * rng.randint(2, 5)
+    return [("Tài" if tong >= 11 else "Xỉu", tong) for tong in totals[:count]]
+
+
+def test_incremental_engine_matches_baseline_strategies():
+    for seed in range(4):
+        engine = IncrementalAnalysisEngine()
+        history, totals = [], []
+        for ketqua, tong in _sessions(seed, 300):
+            engine.push(ketqua, tong)
+            history.append(ketqua)
+            totals.append(tong)
+            assert engine.results() == [fn(history, totals) for fn in all_super_vip_algos], len(totals)
+            assert engine.predict() == ai_predict_super_consensus(history, totals)
+            assert engine.suffix_key() == suffix_key(history, totals)
+
+
+def test_copy_is_independent_and_reset_starts_over():
+    engine = IncrementalAnalysisEngine()
+    for ketqua, tong in _sessions(9, 40): engine.push(ketqua, tong)
+    twin = engine.copy()
+    before = twin.results()
+    engine.push("Tài", 18)
+    assert twin.results() == before and twin.length == 40
+    engine.reset()
+    engine.push("Xỉu", 5)
+    assert engine.results() == [fn(["Xỉu"], [5]) for fn in all_super_vip_algos]
+
+
+def _history_for(length, suffix, rng):
+    # Lịch sử độ dài length có SHAPE_BITS bit cuối là suffix (bit 0 = phiên mới nhất), phần trước ngẫu nhiên
+    bits = [rng.randint(0, 1) for _ in range(length)]
+    for i in range(min(length, SHAPE_BITS)): bits[length - 1 - i] = (suffix >> i) & 1
+    return ["Tài" if b else "Xỉu" for b in bits], [rng.choice((11, 14)) if b else rng.choice((4, 10)) for b in bits]
+
+
+def test_compiled_shape_table_matches_scalar_shape_strategies():
+    rng = random.Random(12)
+    scalar = {fn.__name__: fn for fn in all_super_vip_algos}
+    for length in range(SHAPE_LENGTH_CAP + 3):
+        for suffix in range(1 << min(length, SHAPE_BITS)):
+            history, totals = _history_for(length, suffix, rng)
+            row = SHAPE_TABLE[(min(length, SHAPE_LENGTH_CAP) << SHAPE_BITS) | suffix]
+            for name, slot in SHAPE_SLOTS.items():
+                assert row[slot] == scalar[name](history, totals), (name, length, suffix)
+
+
+def test_compile_shape_table_accepts_new_rules():
+    rules = SHAPE_RULES + [("alternate_4", 4, ("Tài", 55.0), 65.0,
+                            lambda b: (1 - b[-1], 90.0) if b[-4] != b[-3] != b[-2] != b[-1] else None)]
+    table, cap, slots = compile_shape_table(rules)
+    assert cap == SHAPE_LENGTH_CAP and slots["alternate_4"] == len(SHAPE_RULES)
+    slot = slots["alternate_4"]
+    assert table[(3 << SHAPE_BITS) | 0b101][slot] == {"du_doan": "Tài", "do_tin_cay": 55.0}
+    assert table[(4 << SHAPE_BITS) | 0b0101][slot] == {"du_doan": "Xỉu", "do_tin_cay": 90.0}
+    assert table[(4 << SHAPE_BITS) | 0b0111][slot] == {"du_doan": "Tài", "do_tin_cay": 65.0}
+    # Các quy tắc cũ giữ nguyên kết quả
+    assert all(row[:len(SHAPE_RULES)] == old for row, old in zip(table, SHAPE_TABLE))
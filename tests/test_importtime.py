@@ -0,0 +1,20 @@
+import os
+import subprocess
+import sys
+
+from sumclub import importtime
+
+
+def test_core_import_within_budget():
+    # Ngân sách import lõi (python -m sumclub.importtime): vượt thời gian, nạp module nặng hoặc cấu hình
+    # logging khi import đều là hồi quy
+    report = importtime.measure(repeat=7)
+    assert importtime.check(report) == []
+
+
+def test_api_worker_import_is_lazy():
+    probe = ("import sys, sumclub.api_worker as w; "
+             "print(sorted(m for m in ('requests', 'websocket', 'aiohttp') if m in sys.modules), w._app)")
+    out = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(importtime.__file__)))).stdout
+    assert out.split() == ["[]", "None"]
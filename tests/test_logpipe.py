@@ -0,0 +1,83 @@
+import logging
+import queue
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from sumclub.logpipe import DroppingQueueHandler, RateLimitFilter, SessionAuditSink, audit_path, read_audit
+from sumclub.metrics import LOG_RECORDS_DROPPED
+
+
+def _record(msg, level=logging.ERROR, table=None):
+    record = logging.LogRecord("sumclub.test", level, __file__, 1, msg, (), None)
+    if table is not None: record.table = table
+    return record
+
+
+def test_rate_limit_keeps_burst_then_reports_suppressed(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("sumclub.logpipe.time.monotonic", lambda: clock[0])
+    limiter = RateLimitFilter(interval=10, burst=2)
+    dropped = LOG_RECORDS_DROPPED.labels("log", "rate_limited")
+    before = dropped._value
+    assert [limiter.filter(_record("mất kết nối %s", table="a")) for _ in range(5)] == [True, True, False, False, False]
+    assert dropped._value == before + 3
+    # Bàn khác / mức thấp hơn ngưỡng không bị giới hạn chung
+    assert limiter.filter(_record("mất kết nối %s", table="b"))
+    assert all(limiter.filter(_record("phiên mới", logging.INFO)) for _ in range(10))
+    clock[0] += 10
+    record = _record("mất kết nối %s", table="a")
+    assert limiter.filter(record) and record.suppressed == 3
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(2))
+    dropped = LOG_RECORDS_DROPPED.labels("log", "queue")
+    before = dropped._value
+    for i in range(5): handler.emit(_record(f"dòng {i}"))
+    assert handler.queue.qsize() == 2
+    assert dropped._value == before + 3
+
+
+@pytest.mark.parametrize("fmt", ["jsonl", "bin"])
+def test_audit_sink_round_trip(tmp_path, fmt):
+    path = audit_path("ban", str(tmp_path), fmt)
+    sink = SessionAuditSink(path, "ban")
+    sink.record(101, [1, 2, 3], {"du_doan": "Tài", "do_tin_cay": 61.5})
+    sink.record(102, [6, 6, 5], {"du_doan": "Xỉu", "do_tin_cay": 55.0})
+    sink.close()
+    sink.record(103, [1, 1, 1], {"du_doan": "Xỉu", "do_tin_cay": 50.0}) # đã đóng: bỏ qua
+    rows = list(read_audit(path))
+    assert [(r["phien"], r["xucxac"], r["tong"], r["du_doan"], r["do_tin_cay"]) for r in rows] == [
+        (101, [1, 2, 3], 6, "Tài", 61.5), (102, [6, 6, 5], 17, "Xỉu", 55.0)]
+    # Mở lại cùng file: ghi nối, bỏ bản ghi nhị phân ghi dở ở cuối
+    if fmt == "bin":
+        with open(path, "ab") as f: f.write(b"\x00" * 5)
+    sink = SessionAuditSink(path, "ban")
+    sink.record(104, [2, 2, 2], {"du_doan": "Xỉu", "do_tin_cay": 50.0})
+    sink.close()
+    assert [r["phien"] for r in read_audit(path)] == [101, 102, 104]
+
+
+def test_forked_worker_log_line_reaches_output():
+    # Chạy ở tiến trình riêng: root logger của pytest đã có handler nên install_logging sẽ không cài gì
+    script = textwrap.dedent("""
+        import logging, multiprocessing
+        from sumclub.logpipe import install_logging
+
+        def worker():
+            logging.warning("dong tu worker %s", "con")
+
+        install_logging(queued=True, fmt="text")
+        logging.warning("dong tu cha")
+        process = multiprocessing.get_context("fork").Process(target=worker)
+        process.start()
+        process.join(10)
+        assert process.exitcode == 0
+    """)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "dong tu cha" in result.stderr
+    assert "dong tu worker con" in result.stderr
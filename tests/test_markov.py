@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+from sumclub.engine import MarkovTransitionTable
+
+
+def _reference(bits, order, window=None, decay=1.0):
+    # Đếm lại từ đầu: chuyển trạng thái thứ t có trọng số decay^(tuổi), chỉ giữ window chuyển trạng thái cuối
+    transitions = [(sum(bits[i - 1 - j] << j for j in range(order)), bits[i]) for i in range(order, len(bits))]
+    if window: transitions = transitions[-window:]
+    counts = [0.0] * (2 << order)
+    for age, (state, bit) in enumerate(reversed(transitions)):
+        counts[(state << 1) | bit] += decay ** age
+    return counts
+
+
+@pytest.mark.parametrize("window, decay", [(None, 1.0), (50, 1.0), (None, 0.97), (50, 0.97), (7, 0.5)])
+def test_counts_match_recount_with_window_and_decay(window, decay):
+    rng = random.Random(3)
+    table = MarkovTransitionTable(3, window=window, decay=decay)
+    bits = []
+    for _ in range(400):
+        bits.append(rng.random() < 0.6)
+        table.push(bits[-1])
+    expected = _reference([int(b) for b in bits], 3, window, decay)
+    for state in range(8):
+        tai, xiu = table.lookup(state)
+        assert tai == pytest.approx(expected[(state << 1) | 1], rel=1e-9, abs=1e-9)
+        assert xiu == pytest.approx(expected[state << 1], rel=1e-9, abs=1e-9)
+
+
+def test_window_expiry_forgets_old_transitions():
+    table = MarkovTransitionTable(1, window=10)
+    for _ in range(50): table.push(1) # 1 -> 1 mãi
+    assert table.lookup(1) == (10, 0)
+    for _ in range(10): table.push(0) # một chuyển 1 -> 0 rồi 9 chuyển 0 -> 0 (đủ 10, 1 -> 1 rơi hết)
+    assert table.lookup(1) == (0, 1) and table.lookup(0) == (0, 9)
+
+
+def test_window_ring_costs_two_bytes_per_session():
+    table = MarkovTransitionTable(3, window=100_000)
+    assert table.recent.itemsize * len(table.recent) == 200_000
+    with pytest.raises(ValueError):
+        MarkovTransitionTable(0)
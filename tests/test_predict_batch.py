@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("flask")
+
+from sumclub.api import app
+from sumclub.strategies import ai_predict_super_consensus
+from sumclub.vectorized import predict_batch
+
+
+@pytest.mark.parametrize("sequence", [
+    {"totals": [[1]]},
+    {"totals": [10.0, 11.0]},
+    {"totals": [True, 11]},
+    {"totals": [2, 11]},
+    {"totals": "10,11"},
+    {"totals": [10, 11], "history": [[1], [2]]},
+    {"totals": [10, 11], "history": ["Tài", 1]},
+    {"totals": [10, 11], "history": ["Xỉu"]},
+])
+def test_predict_batch_rejects_malformed_sequences(sequence):
+    response = app.test_client().post("/api/predict/batch", json={"sequences": [sequence]})
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
+
+
+def test_predict_batch_matches_reference():
+    totals = [3, 18, 11, 10, 10, 12, 9, 14, 15, 4, 11, 11, 11, 7, 8, 16, 10, 12, 13, 6, 17, 5]
+    sequences = [(None, totals[:n]) for n in range(len(totals) + 1)]
+    for (_, t), got in zip(sequences, predict_batch(sequences)):
+        assert got == ai_predict_super_consensus(["Tài" if x >= 11 else "Xỉu" for x in t], t)
@@ -0,0 +1,155 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("aiohttp")
+import aiohttp
+
+from sumclub.push import PushServer
+from sumclub.snapshot import (ResultSnapshot, SharedSnapshotReader, SharedSnapshotWriter, SnapshotBroadcaster,
+                              render_taimd5, shared_snapshot_path)
+
+
+class FakeTable:
+    def __init__(self, name="ban"):
+        self.name = name
+        self.current_snapshot = ResultSnapshot(name, {"phien": None})
+        self.broadcaster = SnapshotBroadcaster(lambda: self.current_snapshot)
+
+    def publish(self, phien):
+        snapshot = ResultSnapshot(self.name, {"phien": phien, "tong": 11})
+        render_taimd5(snapshot)
+        self.current_snapshot = snapshot
+        self.broadcaster.notify()
+
+
+@pytest.fixture
+def push():
+    table = FakeTable()
+    server = PushServer({table.name: (lambda: table.current_snapshot, table.broadcaster)}, default=table.name)
+    server.run_in_thread("127.0.0.1", 0)
+    yield table, f"http://127.0.0.1:{server.port}"
+    server.stop()
+
+
+def _publish_later(table, phien, delay=0.2):
+    threading.Timer(delay, table.publish, (phien,)).start()
+
+
+def test_long_poll_returns_on_publish_and_honours_etag(push):
+    table, url = push
+    table.publish(1)
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            _publish_later(table, 2)
+            started = time.monotonic()
+            async with session.get(f"{url}/api/taimd5?after=1") as response:
+                assert response.status == 200
+                assert (await response.json())["phien"] == 2
+                etag = response.headers["ETag"]
+                assert response.headers["Access-Control-Allow-Origin"] == "*"
+            assert time.monotonic() - started < 5
+            async with session.get(f"{url}/api/taimd5", headers={"If-None-Match": etag}) as response:
+                assert response.status == 304
+            async with session.get(f"{url}/api/khong-co/taimd5") as response:
+                assert response.status == 404
+
+    asyncio.run(scenario())
+
+
+def test_sse_stream_delivers_each_session(push):
+    table, url = push
+    table.publish(1)
+
+    async def scenario():
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f"{url}/api/ban/taimd5/stream", headers={"Last-Event-ID": "0"}) as response:
+                assert response.headers["Content-Type"].startswith("text/event-stream")
+                _publish_later(table, 2)
+                ids = []
+                while len(ids) < 2:
+                    line = await asyncio.wait_for(response.content.readline(), 5)
+                    if line.startswith(b"id: "): ids.append(int(line[4:]))
+                assert ids == [1, 2]
+
+    asyncio.run(scenario())
+
+
+def test_idle_subscribers_do_not_cost_threads(push):
+    table, url = push
+    table.publish(1)
+    subscribers = 300
+
+    async def scenario():
+        connector = aiohttp.TCPConnector(limit=0)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def poll():
+                async with session.get(f"{url}/api/taimd5?after=1") as response:
+                    return (await response.json())["phien"]
+
+            before = threading.active_count()
+            tasks = [asyncio.create_task(poll()) for _ in range(subscribers)]
+            await asyncio.sleep(0.5)
+            # Mọi client đang chờ trên máy chủ đẩy: số thread không tăng theo số subscriber
+            assert threading.active_count() <= before + 2
+            table.publish(2)
+            assert await asyncio.wait_for(asyncio.gather(*tasks), 10) == [2] * subscribers
+
+    asyncio.run(scenario())
+
+
+def test_shared_reader_waits_on_one_poller_per_process(tmp_path):
+    path = shared_snapshot_path("ban", str(tmp_path))
+    writer = SharedSnapshotWriter(path)
+    reader = SharedSnapshotReader("ban", path)
+    snapshot = ResultSnapshot("ban", {"phien": 7})
+    threading.Timer(0.2, writer.write, (snapshot,)).start()
+    results = []
+    waiters = [threading.Thread(target=lambda: results.append(reader.wait_newer(None, 5).phien)) for _ in range(5)]
+    for waiter in waiters: waiter.start()
+    for waiter in waiters: waiter.join(6)
+    assert results == [7] * 5
+    assert len([t for t in threading.enumerate() if t.name == "snapshot-poller"]) == 1
+    writer.close()
+
+
+def test_flask_redirects_long_poll_and_stream_to_push_server(monkeypatch):
+    pytest.importorskip("flask")
+    from sumclub import api
+    monkeypatch.setattr(api, "push_port", 3999)
+    client = api.app.test_client()
+    response = client.get("/api/taimd5?after=5")
+    assert response.status_code == 307
+    assert response.headers["Location"] == "http://localhost:3999/api/taimd5?after=5"
+    assert client.get("/api/taimd5/stream").status_code == 307
+    assert client.get("/api/taimd5").status_code == 200
+
+
+def test_long_poll_is_timed_under_its_own_label(monkeypatch):
+    pytest.importorskip("flask")
+    from sumclub import api
+    from sumclub.metrics import HTTP_REQUEST_SECONDS
+    monkeypatch.setattr(api, "push_port", 0)
+    monkeypatch.setattr(api, "LONG_POLL_TIMEOUT", 0.2)
+    plain, waiting = HTTP_REQUEST_SECONDS.labels("/api/taimd5"), HTTP_REQUEST_SECONDS.labels("/api/taimd5?after")
+    plain_before, waiting_before = sum(plain._counts), sum(waiting._counts)
+    client = api.app.test_client()
+    client.get("/api/taimd5")
+    client.get("/api/taimd5?after=999999999")
+    assert sum(plain._counts) == plain_before + 1
+    assert sum(waiting._counts) == waiting_before + 1
+
+
+def test_push_server_is_opt_in(monkeypatch):
+    pytest.importorskip("flask")
+    from sumclub import api, config
+    if "SUMCLUB_PUSH_PORT" not in os.environ: assert config.PUSH_PORT == 0
+    assert api.push_port == 0
+    monkeypatch.setattr(api, "LONG_POLL_TIMEOUT", 0.1)
+    # Không bật máy chủ đẩy: long-poll được phục vụ ngay tại cổng Flask, không chuyển hướng
+    response = api.app.test_client().get("/api/taimd5?after=-1")
+    assert response.status_code == 200
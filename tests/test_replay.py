@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import json
+import random
+from types import SimpleNamespace
+
+from sumclub.capture import CAPTURE_MAGIC, FrameRecorder, read_capture
+from sumclub.ingest import handle_hub_frame
+from sumclub.replay import main, replay_capture
+from sumclub.state import TableState
+
+HUB = "luckydice1Hub"
+
+
+def _frame(session_id, dice):
+    result = {"Dice1": dice[0], "Dice2": dice[1], "Dice3": dice[2]}
+    return json.dumps({"C": f"d-{session_id}", "M": [{"H": HUB, "M": "notifyChangePhrase",
+                                                      "A": [{"SessionID": session_id, "Result": result}]}]})
+
+
+def _frames(count=120, seed=19):
+    # Pha đặt cược (Dice1 = -1), keepalive, phiên trùng và phiên nhảy cóc như hub thật
+    rng = random.Random(seed)
+    frames, session_id = [], 5000
+    for _ in range(count):
+        session_id += 1 if rng.random() < 0.95 else 3
+        frames.append(_frame(session_id, [-1, -1, -1]))
+        frames.append("{}")
+        frames.append(_frame(session_id, [rng.randint(1, 6) for _ in range(3)]))
+        if rng.random() < 0.05: frames.append(frames[-1])
+    return frames
+
+
+def _record(path, frames):
+    table = SimpleNamespace(name="ban", base_url="https://example.invalid", hub_name=HUB)
+    recorder = FrameRecorder(str(path), table)
+    for i, frame in enumerate(frames): recorder.write(frame, received=1000.0 + i)
+    recorder.close()
+
+
+def test_replay_digest_is_stable_and_matches_live_ingest(tmp_path):
+    frames = _frames()
+    path = tmp_path / "ban.cap.gz"
+    _record(path, frames)
+    header, recorded = read_capture(str(path))
+    assert header["table"] == "ban" and header["hub_name"] == HUB
+    assert [frame for _, frame in recorded] == frames
+
+    # Đường ingest trực tiếp (như on_message) cho cùng chuỗi body đã công bố
+    live = TableState("ban", "https://example.invalid", HUB, capacity=64)
+    digest = hashlib.sha256()
+    for frame in frames:
+        if handle_hub_frame(live, frame): digest.update(live.current_snapshot.rendered[0])
+
+    first = replay_capture(str(path), capacity=64)
+    assert first["digest"] == digest.hexdigest()
+    assert first["frames"] == len(frames) and first["sessions"] == 120
+    assert first["last"]["phien"] == live.current_snapshot.phien
+    assert replay_capture(str(path), capacity=64)["digest"] == first["digest"]
+    assert replay_capture(str(path), capacity=64, memo_size=256)["digest"] == first["digest"]
+    assert main([str(path), "--capacity", "64", "--expect-digest", first["digest"]]) == 0
+    assert main([str(path), "--capacity", "64", "--expect-digest", "0" * 64]) == 1
+
+
+def test_truncated_capture_replays_complete_records(tmp_path):
+    path = tmp_path / "ban.cap.gz"
+    _record(path, _frames(40))
+    raw = gzip.decompress(path.read_bytes())
+    assert raw.startswith(CAPTURE_MAGIC)
+    # Tiến trình chết giữa chừng: cắt giữa một bản ghi
+    cut = tmp_path / "cut.cap.gz"
+    cut.write_bytes(gzip.compress(raw[:len(raw) * 2 // 3]))
+    _, recorded = read_capture(str(cut))
+    assert 0 < len(list(recorded)) < len(_frames(40))
+    assert replay_capture(str(cut))["sessions"] > 0
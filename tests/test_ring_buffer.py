@@ -0,0 +1,52 @@
+import random
+
+import pytest
+
+from sumclub.storage import SessionRingBuffer
+from sumclub.strategies import all_super_vip_algos
+
+
+def test_views_match_tail_of_plain_lists_across_wraparound():
+    rng = random.Random(3)
+    ring = SessionRingBuffer(23)
+    history, totals = [], []
+    for n in range(200):
+        tong = rng.randint(3, 18)
+        ketqua = "Tài" if tong >= 11 else "Xỉu"
+        ring.append(ketqua, tong)
+        history.append(ketqua)
+        totals.append(tong)
+        assert len(ring) == min(n + 1, 23)
+        for k in (None, 0, 1, 5, 20, 23, 50):
+            m = len(ring) if k is None else min(k, len(ring))
+            tail = history[len(history) - m:]
+            view = ring.history_view(k)
+            assert view == tail and view.tolist() == tail
+            assert list(ring.totals_view(k)) == totals[len(totals) - m:]
+            assert view.count("Tài") == tail.count("Tài") and view.count("Xỉu") == tail.count("Xỉu")
+        view = ring.history_view()
+        assert view[-1] == history[-1] and view[-7:-2] == history[-7:-2] and view[::3] == history[-23:][::3]
+
+
+def test_strategies_accept_views_like_lists():
+    rng = random.Random(5)
+    ring = SessionRingBuffer(40)
+    history, totals = [], []
+    for _ in range(137):
+        tong = rng.randint(3, 18)
+        ring.append("Tài" if tong >= 11 else "Xỉu", tong)
+        history.append("Tài" if tong >= 11 else "Xỉu")
+        totals.append(tong)
+    for fn in all_super_vip_algos:
+        assert fn(ring.history_view(), ring.totals_view()) == fn(history[-40:], totals[-40:]), fn.__name__
+
+
+def test_view_is_zero_copy_and_clear_empties():
+    ring = SessionRingBuffer(20)
+    ring.append("Tài", 12)
+    view = ring.totals_view()
+    assert view.obj is ring._totals
+    ring.clear()
+    assert len(ring) == 0 and ring.history_view() == [] and list(ring.totals_view()) == []
+    with pytest.raises(ValueError):
+        SessionRingBuffer(19)
@@ -0,0 +1,24 @@
+from sumclub.engine import StrategyScoreboard
+from sumclub.state import TableState
+
+TAI, XIU = {"du_doan": "Tài"}, {"du_doan": "Xỉu"}
+
+
+def test_prediction_is_not_scored_across_a_session_gap():
+    board = StrategyScoreboard(["a", "b"], windows=(10,))
+    board.record([TAI, XIU], TAI, 10)
+    board.score(1, 12) # phiên 11 bị mất: dự đoán lập sau phiên 10 không được chấm với phiên 12
+    assert board.stats()["scored"] == 0 and board.skipped == 1
+    board.record([TAI, XIU], TAI, 12)
+    board.score(1, 13)
+    stats = board.stats()
+    assert stats["scored"] == 1 and stats["lifetime"] == [1, 0, 1]
+
+
+def test_table_ingest_skips_scoring_after_missing_sessions():
+    table = TableState("gap", "", "hub", 50, speculate=False)
+    for phien in (1, 2, 3, 5, 6):
+        table.ingest(phien, [3, 4, 5])
+    stats = table.scoreboard.stats()
+    # Chấm 2 (sau 1), 3 (sau 2), 6 (sau 5); phiên 5 về sau khi mất phiên 4 -> bỏ
+    assert stats["scored"] == 3 and stats["skipped"] == 1
@@ -0,0 +1,105 @@
+import random
+import threading
+
+from sumclub.storage import (DICE_COUNTERS, DICE_DELTAS, DICE_FACES, DICE_PAIRS, DICE_POSITIONS, DICE_TRIPLES,
+                             DICE_UNKNOWN, SessionIndex, pack_dice, unpack_dice)
+
+
+def _dice_counts(dice_rows):
+    counts = [0] * DICE_COUNTERS
+    for dice in dice_rows:
+        for cell in DICE_DELTAS[pack_dice(dice)]: counts[cell] += 1
+    return counts
+
+
+def test_windows_larger_than_capacity_are_exact():
+    rng = random.Random(7)
+    index = SessionIndex(50, windows=(100, 1000), dice_windows=(100, 700))
+    rows = []
+    for n in range(2500):
+        dice = [rng.randint(1, 6) for _ in range(3)]
+        rows.append(dice)
+        index.append(10_000 + n, sum(dice), dice)
+        if n not in (30, 99, 100, 999, 1000, 2499): continue
+        stats, dice_stats = index.stats(), index.dice_stats()
+        for w in (100, 1000):
+            expected = [0] * 16
+            for d in rows[-w:]: expected[sum(d) - 3] += 1
+            assert stats["windows"][w] == expected
+        for w in (50, 100, 700):
+            assert dice_stats["windows"][w] == _dice_counts(rows[-w:])
+        # Lịch sử phân trang vẫn chỉ giữ capacity phiên
+        assert stats["sessions_retained"] == min(n + 1, 50)
+
+
+def test_stats_reader_yields_then_falls_back_to_writer_lock():
+    lock = threading.Lock()
+    index = SessionIndex(10, windows=(5,), dice_windows=(5,), lock=lock)
+    index.append(1, 11, [3, 4, 4])
+    # Người ghi "treo" giữa chừng (version lẻ) nhưng không giữ khóa: đọc dưới khóa sau SEQLOCK_RETRIES lần
+    index._version += 1
+    assert index.stats()["sessions_total"] == 1
+    assert index.dice_stats()["known"] == 1
+    # Không có khóa: người đọc nhường GIL cho tới khi người ghi xong
+    index._lock = None
+    threading.Timer(0.05, lambda: setattr(index, "_version", index._version + 1)).start()
+    assert index.stats()["last_phien"] == 1
+    assert index._version % 2 == 0
+
+
+def _pages(index, **kwargs):
+    rows, cursor = index.query(**kwargs)
+    while cursor is not None:
+        page, cursor = index.query(cursor=cursor, **kwargs)
+        rows += page
+    return rows
+
+
+def test_query_by_total_pages_through_the_wrapped_ring():
+    rng = random.Random(11)
+    index = SessionIndex(97, windows=(10,), dice_windows=(10,))
+    rows = []
+    for n in range(1000):
+        dice = [rng.randint(1, 6) for _ in range(3)]
+        rows.append((5000 + 2 * n, sum(dice), pack_dice(dice)))
+        index.append(5000 + 2 * n, sum(dice), dice)
+    retained = rows[-97:]
+    for tong in (3, 10, 11, 18):
+        expected = [row for row in retained if row[1] == tong]
+        assert _pages(index, tong=tong, limit=4) == expected
+        assert _pages(index, tong=tong, limit=3, descending=True) == expected[::-1]
+    lo, hi = retained[20][0], retained[70][0]
+    expected = [row for row in retained if lo <= row[0] <= hi and row[1] == 11]
+    assert _pages(index, start=lo, stop=hi, tong=11, limit=2) == expected
+
+
+def test_pack_dice_round_trip_and_deltas():
+    codes = set()
+    for d1 in range(1, 7):
+        for d2 in range(1, 7):
+            for d3 in range(1, 7):
+                dice = [d1, d2, d3]
+                code = pack_dice(dice)
+                codes.add(code)
+                assert unpack_dice(code) == dice
+                # Ô cần +1: 3 mặt, 3 vị trí, rồi bộ ba hoặc đúng một đôi (bộ ba không tính là đôi)
+                expected = [DICE_FACES + d - 1 for d in dice] + [DICE_POSITIONS + 6 * p + d - 1 for p, d in enumerate(dice)]
+                if d1 == d2 == d3: expected.append(DICE_TRIPLES + d1 - 1)
+                elif len(set(dice)) == 2: expected.append(DICE_PAIRS + max(dice, key=dice.count) - 1)
+                assert sorted(DICE_DELTAS[code]) == sorted(expected)
+    assert codes == set(range(216)) and len(DICE_DELTAS) == 256
+    for bad in ([0, 1, 2], [1, 7, 3], [-1, -1, -1]):
+        assert pack_dice(bad) == DICE_UNKNOWN
+    assert unpack_dice(DICE_UNKNOWN) is None and DICE_DELTAS[DICE_UNKNOWN] == ()
+
+
+def test_unknown_dice_are_kept_but_not_counted():
+    index = SessionIndex(8, windows=(4,), dice_windows=(4,))
+    rows = [[6, 6, 6], None, [1, 2, 2], [0, 0, 11], [3, 4, 5], [2, 2, 2]]
+    for n, dice in enumerate(rows): index.append(100 + n, 11 if dice is None else sum(dice), dice)
+    stats = index.dice_stats()
+    assert stats["sessions_total"] == 6 and stats["known"] == 4
+    assert stats["last_phien"] == 105 and unpack_dice(stats["last"]) == [2, 2, 2]
+    assert stats["lifetime"] == _dice_counts([[6, 6, 6], [1, 2, 2], [3, 4, 5], [2, 2, 2]])
+    assert stats["windows"][4] == _dice_counts([[1, 2, 2], [3, 4, 5], [2, 2, 2]])
+    assert [row[2] for row in _pages(index, limit=2)] == [pack_dice(d) if d else DICE_UNKNOWN for d in rows]
@@ -0,0 +1,56 @@
+import random
+import threading
+
+from sumclub.state import TableState
+from sumclub.storage import SESSION_RECORD, SessionLog
+
+
+def _sessions(n, seed=5, first=1000):
+    rng = random.Random(seed)
+    return [(first + i, [rng.randint(1, 6) for _ in range(3)]) for i in range(n)]
+
+
+def test_log_round_trip_and_truncated_tail(tmp_path):
+    path = str(tmp_path / "ban.bin")
+    log = SessionLog(path, fsync_interval=0.01, fsync_every=4).start_flusher()
+    sessions = _sessions(50)
+    for phien, dice in sessions: log.append(phien, dice)
+    log.close()
+    with open(path, "ab") as f: f.write(b"\x01\x02\x03") # tiến trình chết giữa lúc ghi
+    SessionLog(path).close()
+    with open(path, "rb") as f:
+        records = list(SESSION_RECORD.iter_unpack(f.read()))
+    assert records == [(phien, *dice, sum(dice)) for phien, dice in sessions]
+
+
+def test_close_waits_for_flusher(tmp_path):
+    errors = []
+    hook, threading.excepthook = threading.excepthook, lambda args: errors.append(args.exc_value)
+    try:
+        for i in range(20):
+            log = SessionLog(str(tmp_path / f"{i}.bin"), fsync_interval=0.0001, fsync_every=1).start_flusher()
+            for phien, dice in _sessions(200): log.append(phien, dice)
+            log.close()
+            log.append(1, [1, 1, 1]) # sau khi đóng: bỏ qua, không ném lỗi
+            assert not log._thread.is_alive()
+    finally:
+        threading.excepthook = hook
+    assert errors == []
+
+
+def test_warm_start_matches_live_ingest(tmp_path):
+    path = str(tmp_path / "ban.bin")
+    live = TableState("live", "", "hub", 120, speculate=False)
+    log = SessionLog(path)
+    for phien, dice in _sessions(700):
+        live.ingest(phien, dice)
+        log.append(phien, dice)
+    log.close()
+    warm = TableState("warm", "", "hub", 120, speculate=False)
+    assert warm.warm_start(path) == 120
+    assert warm.current_snapshot.result == live.current_snapshot.result
+    assert warm.current_snapshot.history == live.current_snapshot.history
+    assert warm.session_index.stats()["windows"] == live.session_index.stats()["windows"]
+    # Nhận tiếp phiên mới sau khi khởi động nóng: cùng dự đoán như tiến trình chưa từng dừng
+    for phien, dice in _sessions(5, seed=9, first=1700):
+        assert warm.ingest(phien, dice).result == live.ingest(phien, dice).result
@@ -0,0 +1,80 @@
+import time
+
+from sumclub.snapshot import (SHARED_SEQ, ResultSnapshot, SharedSnapshotReader, SharedSnapshotWriter,
+                              render_taimd5, shared_snapshot_path)
+
+
+def _snapshot(phien, table="ban"):
+    snapshot = ResultSnapshot(table, {"phien": phien, "tong": 12, "du_doan": "Tài"})
+    render_taimd5(snapshot)
+    return snapshot
+
+
+def test_reader_sees_each_write_and_caches_by_seq(tmp_path):
+    path = shared_snapshot_path("ban", str(tmp_path))
+    reader = SharedSnapshotReader("ban", path)
+    assert reader.current().phien is None # chưa có segment: "initializing"
+    writer = SharedSnapshotWriter(path)
+    for phien in (1, 2, 3):
+        expected = _snapshot(phien)
+        writer.write(expected)
+        got = reader.current()
+        assert got.phien == phien and got.rendered == expected.rendered
+        assert got.sse_frame == expected.sse_frame
+        assert reader.current() is got # seq không đổi -> không đọc lại
+    writer.close()
+
+
+def test_writer_restart_continues_seq(tmp_path):
+    path = shared_snapshot_path("ban", str(tmp_path))
+    writer = SharedSnapshotWriter(path)
+    writer.write(_snapshot(5))
+    reader = SharedSnapshotReader("ban", path)
+    assert reader.current().phien == 5
+    writer.close()
+    # Ingest khởi động lại, phiên đầu tiên trùng mã nhưng người đọc vẫn phải thấy bản mới (seq tăng)
+    restarted = SharedSnapshotWriter(path)
+    restarted.write(_snapshot(5, "ban"))
+    assert reader.changed()
+    assert reader.current().phien == 5 and not reader.changed()
+    restarted.close()
+
+
+def test_torn_write_does_not_spin_forever(tmp_path):
+    path = shared_snapshot_path("ban", str(tmp_path))
+    writer = SharedSnapshotWriter(path)
+    writer.write(_snapshot(1))
+    reader = SharedSnapshotReader("ban", path)
+    assert reader.current().phien == 1
+    # Ingest chết giữa lúc ghi: seq kẹt ở số lẻ, dữ liệu ghi dở
+    seq = SHARED_SEQ.unpack_from(writer._mm, 8)[0]
+    SHARED_SEQ.pack_into(writer._mm, 8, seq + 1)
+    writer._mm[128:140] = b"\xff" * 12
+    started = time.monotonic()
+    assert reader.current().phien == 1 # bản đã cache
+    assert time.monotonic() - started < 1
+    assert not reader.changed()
+    # Người đọc mới (chưa có cache) nhận "initializing" thay vì treo
+    assert SharedSnapshotReader("ban", path).current().phien is None
+    writer.close()
+    # Ingest khởi động lại: seq chẵn mới, đọc lại bình thường
+    restarted = SharedSnapshotWriter(path)
+    restarted.write(_snapshot(2))
+    assert reader.current().phien == 2
+    restarted.close()
+
+
+def test_etag_follows_body_not_just_phien(tmp_path):
+    # Cùng phiên nhưng markov / đồng thuận có trọng số đã cập nhật: ETag phải khác
+    before = ResultSnapshot("ban", {"phien": 9, "tong": 12, "markov": {"Tài": 0.5}})
+    after = ResultSnapshot("ban", {"phien": 9, "tong": 12, "markov": {"Tài": 0.6}})
+    (body_before, etag_before), (body_after, etag_after) = render_taimd5(before), render_taimd5(after)
+    assert body_before != body_after and etag_before != etag_after
+    assert render_taimd5(ResultSnapshot("ban", dict(before.result)))[1] == etag_before
+    assert render_taimd5(ResultSnapshot("ban", {"phien": None}))[1].startswith("taimd5-init-")
+    # ETag vẫn vừa ô của vùng chia sẻ và đi nguyên vẹn qua writer -> reader
+    path = shared_snapshot_path("ban-co-ten-rat-dai-" + "x" * 60, str(tmp_path))
+    writer = SharedSnapshotWriter(path)
+    writer.write(after)
+    assert SharedSnapshotReader("ban", path).current().rendered == (body_after, etag_after)
+    writer.close()
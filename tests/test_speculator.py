@@ -0,0 +1,71 @@
+import random
+
+import pytest
+
+from sumclub import state
+from sumclub.engine import IncrementalAnalysisEngine
+from sumclub.state import SPECULATIVE_ORDER, Speculator, TableState
+
+
+def _engine(count=30, seed=22):
+    rng = random.Random(seed)
+    engine = IncrementalAnalysisEngine()
+    for _ in range(count):
+        tong = rng.randint(3, 18)
+        engine.push("Tài" if tong >= 11 else "Xỉu", tong)
+    return engine
+
+
+def _outcomes(speculator):
+    return {outcome: counter._value for outcome, counter in speculator._lookups.items()}
+
+
+def test_lookup_hit_miss_gap_and_cold():
+    assert sorted(SPECULATIVE_ORDER) == list(range(3, 19)) and SPECULATIVE_ORDER[:2] == [10, 11]
+    speculator = Speculator("ban-doan")
+    before = _outcomes(speculator)
+    assert speculator.lookup(10, 11, 12) is None # chưa có bảng: cold
+    engine = _engine()
+    speculator.submit(10, engine)
+    assert speculator.wait_idle(5)
+    for tong in (3, 11, 18):
+        twin = engine.copy()
+        twin.push("Tài" if tong >= 11 else "Xỉu", tong)
+        assert speculator.lookup(10, 11, tong) == twin.evaluate()
+    assert speculator.lookup(10, 12, 11) is None # phiên nhảy cóc: gap, bảng bị hủy
+    assert speculator.lookup(10, 11, 11) is None # cold
+    speculator.submit(11, engine)
+    assert speculator.wait_idle(5)
+    del speculator._current.results[9]
+    assert speculator.lookup(11, 12, 9) is None # miss
+    after = _outcomes(speculator)
+    if state.METRICS_ENABLED:
+        assert {k: after[k] - before[k] for k in after} == {"hit": 3, "miss": 1, "gap": 1, "cold": 2}
+
+
+def test_restart_recomputes_latest_and_cancel_drops_table():
+    speculator = Speculator("ban-noi-lai")
+    speculator.submit(5, _engine())
+    assert speculator.wait_idle(5)
+    speculator.cancel()
+    assert speculator.lookup(5, 6, 10) is None
+    speculator.restart()
+    assert speculator.wait_idle(5)
+    assert speculator.lookup(5, 6, 10) is not None
+
+
+@pytest.mark.parametrize("mode", ["confidence", "accuracy"])
+def test_published_results_identical_with_and_without_speculation(monkeypatch, mode):
+    monkeypatch.setattr(state, "CONSENSUS_MODE", mode)
+    rng = random.Random(7)
+    sessions, phien = [], 100
+    for _ in range(150):
+        phien += 1 if rng.random() < 0.9 else rng.randint(2, 4)
+        sessions.append((phien, [rng.randint(1, 6) for _ in range(3)]))
+    plain = TableState("ban", "https://example.invalid", "hub", capacity=64, speculate=False)
+    fast = TableState("ban", "https://example.invalid", "hub", capacity=64, speculate=True)
+    before = _outcomes(fast.speculator)
+    for phien_id, dice in sessions:
+        fast.speculator.wait_idle(5)
+        assert fast.ingest(phien_id, dice).rendered == plain.ingest(phien_id, dice).rendered
+    if state.METRICS_ENABLED: assert _outcomes(fast.speculator)["hit"] - before["hit"] > 100
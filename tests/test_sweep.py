@@ -0,0 +1,45 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sumclub import sweep as sweep_module
+from sumclub.sweep import SWEEPABLE, parse_grid, sweep
+from sumclub.vectorized import evaluate_strategies
+
+
+def _totals(n=3000, seed=4):
+    rng = random.Random(seed)
+    return np.array([sum(rng.randint(1, 6) for _ in range(3)) for _ in range(n)], dtype=np.uint8)
+
+
+def test_default_params_reproduce_vectorized_strategy_rows():
+    totals = _totals()
+    preds, _ = evaluate_strategies(totals)
+    actual = (totals >= 11)[1:]
+    results = sweep(totals, {name: {} for name in SWEEPABLE}, workers=1)
+    for result in results:
+        row = SWEEPABLE[result["strategy"]][0]
+        assert result["hit_rate"] == round(float((preds[row][:-1] == actual).mean()) * 100, 3)
+
+
+def test_process_pool_matches_single_process_run():
+    totals = _totals()
+    grid = parse_grid(["s16:hi=9:12", "s16:lo=3,4", "s9:threshold=1.0:2.0:0.5", "s20:hits=3,4"])
+    single = sweep(totals, grid, workers=1)
+    assert len(single) == 3 * 2 + 2 + 2
+    assert sweep(totals, grid, workers=2, chunksize=1) == single
+    assert sweep_module._worker == {} # handle của đường workers=1 đã được đóng và dọn
+
+
+def test_unknown_param_is_rejected_before_shared_memory(monkeypatch):
+    def no_shared_memory(*args):
+        raise AssertionError("không được cấp shared memory cho lưới sai")
+    monkeypatch.setattr(sweep_module, "_to_shared", no_shared_memory)
+    with pytest.raises(ValueError, match="threshhold"):
+        parse_grid(["s9:threshhold=1,2"])
+    with pytest.raises(ValueError, match="windw"):
+        sweep(_totals(100), {"s16": {"windw": [10]}}, workers=1)
+    with pytest.raises(ValueError):
+        sweep(_totals(100), {"s99": {"hi": [1]}}, workers=1)
@@ -0,0 +1,38 @@
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sumclub.strategies import ai_predict_super_consensus, all_super_vip_algos
+from sumclub.vectorized import evaluate
+
+
+def _totals(seed, count):
+    rng = random.Random(seed)
+    out = []
+    while len(out) < count:
+        if rng.random() < 0.8: out.append(sum(rng.randint(1, 6) for _ in range(3)))
+        else: out += [rng.choice((3, 10, 11, 15, 18))] * rng.randint(3, 8)
+    return out[:count]
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_every_position_matches_scalar_strategies(seed):
+    totals = _totals(seed, 400)
+    # Kết quả không nhất thiết theo tổng (history riêng): lật ngẫu nhiên một phần nhãn
+    rng = random.Random(seed)
+    history = [("Tài" if t >= 11 else "Xỉu") if rng.random() < 0.9 else rng.choice(("Tài", "Xỉu")) for t in totals]
+    outcomes = np.array([h == "Tài" for h in history], dtype=np.int64)
+    for derived in (True, False):
+        labels = ["Tài" if t >= 11 else "Xỉu" for t in totals] if derived else history
+        preds, confs, du_doan, do_tin_cay = evaluate(np.array(totals), None if derived else outcomes)
+        assert preds.shape == confs.shape == (len(all_super_vip_algos), len(totals))
+        for p in range(len(totals)):
+            h, t = labels[:p + 1], totals[:p + 1]
+            for k, fn in enumerate(all_super_vip_algos):
+                expected = fn(h, t)
+                assert (("Tài" if preds[k, p] else "Xỉu"), float(confs[k, p])) == \
+                    (expected["du_doan"], expected["do_tin_cay"]), (fn.__name__, p)
+            consensus = ai_predict_super_consensus(h, t)
+            assert ("Tài" if du_doan[p] else "Xỉu", float(do_tin_cay[p])) == (consensus["du_doan"], consensus["do_tin_cay"])